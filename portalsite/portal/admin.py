@@ -7,8 +7,11 @@ from . import models as dbm
 
 # Register your models here.
 admin.site.register(dbm.Group)
+admin.site.register(dbm.IngestJob)
 admin.site.register(dbm.Measurement)
 admin.site.register(dbm.Model)
+admin.site.register(dbm.Payload)
 admin.site.register(dbm.Scoring)
 admin.site.register(dbm.Source)
 admin.site.register(dbm.Prediction)
+admin.site.register(dbm.TrainingJob)
@@ -2,21 +2,41 @@
 Contains the 'core concepts' of the portal app
 """
 
+import os
 
-from .data_handler import NumericCsvHandler
+from django.conf import settings
+
+from .cache import ArrayCache, LruCache, nbytes_of
+from .compression import check_level
+from .data_handler import NumericCsvHandler, NumpyArraysHandler
+from .matrixfiles import MatrixFileStore
 from .model_type.test_model import TestModelType
 from .model_type.linear_regression import LinearRegressionModel
 from .model_type.simca_model import SimcaModel
 from .named_id_manager import NamedIdManager
 
 
-NUMERICCSVHANDLER = NumericCsvHandler()
+# fail at startup instead of on the first save
+check_level(getattr(settings, 'PORTAL_COMPRESSION_CODEC', 'zlib'), getattr(settings, 'PORTAL_COMPRESSION_LEVEL', None))
+
+NUMERICCSVHANDLER = NumericCsvHandler(getattr(settings, 'PORTAL_MEASUREMENT_DTYPE', 'float64'))
+NUMPYARRAYSHANDLER = NumpyArraysHandler()
 TESTMODELTYPE = TestModelType()
 LINEARREGRESSIONMODEL = LinearRegressionModel()
 SIMCAMODEL = SimcaModel()
 
-DATAHANDLERS = NamedIdManager([NUMERICCSVHANDLER])
+DATAHANDLERS = NamedIdManager([NUMERICCSVHANDLER,
+                               NUMPYARRAYSHANDLER])
 
 MODELTYPES = NamedIdManager([TESTMODELTYPE,
                              LINEARREGRESSIONMODEL,
                              SIMCAMODEL])
+
+PAYLOAD_ARRAYS = ArrayCache(getattr(settings, 'PORTAL_ARRAY_CACHE_BYTES', 256 * 2**20))
+"""Per-process cache of parsed measurement arrays, keyed by (payload pk, part)"""
+
+MODEL_OBJECTS = LruCache(getattr(settings, 'PORTAL_MODEL_CACHE_BYTES', 64 * 2**20), size_of=nbytes_of)
+"""Per-process cache of deserialized model data (e.g. `Simca` objects), keyed by (model pk, time changed)"""
+
+MATRIX_FILES = MatrixFileStore(os.path.join(settings.MEDIA_ROOT, 'matrices'))
+"""Local storage of large measurement matrices, read as memory maps"""
@@ -0,0 +1,141 @@
+"""
+Packing of numpy arrays to self-describing binary blobs (header with dtype and shape, followed by the raw data)
+"""
+# region imports
+# standard
+import base64
+import struct
+from typing import Sequence
+
+# 3rd party
+import numpy as np
+
+# local
+
+# type hints
+
+# endregion
+
+MAGIC = b'PNDA'
+"""Leading bytes of every packed array"""
+VERSION = 1
+"""Version of the packing format, stored in the header"""
+
+_PREFIX = struct.Struct('<4sBB')  # magic, version, length of the dtype string
+_DIMENSION = struct.Struct('<Q')
+_ALIGNMENT = 16
+
+
+def pack_array(array: np.ndarray) -> bytes:
+    """
+    Returns the array packed as bytes: a header with format version, dtype and shape, padded to a multiple of 16 bytes,
+    followed by the raw array data in C-order.
+    """
+    array = np.asarray(array)
+    return _header(array.dtype, array.shape) + array.tobytes(order='C')
+
+
+def unpack_array(binary: bytes | bytearray | memoryview) -> np.ndarray:
+    """
+    Returns the array packed by `pack_array`, as a read-only view on the binary (no copy is made).
+    """
+    magic, version, dtype_length = _PREFIX.unpack_from(binary, 0)
+    if magic != MAGIC:
+        raise ValueError("can not unpack array: binary does not start with the expected header")
+    if version != VERSION:
+        raise ValueError(f"can not unpack array: unsupported format version {version}")
+
+    offset = _PREFIX.size
+    dtype = np.dtype(bytes(binary[offset:offset + dtype_length]).decode('ascii'))
+    offset += dtype_length
+    ndim = struct.unpack_from('<B', binary, offset)[0]
+    offset += 1
+    shape = tuple(_DIMENSION.unpack_from(binary, offset + i * _DIMENSION.size)[0] for i in range(ndim))
+    offset += ndim * _DIMENSION.size
+    offset += -offset % _ALIGNMENT
+
+    count = int(np.prod(shape, dtype=np.int64))
+    array = np.reshape(np.frombuffer(binary, dtype=dtype, count=count, offset=offset), shape)
+    array.flags.writeable = False
+    return array
+
+
+def encode_array(array: np.ndarray) -> str:
+    """Returns the packed array (see `pack_array`) as base64 text, for embedding in json"""
+    return base64.b64encode(pack_array(array)).decode('ascii')
+
+
+def decode_array(text: str) -> np.ndarray:
+    """Returns the array encoded by `encode_array`, as read-only array"""
+    return unpack_array(base64.b64decode(text))
+
+
+def _header(dtype: np.dtype, shape: tuple) -> bytes:
+    if dtype.hasobject:
+        raise TypeError("can not pack arrays of python objects")
+    dtype_string = dtype.str.encode('ascii')
+    header = (_PREFIX.pack(MAGIC, VERSION, len(dtype_string))
+              + dtype_string
+              + struct.pack('<B', len(shape))
+              + b''.join(_DIMENSION.pack(dim) for dim in shape))
+    return header + b'\0' * (-len(header) % _ALIGNMENT)
+
+
+class PackedMatrixBuilder:
+    """
+    Builds a packed 2d array (see `pack_array`) row by row, without knowing the final row count in advance.
+
+    Rows are converted in blocks and written straight into a growing buffer that already has the packed layout,
+    such that the finished binary does not need to be copied from an intermediate array.
+    """
+
+    def __init__(self, n_cols: int, dtype=np.float64, block_size: int = 1024) -> None:
+        self._n_cols = n_cols
+        self._dtype = np.dtype(dtype)
+        self._block_size = block_size
+        self._block: list[Sequence] = []
+        self._n_rows = 0
+        # the header has fixed length for a fixed dtype and dimension count, so we can reserve it up front
+        self._offset = len(_header(self._dtype, (0, n_cols)))
+        self._buffer = np.zeros(self._offset + block_size * self._row_bytes, dtype=np.uint8)
+
+    @property
+    def _row_bytes(self) -> int:
+        return self._n_cols * self._dtype.itemsize
+
+    @property
+    def n_rows(self) -> int:
+        """Number of rows appended so far"""
+        return self._n_rows + len(self._block)
+
+    def append(self, row: Sequence) -> None:
+        """
+        Appends a row of numbers (or strings representing numbers).
+        Raises ValueError if the row can not be converted (possibly only on a later call, as rows are buffered).
+        """
+        self._block.append(row)
+        if len(self._block) >= self._block_size:
+            self._flush()
+
+    def to_binary(self) -> memoryview:
+        """Returns the packed matrix (as a view on the internal buffer). The builder must not be used afterwards."""
+        self._flush()
+        self._buffer.resize(self._offset + self._n_rows * self._row_bytes, refcheck=False)
+        self._buffer[:self._offset] = np.frombuffer(_header(self._dtype, (self._n_rows, self._n_cols)), dtype=np.uint8)
+        return memoryview(self._buffer)
+
+    def _flush(self) -> None:
+        if not self._block:
+            return
+        block = np.asarray(self._block, dtype=self._dtype)
+        if block.shape != (len(self._block), self._n_cols):
+            raise ValueError(f"can not pack rows of shape {block.shape}, expected {self._n_cols} columns")
+
+        start = self._offset + self._n_rows * self._row_bytes
+        end = start + block.nbytes
+        if end > len(self._buffer):
+            # grow geometrically (in place, where the allocator allows), keeping reallocations logarithmic in row count
+            self._buffer.resize(max(end, 2 * len(self._buffer)), refcheck=False)
+        self._buffer[start:end] = block.view(np.uint8).ravel()
+        self._n_rows += len(self._block)
+        self._block = []
@@ -0,0 +1,145 @@
+"""
+Per-process caches, used to avoid repeated parsing and deserialization of database content
+"""
+# region imports
+# standard
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional
+
+# 3rd party
+import numpy as np
+
+# local
+
+# type hints
+
+# endregion
+
+
+@dataclass(frozen=True)
+class CacheStatistics:
+    """Snapshot of the counters of a cache"""
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    """Total size of the cached values (in the unit of the caches `size_of` function)"""
+    max_size: int
+
+
+class LruCache:
+    """
+    Thread-safe least-recently-used cache, bounded by the total size of its values.
+    The size of a value is given by `size_of`. By default every value has size 1, i.e. the number of entries is bounded.
+    """
+
+    def __init__(self, max_size: int, size_of: Callable[[Any], int] = lambda value: 1) -> None:
+        self._max_size = max_size
+        self._size_of = size_of
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._size = 0
+        self._counts: Counter[str] = Counter()
+        """Hits, misses and evictions"""
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value (marking it as recently used), or the default if the key is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counts['misses'] += 1
+                return default
+            self._counts['hits'] += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get_or_create(self, key: Hashable, create: Callable[[], Any]) -> Any:
+        """Returns the cached value, creating and caching it first if the key is not cached"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            # create outside the lock, such that other threads are not blocked meanwhile
+            value = self.put(key, create())
+        return value
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        """Caches and returns the value, evicting least recently used values if the size limit is exceeded"""
+        value = self._prepare(value)
+        size = self._size_of(value)
+        if size > self._max_size:
+            # would evict everything else and still not fit
+            return value
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self._max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self._counts['evictions'] += 1
+        return value
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Removes all values whose key satisfies the predicate"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Removes all values (the counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def statistics(self) -> CacheStatistics:
+        """Returns a snapshot of the cache counters"""
+        with self._lock:
+            return CacheStatistics(self._counts['hits'], self._counts['misses'], self._counts['evictions'],
+                                   len(self._entries), self._size, self._max_size)
+
+    def _prepare(self, value: Any) -> Any:
+        """Hook to transform values before they are cached"""
+        return value
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+
+class ArrayCache(LruCache):
+    """
+    Cache for numpy arrays, bounded by their total memory in bytes.
+    Arrays are stored as contiguous read-only copies, such that cached values can be shared safely.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(max_bytes, size_of=lambda array: array.nbytes)
+
+    def _prepare(self, value: np.ndarray) -> np.ndarray:
+        array = np.array(value, order='C', copy=True)
+        array.flags.writeable = False
+        return array
+
+
+def nbytes_of(value: Any, _seen: Optional[set[int]] = None) -> int:
+    """
+    Approximate memory of an object in bytes, counting the numpy arrays it (recursively) holds in its attributes,
+    containers and dataclass fields. Other objects are not counted, as arrays are what dominates for models.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(nbytes_of(item, seen) for item in value)
+    if isinstance(value, dict):
+        return sum(nbytes_of(item, seen) for item in value.values())
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sum(nbytes_of(item, seen) for item in vars(value).values())
+    return 0
@@ -0,0 +1,96 @@
+"""
+Compression of stored text blobs, with a small header naming the codec and the uncompressed size
+"""
+# region imports
+# standard
+import bz2
+import lzma
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+# 3rd party
+
+# local
+
+# type hints
+
+# endregion
+
+CODECS = ('none', 'zlib', 'bz2', 'lzma')
+"""Supported codecs, their index is stored in the header of each blob"""
+
+LEVELS = {'none': range(0), 'zlib': range(0, 10), 'bz2': range(1, 10), 'lzma': range(0, 10)}
+"""Compression levels each codec accepts (besides None, the codecs default)"""
+
+_HEADER = struct.Struct('<BQ')  # codec index, size of the uncompressed (utf-8 encoded) text
+
+
+@dataclass(frozen=True)
+class BlobSizes:
+    """Sizes of a stored text, in bytes"""
+    stored: int
+    """Size in the database (compressed, including the header)"""
+    logical: int
+    """Size of the (utf-8 encoded) text"""
+
+    @property
+    def ratio(self) -> float:
+        return self.stored / self.logical if self.logical > 0 else 1.0
+
+
+def check_level(codec: str, level: Optional[int]) -> None:
+    """Raises ValueError if the codec is unknown or does not accept the level (see `LEVELS`)"""
+    if codec not in LEVELS:
+        raise ValueError(f"unknown compression codec '{codec}', expected one of {CODECS}")
+    if level is not None and level not in LEVELS[codec]:
+        levels = LEVELS[codec]
+        expected = f"{levels.start}-{levels.stop - 1}" if levels else "no level"
+        raise ValueError(f"invalid compression level {level} for codec '{codec}', expected {expected}")
+
+
+def compress(text: str, codec: str = 'zlib', level: Optional[int] = None) -> bytes:
+    """
+    Returns the text compressed with the codec, prefixed by a header such that `decompress` does not need to know the
+    codec. The level is codec specific (see `LEVELS`, defaults to the codecs default).
+    Raises ValueError if the codec does not accept the level.
+    """
+    check_level(codec, level)
+    raw = text.encode('utf-8')
+    match codec:
+        case 'none':
+            body = raw
+        case 'zlib':
+            body = zlib.compress(raw, -1 if level is None else level)
+        case 'bz2':
+            body = bz2.compress(raw, 9 if level is None else level)
+        case 'lzma':
+            body = lzma.compress(raw, preset=level)
+        case _:
+            raise ValueError(f"unknown compression codec '{codec}', expected one of {CODECS}")
+    return _HEADER.pack(CODECS.index(codec), len(raw)) + body
+
+
+def decompress(blob: bytes | memoryview) -> str:
+    """Returns the text of a blob created by `compress`"""
+    codec_index, _ = _HEADER.unpack_from(blob, 0)
+    body = memoryview(blob)[_HEADER.size:]
+    match CODECS[codec_index] if codec_index < len(CODECS) else None:
+        case 'none':
+            raw = bytes(body)
+        case 'zlib':
+            raw = zlib.decompress(body)
+        case 'bz2':
+            raw = bz2.decompress(body)
+        case 'lzma':
+            raw = lzma.decompress(body)
+        case _:
+            raise ValueError(f"can not decompress blob: unknown codec index {codec_index}")
+    return raw.decode('utf-8')
+
+
+def sizes(blob: bytes | memoryview) -> BlobSizes:
+    """Returns the stored and logical size of a blob created by `compress`, without decompressing it"""
+    _, logical = _HEADER.unpack_from(blob, 0)
+    return BlobSizes(len(blob), logical)
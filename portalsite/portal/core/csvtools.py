@@ -1,33 +1,80 @@
 """
 CSV data parsing for uploaded measurements
 """
+import codecs
 import csv
+import io
+import json
+from typing import Iterator
 
+import numpy as np
 from django.core.files.uploadedfile import UploadedFile
 from .dataclasses import CsvContent, ValidationResult
 
 
 class CsvParser:
-    """Wrapper, combining django.core.files.uploadedfile with csv.DictReader"""
+    """Wrapper, combining django.core.files.uploadedfile with csv.reader, reading the file chunk by chunk"""
 
     @staticmethod
     def read(file: UploadedFile) -> CsvContent:
         """Read the uploaded file and return the content"""
-        # validation
-        if file.multiple_chunks():
-            raise Exception("File to large too handle (multiple_chunks expected)")
+        rows = CsvParser.iter_rows(file)
+        headers = next(rows, [])
+        return CsvContent(headers, list(rows))
 
-        # read data
+    @staticmethod
+    def iter_rows(file: UploadedFile, encoding: str = 'utf-8') -> Iterator[list[str]]:
+        """
+        Yields the (non-empty) rows of the uploaded file, starting with the headers.
+        The file is decoded and parsed chunk by chunk, such that it is never held in memory as a whole.
+        """
         file.open()
-        reader = csv.DictReader(file.read().decode('utf-8').splitlines())
-        headers = list(reader.fieldnames)
-        rows = [list(row.values()) for row in reader]
-        file.close()
+        try:
+            for row in csv.reader(CsvParser._iter_lines(file, encoding)):
+                if row:
+                    yield row
+        finally:
+            file.close()
+
+    @staticmethod
+    def _iter_lines(file: UploadedFile, encoding: str) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        remainder = ''
+        for chunk in file.chunks():
+            lines = (remainder + decoder.decode(chunk)).splitlines(keepends=True)
+            # the last line might continue in the next chunk
+            remainder = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+            yield from lines
+        remainder += decoder.decode(b'', final=True)
+        if remainder:
+            yield remainder
+
+
+class CsvJsonWriter:
+    """Writes the json format of `CsvContent` incrementally, row by row, without keeping the rows as python lists"""
 
-        return CsvContent(headers, rows)
+    def __init__(self, headers: list[str]) -> None:
+        self._text = io.StringIO()
+        self._text.write('{"object_type": "CsvContent", "headers": ' + json.dumps(headers) + ', "rows": [')
+        self._separator = ''
+
+    def write(self, row: list[str]) -> None:
+        """Appends a row"""
+        self._text.write(self._separator)
+        self._text.write(json.dumps(row))
+        self._separator = ', '
+
+    def to_json(self) -> str:
+        """Returns the json text, equivalent to `CsvContent.to_json` of the written content"""
+        return self._text.getvalue() + ']}'
 
 
 class NumericCsvValidator:
+    """Validates csv content to be numeric, checking all rows and columns in bulk"""
+
+    MAX_REPORTED_LOCATIONS = 10
+    """Maximal number of offending locations listed per finding"""
+
     @classmethod
     def is_float(cls, text: str) -> bool:
         try:
@@ -37,41 +84,95 @@ class NumericCsvValidator:
             return False
 
     @classmethod
-    def validate(cls, csv_content: CsvContent) -> list[ValidationResult]:
+    def validate(cls, csv_content: CsvContent, max_locations: int = MAX_REPORTED_LOCATIONS) -> list[ValidationResult]:
+        """
+        Returns one aggregated result per failed check (none if the content is valid), each listing its count of
+        occurrences and (at most `max_locations` of) the first offending locations.
+        """
         header_count = len(csv_content.headers)
-        results = []
-
-        # check headers have text and not pure values
-        float_headers = []
-        for header in csv_content.headers:
-            if NumericCsvValidator.is_float(header):
-                float_headers.append(header)
-        if len(float_headers) > 0:
+        results = cls._check_headers(csv_content.headers)
+
+        # check row lengths, marking rows without data with -1
+        rows = csv_content.rows
+        lengths = np.fromiter((len(row) if isinstance(row, list) else -1 for row in rows),
+                              dtype=np.int64, count=len(rows))
+
+        empty_rows = np.flatnonzero(lengths < 0)
+        if len(empty_rows) > 0:
+            locations = [(int(row_nr),) for row_nr in empty_rows[:max_locations]]
             results.append(
                 ValidationResult(
-                    False, "Numeric value in header",
-                    details=f"Found {len(float_headers)} headers with numeric values: {','.join(float_headers)}"))
-
-        # check all rows have float content
-        for row_nr in range(len(csv_content.rows)):
-            row = csv_content.rows[row_nr]
-            if not isinstance(row, list):
-                results.append(ValidationResult(False, "Empty row",
-                                                details=f"Row {row_nr} has no data"))
-            elif len(row) != header_count:
-                results.append(
-                    ValidationResult(
-                        False, "Nr of entries is incosistent",
-                        details=f"Row {row_nr} has {len(row)} entries, but file has {header_count} headers"))
-            else:
-                for column_nr in range(len(row)):
-                    entry = row[column_nr]
-                    if not isinstance(entry, str):
-                        # this should not happen, so we throw
-                        raise Exception("Expected string - something really bad happened")
-                    if not NumericCsvValidator.is_float(entry):
-                        results.append(
-                            ValidationResult(
-                                False, "Not a float",
-                                details=f"Row {row_nr}, column {column_nr}: Can not parse '{entry}' as float."))
+                    False, "Empty row",
+                    details=f"{len(empty_rows)} rows have no data, first at rows: "
+                    + ", ".join(str(location[0]) for location in locations),
+                    count=len(empty_rows),
+                    locations=locations))
+
+        inconsistent_rows = np.flatnonzero((lengths >= 0) & (lengths != header_count))
+        if len(inconsistent_rows) > 0:
+            locations = [(int(row_nr),) for row_nr in inconsistent_rows[:max_locations]]
+            results.append(
+                ValidationResult(
+                    False, "Nr of entries is incosistent",
+                    details=f"{len(inconsistent_rows)} rows have a different nr of entries than the "
+                    + f"{header_count} headers, first at rows: "
+                    + ", ".join(f"{location[0]} ({lengths[location[0]]} entries)" for location in locations),
+                    count=len(inconsistent_rows),
+                    locations=locations))
+
+        # check all entries of consistent rows are floats
+        consistent_rows = np.flatnonzero(lengths == header_count)
+        cells = [rows[row_nr] for row_nr in consistent_rows] if len(consistent_rows) < len(rows) else rows
+        bad_rows, bad_columns = cls._find_non_floats(cells)
+        if len(bad_rows) > 0:
+            locations = [(int(consistent_rows[row]), int(column))
+                         for row, column in zip(bad_rows[:max_locations], bad_columns[:max_locations])]
+            results.append(
+                ValidationResult(
+                    False, "Not a float",
+                    details=f"{len(bad_rows)} entries can not be parsed as float, first at: "
+                    + ", ".join(f"row {row_nr}, column {column_nr} ('{rows[row_nr][column_nr]}')"
+                                for row_nr, column_nr in locations),
+                    count=len(bad_rows),
+                    locations=locations))
+
         return results
+
+    @classmethod
+    def _check_headers(cls, headers: list[str]) -> list[ValidationResult]:
+        """Checks the headers have text and not pure values"""
+        float_headers = [header for header in headers if cls.is_float(header)]
+        if len(float_headers) == 0:
+            return []
+        return [ValidationResult(
+            False, "Numeric value in header",
+            details=f"Found {len(float_headers)} headers with numeric values: {','.join(float_headers)}",
+            count=len(float_headers))]
+
+    @classmethod
+    def _find_non_floats(cls, rows: list[list[str]], block_size: int = 4096) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the (row, column) indices of entries that do not parse as float, in row-major order.
+        Blocks of rows are converted at once, only the columns of failing blocks are checked entry by entry.
+        """
+        found_rows = [np.empty(0, dtype=np.int64)]
+        found_columns = [np.empty(0, dtype=np.int64)]
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            try:
+                np.asarray(block, dtype=float)
+                continue
+            except ValueError:
+                pass
+
+            cells = np.asarray(block, dtype=str)
+            invalid = np.zeros(cells.shape, dtype=bool)
+            for column_nr in range(cells.shape[1]):
+                try:
+                    cells[:, column_nr].astype(float)
+                except ValueError:
+                    invalid[:, column_nr] = [not cls.is_float(entry) for entry in cells[:, column_nr]]
+            block_rows, block_columns = np.nonzero(invalid)
+            found_rows.append(block_rows + start)
+            found_columns.append(block_columns)
+        return np.concatenate(found_rows), np.concatenate(found_columns)
@@ -2,18 +2,24 @@
 Defines the data handler interface/ABC
 """
 # standard
+import io
+import zipfile
 from abc import ABC, abstractmethod
-from typing import TypeAlias
+from hashlib import sha256
+from itertools import islice
+from typing import Iterator, Optional, TypeAlias
 from json import loads, dumps
 
 # 3rd party
+import numpy as np
 from numpy import ndarray, asarray
 from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import UploadedFile
 
 # local
-from .csvtools import CsvParser, NumericCsvValidator
-from .dataclasses import ValidationResult, CsvContent
+from .arraypacking import PackedMatrixBuilder, decode_array, encode_array, pack_array, unpack_array
+from .csvtools import CsvJsonWriter, CsvParser, NumericCsvValidator
+from .dataclasses import ColumnSummary, CsvContent, DataPreview, ValidationResult
 from .named_id_manager import NamedIdObject
 
 DataStorageType: TypeAlias = str
@@ -22,11 +28,24 @@ DataStorageType: TypeAlias = str
 
 class DataHandler(ABC, NamedIdObject):
     """Tooling to validate and transform measurement data"""
+    supports_packing: bool = False
+    """Whether the numeric content can be packed to binary (see `PackingDataHandler`)"""
+
     @property
     @abstractmethod
     def description(self) -> str:
         """Description of the handler and its source data, possbily refering to external docs"""
 
+    @property
+    @abstractmethod
+    def file_extension(self) -> str:
+        """Extension (including the dot) of the files served by `to_file`"""
+
+    @property
+    @abstractmethod
+    def content_type(self) -> str:
+        """Content (MIME) type of the files served by `to_file`"""
+
     @abstractmethod
     def validate(self, data: DataStorageType) -> list[ValidationResult]:
         """Validate the data"""
@@ -35,10 +54,21 @@ class DataHandler(ABC, NamedIdObject):
     def load_from_file(self, file: UploadedFile) -> DataStorageType:
         """Tries to read data from file (without validation)."""
 
+    def load_packed_from_file(self, file: UploadedFile) -> tuple[DataStorageType, Optional[bytes]]:
+        """
+        Tries to read data from file (without validation), packing its numeric content (see `to_binary`) in the
+        same pass. The packed part is None if the handler does not support packing or the content can not be packed.
+        """
+        return self.load_from_file(file), None
+
     @abstractmethod
     def to_file(self, data: DataStorageType) -> ContentFile:
         """Returns the data formatted to a ContentFile, to be served in a download"""
 
+    @abstractmethod
+    def iter_file(self, data: DataStorageType) -> Iterator[bytes]:
+        """Yields the file content of `to_file` piece by piece, to be streamed in a download"""
+
     @abstractmethod
     def to_json(self, data: DataStorageType, indent=None) -> str:
         """Returns the data formatted to json"""
@@ -47,6 +77,18 @@ class DataHandler(ABC, NamedIdObject):
     def to_displaytext(self, data: DataStorageType) -> str:
         """Returns the data formatted as text to be displayed"""
 
+    @abstractmethod
+    def preview(self,
+                data: DataStorageType,
+                row_start: int,
+                row_count: int,
+                column_start: int,
+                column_count: int) -> DataPreview:
+        """
+        Returns a window of rows and model input columns, with summary statistics of the window, to be displayed.
+        Reads no further into the data than needed for the window.
+        """
+
     @abstractmethod
     def to_model_input(self, data: DataStorageType) -> ndarray:
         """Returns the model input part of the data as numpy array, suitable for scroing and training"""
@@ -55,10 +97,69 @@ class DataHandler(ABC, NamedIdObject):
     def to_model_target(self, data: DataStorageType) -> ndarray:
         """Returns the model target (or 'label') of the data as numpy array, suitable for training"""
 
+    def to_binary(self, data: DataStorageType) -> Optional[bytes]:  # pylint: disable=unused-argument
+        """
+        Returns the numeric content of the data packed to binary (see `arraypacking`), to be stored alongside the data.
+        Returns None if the handler does not support packing.
+        """
+        return None
+
+    @abstractmethod
+    def digest(self, data: DataStorageType, binary: Optional[bytes] = None) -> str:
+        """
+        Returns a hash (hex string) identifying the content of the data, for deduplication of stored data.
+        Data that only differs in formatting may have the same digest. The binary (see `to_binary`) is passed if known.
+        """
+
+
+
+class PackingDataHandler(DataHandler):
+    """
+    Data handler whose numeric content can be packed to binary, such that the model input and target are read from
+    the packed matrix (or a memory map of it) without parsing the data
+    """
+    supports_packing = True
+
+    @abstractmethod
+    def load_packed_from_file(self, file: UploadedFile) -> tuple[DataStorageType, Optional[bytes]]:
+        """
+        Tries to read data from file (without validation), packing its numeric content (see `to_binary`) in the
+        same pass. The packed part is None if the content can not be packed.
+        """
+
+    @abstractmethod
+    def to_binary(self, data: DataStorageType) -> bytes:
+        """
+        Returns the numeric content of the data packed to binary (see `arraypacking`), to be stored alongside the data.
+        Raises ValueError if the content can not be packed.
+        """
+
+    @abstractmethod
+    def matrix_to_model_input(self, matrix: ndarray) -> ndarray:
+        """Returns the model input part of the unpacked binary data (e.g. a memory map), as view where possible"""
+
+    @abstractmethod
+    def matrix_to_model_target(self, matrix: ndarray) -> ndarray:
+        """Returns the model target part of the unpacked binary data (e.g. a memory map), as view where possible"""
+
+    def binary_to_model_input(self, binary: bytes) -> ndarray:
+        """Returns the model input part of binary data (as returned by `to_binary`), without parsing"""
+        return self.matrix_to_model_input(unpack_array(binary))
+
+    def binary_to_model_target(self, binary: bytes) -> ndarray:
+        """Returns the model target part of binary data (as returned by `to_binary`), without parsing"""
+        return self.matrix_to_model_target(unpack_array(binary))
+
 
-class NumericCsvHandler(DataHandler):
+class NumericCsvHandler(PackingDataHandler):
     """Simple data type for development and testing.\nThe target values are assumed to be within the first column"""
 
+    def __init__(self, dtype: str = 'float64') -> None:
+        """The dtype ('float64' or 'float32') of the parsed and packed numbers - float32 halves their size"""
+        self._dtype = np.dtype(dtype)
+        if self._dtype not in (np.float64, np.float32):
+            raise ValueError(f"unsupported dtype '{dtype}' for numeric csv data, expected 'float64' or 'float32'")
+
     @property
     def id_(self) -> str:
         return "NumericCsv"
@@ -71,21 +172,68 @@ class NumericCsvHandler(DataHandler):
     def description(self) -> str:
         return self.__doc__
 
+    @property
+    def file_extension(self) -> str:
+        return ".csv"
+
+    @property
+    def content_type(self) -> str:
+        return "application/csv"
+
     def validate(self, data: DataStorageType) -> list[ValidationResult]:
         """Validate the data meets requirements"""
         return NumericCsvValidator.validate(CsvContent.from_json(data))
 
     def load_from_file(self, file: UploadedFile) -> DataStorageType:
         """Tries to read data from file (without validation)."""
-        return CsvParser.read(file).to_json()
+        rows = CsvParser.iter_rows(file)
+        writer = CsvJsonWriter(next(rows, []))
+        for row in rows:
+            writer.write(row)
+        return writer.to_json()
+
+    def load_packed_from_file(self, file: UploadedFile) -> tuple[DataStorageType, Optional[bytes]]:
+        """
+        Tries to read data from file (without validation), streaming the rows into the json text and the packed
+        numeric matrix at the same time. The packed part is None if some entry is not numeric.
+        """
+        rows = CsvParser.iter_rows(file)
+        headers = next(rows, [])
+        writer = CsvJsonWriter(headers)
+        matrix = PackedMatrixBuilder(len(headers), dtype=self._dtype)
+        for row in rows:
+            writer.write(row)
+            if matrix is not None:
+                try:
+                    matrix.append(row)
+                except ValueError:
+                    # not packable, the (later) validation will report the details
+                    matrix = None
+
+        packed_data = None
+        if matrix is not None:
+            try:
+                packed_data = matrix.to_binary()
+            except ValueError:
+                pass
+        return writer.to_json(), packed_data
 
     def to_file(self, data: DataStorageType) -> ContentFile:
         """Returns the data formatted to a ContentFile, to be served in a download"""
-        csv = CsvContent.from_json(data)
-        contentstring = ",".join(csv.headers)+"\n"
-        for row in csv.rows:
-            contentstring += ",".join(row)+"\n"
-        return ContentFile(contentstring)
+        return ContentFile(b"".join(self.iter_file(data)))
+
+    def iter_file(self, data: DataStorageType, rows_per_piece: int = 1024) -> Iterator[bytes]:
+        """Yields the csv text in pieces of several rows, decoding the rows from the json data only as needed"""
+        headers, rows = CsvContent.iter_from_json(data)
+        yield (",".join(headers)+"\n").encode()
+        lines = []
+        for row in rows:
+            lines.append(",".join(row)+"\n")
+            if len(lines) >= rows_per_piece:
+                yield "".join(lines).encode()
+                lines = []
+        if lines:
+            yield "".join(lines).encode()
 
     def to_json(self, data: DataStorageType, indent=None) -> str:
         """Returns the data formatted to json"""
@@ -95,12 +243,278 @@ class NumericCsvHandler(DataHandler):
         """Returns the data formatted as text to be displayed"""
         return dumps(loads(data), indent=2)
 
+    def preview(self,
+                data: DataStorageType,
+                row_start: int,
+                row_count: int,
+                column_start: int,
+                column_count: int) -> DataPreview:
+        """Returns a window of the csv, decoding the rows from the json data only up to the end of the window"""
+        headers, rows = CsvContent.iter_from_json(data)
+        # one more row than needed, to know whether there are more
+        window = list(islice(rows, row_start, row_start + row_count + 1))
+        columns = slice(1 + column_start, 1 + column_start + column_count)
+        column_names = headers[columns]
+        rows_window = [row[columns] for row in window[:row_count]]
+        return DataPreview(
+            row_start=row_start,
+            column_start=column_start,
+            column_names=column_names,
+            rows=rows_window,
+            targets=[row[0] if row else "" for row in window[:row_count]],
+            summaries=_summarize(column_names, rows_window),
+            n_columns=max(len(headers) - 1, 0),
+            has_more_rows=len(window) > row_count)
+
     def to_model_input(self, data: DataStorageType) -> ndarray:
         """Returns the model input part of the data as numpy array, suitable for scroing and training."""
-        model_input = [[float(val) for val in row[1:]] for row in CsvContent.from_json(data).rows]
-        return asarray(model_input)
+        return self._to_matrix(data)[:, 1:]
 
     def to_model_target(self, data: DataStorageType) -> ndarray:
         """Returns the model target (or 'label') of the data as numpy array, suitable for training"""
-        model_target = [float(row[0]) for row in CsvContent.from_json(data).rows]
-        return asarray(model_target)
+        return self._to_matrix(data)[:, 0]
+
+    def to_binary(self, data: DataStorageType) -> bytes:
+        """Returns the full numeric matrix (target in the first column) packed to binary"""
+        return pack_array(self._to_matrix(data))
+
+    def digest(self, data: DataStorageType, binary: Optional[bytes] = None) -> str:
+        """
+        Returns the sha256 of the headers and the packed numeric matrix, such that the formatting of numbers
+        (e.g. '1' vs '1.0') does not matter. Falls back to the json text if the data is not numeric.
+        """
+        hasher = sha256(self.id_.encode())
+        if binary is None:
+            try:
+                binary = self.to_binary(data)
+            except ValueError:
+                hasher.update(data.encode())
+                return hasher.hexdigest()
+        headers, _ = CsvContent.iter_from_json(data)
+        hasher.update(dumps(headers).encode())
+        hasher.update(binary)
+        return hasher.hexdigest()
+
+    def matrix_to_model_input(self, matrix: ndarray) -> ndarray:
+        """Returns the model input part of the unpacked binary data (e.g. a memory map), as view"""
+        return matrix[:, 1:]
+
+    def matrix_to_model_target(self, matrix: ndarray) -> ndarray:
+        """Returns the model target part of the unpacked binary data (e.g. a memory map), as view"""
+        return matrix[:, 0]
+
+    def _to_matrix(self, data: DataStorageType) -> ndarray:
+        csv = CsvContent.from_json(data)
+        # numpy converts the strings itself - raises ValueError on non-numeric entries or inconsistent row lengths
+        return asarray(csv.rows, dtype=self._dtype).reshape(len(csv.rows), len(csv.headers))
+
+
+class NumpyArraysHandler(PackingDataHandler):
+    """
+    Numpy arrays, uploaded as .npz file with a 2d array 'input' and an optional 1d array 'target'
+    (or as .npy file with just the input). The arrays are stored in their binary form, without conversion,
+    and packed to one floating point matrix with the target in the first column (a column of NaN if there is none).
+    """
+
+    @property
+    def id_(self) -> str:
+        return "NumpyArray"
+
+    @property
+    def name(self) -> str:
+        return "NumpyArrays"
+
+    @property
+    def description(self) -> str:
+        return self.__doc__
+
+    @property
+    def file_extension(self) -> str:
+        return ".npz"
+
+    @property
+    def content_type(self) -> str:
+        return "application/octet-stream"
+
+    def validate(self, data: DataStorageType) -> list[ValidationResult]:
+        """Validate the arrays are numeric, finite and of matching shape"""
+        model_input = self.to_model_input(data)
+        model_target = self.to_model_target(data)
+        results = []
+        if model_input.ndim != 2:
+            results.append(ValidationResult(False, "Input is not a matrix",
+                                            f"The input has {model_input.ndim} dimensions, expected 2"))
+        for part, array in (("input", model_input), ("target", model_target)):
+            if array.dtype.kind not in 'biuf':
+                results.append(ValidationResult(False, "Not numeric", f"The {part} has data type '{array.dtype}'"))
+                continue
+            non_finite = np.argwhere(~np.isfinite(array))
+            if len(non_finite) > 0:
+                locations = [tuple(int(index) for index in location) for location in non_finite[:10]]
+                results.append(ValidationResult(
+                    False, "Not finite",
+                    f"{len(non_finite)} {part} entries are NaN or infinite, first at: "
+                    + ", ".join(str(location) for location in locations),
+                    count=len(non_finite),
+                    locations=locations))
+        if model_target.size > 0 and (model_target.ndim != 1 or len(model_target) != len(model_input)):
+            results.append(ValidationResult(False, "Target shape mismatch",
+                                            f"The target has shape {model_target.shape}, expected "
+                                            + f"({len(model_input)},)"))
+        return results
+
+    def load_from_file(self, file: UploadedFile) -> DataStorageType:
+        """Tries to read the arrays from a .npz or .npy file (without validation)."""
+        return self._to_data(*self._load_arrays(file))
+
+    def load_packed_from_file(self, file: UploadedFile) -> tuple[DataStorageType, Optional[bytes]]:
+        """
+        Tries to read the arrays from a .npz or .npy file (without validation), packing them from the loaded arrays.
+        The packed part is None if the arrays can not be packed.
+        """
+        model_input, model_target = self._load_arrays(file)
+        try:
+            packed_data = self._pack(model_input, model_target)
+        except ValueError:
+            packed_data = None
+        return self._to_data(model_input, model_target), packed_data
+
+    @staticmethod
+    def _load_arrays(file: UploadedFile) -> tuple[ndarray, Optional[ndarray]]:
+        """Reads the input and target (None if missing) from the file object, which numpy reads (and seeks) itself"""
+        file.seek(0)
+        try:
+            loaded = np.load(file, allow_pickle=False)
+        except (OSError, ValueError, zipfile.BadZipFile) as exc:
+            raise ValueError(f"Failed to read numpy file: {exc}") from exc
+
+        if not isinstance(loaded, np.lib.npyio.NpzFile):
+            return loaded, None
+        with loaded:
+            if 'input' not in loaded.files:
+                raise ValueError(f"The npz file has no array 'input' (found: {', '.join(loaded.files)})")
+            return loaded['input'], loaded['target'] if 'target' in loaded.files else None
+
+    @staticmethod
+    def _to_data(model_input: ndarray, model_target: Optional[ndarray]) -> DataStorageType:
+        return dumps({
+            "object_type": "NumpyArrays",
+            "input": encode_array(model_input),
+            "target": encode_array(model_target) if model_target is not None else None
+        })
+
+    def to_file(self, data: DataStorageType) -> ContentFile:
+        """Returns the arrays as .npz file, to be served in a download"""
+        return ContentFile(b"".join(self.iter_file(data)))
+
+    def iter_file(self, data: DataStorageType) -> Iterator[bytes]:
+        """Yields the .npz file (in one piece, as the archive is written as a whole)"""
+        arrays = {"input": self.to_model_input(data)}
+        model_target = self.to_model_target(data)
+        if model_target.size > 0:
+            arrays["target"] = model_target
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        yield buffer.getvalue()
+
+    def to_json(self, data: DataStorageType, indent=None) -> str:
+        """Returns the arrays formatted to json (as nested lists)"""
+        model_target = self.to_model_target(data)
+        return dumps({
+            "input": self.to_model_input(data).tolist(),
+            "target": model_target.tolist() if model_target.size > 0 else None
+        }, indent=indent)
+
+    def to_displaytext(self, data: DataStorageType) -> str:
+        """Returns the arrays formatted as text to be displayed"""
+        return self.to_json(data, indent=2)
+
+    def preview(self,
+                data: DataStorageType,
+                row_start: int,
+                row_count: int,
+                column_start: int,
+                column_count: int) -> DataPreview:
+        """Returns a window of the arrays, where columns are named by their index"""
+        model_input = self.to_model_input(data)
+        model_target = self.to_model_target(data)
+        if model_input.ndim != 2:
+            model_input = model_input.reshape(len(model_input), -1)
+        rows = slice(row_start, row_start + row_count)
+        columns = slice(column_start, column_start + column_count)
+        column_names = [str(index) for index in range(model_input.shape[1])][columns]
+        rows_window = [[str(value) for value in row] for row in model_input[rows, columns].tolist()]
+        return DataPreview(
+            row_start=row_start,
+            column_start=column_start,
+            column_names=column_names,
+            rows=rows_window,
+            targets=[str(value) for value in model_target[rows].tolist()] if model_target.size > 0 else None,
+            summaries=_summarize(column_names, rows_window),
+            n_columns=model_input.shape[1],
+            has_more_rows=row_start + row_count < len(model_input),
+            n_rows=len(model_input))
+
+    def to_model_input(self, data: DataStorageType) -> ndarray:
+        """Returns the input array, decoded without conversion"""
+        return decode_array(self._to_dict(data)["input"])
+
+    def to_model_target(self, data: DataStorageType) -> ndarray:
+        """Returns the target array (empty if the data has no target), decoded without conversion"""
+        target = self._to_dict(data)["target"]
+        return decode_array(target) if target is not None else np.empty(0)
+
+    def to_binary(self, data: DataStorageType) -> bytes:
+        """Returns the target (or a column of NaN) and input packed as one floating point matrix"""
+        target = self._to_dict(data)["target"]
+        return self._pack(self.to_model_input(data), decode_array(target) if target is not None else None)
+
+    def digest(self, data: DataStorageType, binary: Optional[bytes] = None) -> str:
+        """Returns the sha256 of the stored data (which is the binary content of the arrays)"""
+        return sha256(self.id_.encode() + data.encode()).hexdigest()
+
+    def matrix_to_model_input(self, matrix: ndarray) -> ndarray:
+        """Returns the model input part of the unpacked binary data (e.g. a memory map), as view"""
+        return matrix[:, 1:]
+
+    def matrix_to_model_target(self, matrix: ndarray) -> ndarray:
+        """Returns the model target part of the unpacked binary data (e.g. a memory map) as view, empty if missing"""
+        target = matrix[:, 0]
+        return target[:0] if np.isnan(target).all() else target
+
+    @staticmethod
+    def _pack(model_input: ndarray, model_target: Optional[ndarray]) -> bytes:
+        """Packs the arrays as matrix of their common floating point type. Raises ValueError if they do not fit."""
+        if model_input.ndim != 2 or model_input.dtype.kind not in 'biuf':
+            raise ValueError("Only numeric matrices can be packed")
+        if model_target is not None and (model_target.shape != (len(model_input),)
+                                         or model_target.dtype.kind not in 'biuf'):
+            raise ValueError("The target does not match the rows of the input")
+        dtypes = [model_input.dtype] + ([model_target.dtype] if model_target is not None else [])
+        matrix = np.empty((model_input.shape[0], model_input.shape[1] + 1), dtype=np.result_type(np.float16, *dtypes))
+        matrix[:, 0] = model_target if model_target is not None else np.nan
+        matrix[:, 1:] = model_input
+        return pack_array(matrix)
+
+    @staticmethod
+    def _to_dict(data: DataStorageType) -> dict:
+        json_dict: dict = loads(data)
+        if json_dict.get('object_type') != 'NumpyArrays':
+            raise ValueError("Failed to read json string as NumpyArrays: 'object_type' does not match")
+        return json_dict
+
+
+def _summarize(column_names: list[str], rows: list[list[str]]) -> list[ColumnSummary]:
+    """Returns the summary statistics of each column of the rows (rows may be shorter than the list of names)"""
+    summaries = []
+    for index, name in enumerate(column_names):
+        try:
+            values = np.array([row[index] for row in rows], dtype=float)
+        except (IndexError, ValueError):
+            summaries.append(ColumnSummary(name))
+            continue
+        if len(values) == 0:
+            summaries.append(ColumnSummary(name))
+            continue
+        summaries.append(ColumnSummary(name, float(values.min()), float(values.max()), float(values.mean())))
+    return summaries
@@ -3,8 +3,10 @@ Collection of data classes
 """
 
 import json
+import re
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
 
 
 @dataclass
@@ -15,6 +17,41 @@ class ValidationResult:
     """Descriptive name of the rule/step being validated"""
     details: str
     """Details, i.p. in case of a failure"""
+    count: int = 1
+    """Number of occurrences aggregated in this result"""
+    locations: list[tuple[int, ...]] = field(default_factory=list)
+    """The first few (row, column) or (row,) locations of the occurrences, if applicable"""
+
+
+@dataclass
+class ColumnSummary:
+    """Summary statistics of the values of one column (None if the values are not numeric or there are none)"""
+    name: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    mean: Optional[float] = None
+
+
+@dataclass
+class DataPreview:  # pylint: disable=too-many-instance-attributes
+    """A window of rows and model input columns of the data, to be displayed"""
+    row_start: int
+    """Index of the first row in the window"""
+    column_start: int
+    """Index of the first model input column in the window"""
+    column_names: list[str]
+    rows: list[list[str]]
+    """The model input values of the window, formatted as text"""
+    targets: Optional[list[str]]
+    """The model target values of the rows in the window, formatted as text (None if the data has no targets)"""
+    summaries: list[ColumnSummary]
+    """Summary statistics of the window columns, computed over the rows in the window"""
+    n_columns: int
+    """Total number of model input columns"""
+    has_more_rows: bool
+    """Whether there are rows after the window"""
+    n_rows: Optional[int] = None
+    """Total number of rows, if known without reading all of the data"""
 
 
 @dataclass
@@ -39,3 +76,36 @@ class CsvContent:
         if json_dict['object_type'] != 'CsvContent':
             raise ValueError("Failed to serialize json string as CsvContent: 'object_type' does not match")
         return CsvContent(json_dict["headers"], json_dict["rows"])
+
+    @staticmethod
+    def iter_from_json(json_data: str) -> tuple[list[str], Iterator[list[str]]]:
+        """
+        Returns the headers and an iterator over the rows, where rows are decoded one by one while iterating.
+        This avoids holding all rows as python lists, for json as written by `to_json`.
+        """
+        match = CsvContent._json_prefix.match(json_data)
+        if match is None:
+            csv = CsvContent.from_json(json_data)
+            return csv.headers, iter(csv.rows)
+
+        decoder = json.JSONDecoder()
+        headers, index = decoder.raw_decode(json_data, match.end())
+        match = CsvContent._json_rows_start.match(json_data, index)
+        if match is None:
+            raise ValueError("Failed to serialize json string as CsvContent: missing 'rows'")
+
+        def rows(index: int) -> Iterator[list[str]]:
+            whitespace = CsvContent._json_whitespace
+            index = whitespace.match(json_data, index).end()
+            while json_data[index] != ']':
+                row, index = decoder.raw_decode(json_data, index)
+                yield row
+                index = whitespace.match(json_data, index).end()
+                if json_data[index] == ',':
+                    index = whitespace.match(json_data, index + 1).end()
+
+        return headers, rows(match.end())
+
+    _json_prefix = re.compile(r'\s*\{\s*"object_type"\s*:\s*"CsvContent"\s*,\s*"headers"\s*:\s*')
+    _json_rows_start = re.compile(r'\s*,\s*"rows"\s*:\s*\[')
+    _json_whitespace = re.compile(r'\s*')
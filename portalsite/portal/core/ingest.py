@@ -0,0 +1,202 @@
+"""
+Bulk ingest of measurement files: unpacking of uploads and parallel parsing and validation.
+
+The files are streamed: archive members are read one at a time, and only a few files per worker process are read
+ahead of the results consumed.
+"""
+# region imports
+# standard
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from hashlib import sha256
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, Optional, TypeVar, Union
+
+# 3rd party
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+
+# local
+from .dataclasses import ValidationResult
+
+# type hints
+T = TypeVar('T')
+
+# endregion
+
+
+@dataclass
+class IngestFile:
+    """Content of a single uploaded file, to be parsed"""
+    name: str
+    """Name for the measurement (the file name without extension)"""
+    content: bytes
+
+    def digest(self, data_handler_id: str) -> str:
+        return file_digest(data_handler_id, [self.content])
+
+
+@dataclass
+class IngestResult:
+    """Outcome of parsing and validating a single file"""
+    name: str
+    file_digest: str
+    """Digest of the raw file (see `file_digest`)"""
+    data: Optional[str] = None
+    packed_data: Optional[bytes] = None
+    digest: Optional[str] = None
+    """Digest of the content (see `DataHandler.digest`)"""
+    validation_results: list[ValidationResult] = field(default_factory=list)
+    error: Optional[str] = None
+    """Reason the file could not be read, if so"""
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and all(result.success for result in self.validation_results)
+
+    @property
+    def details(self) -> str:
+        """One line summary of the problems, empty on success"""
+        if self.error is not None:
+            return self.error
+        return "; ".join(f"{result.name}: {result.details}" for result in self.validation_results
+                         if not result.success)
+
+
+def file_digest(data_handler_id: str, chunks: Iterable[bytes]) -> str:
+    """Returns the sha256 (hex string) of the raw file content for the data handler, to recognize repeated uploads"""
+    hasher = sha256(data_handler_id.encode())
+    for chunk in chunks:
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def iter_upload_files(files: list[UploadedFile]) -> Iterator[IngestFile]:
+    """Yields the files of the upload one at a time, where zip archives are replaced by the files they contain"""
+    for name, read in _iter_upload_entries(files):
+        yield IngestFile(name, read())
+
+
+def upload_names(files: list[UploadedFile]) -> list[str]:
+    """The names of the files yielded by `iter_upload_files`, without reading their content"""
+    return [name for name, _ in _iter_upload_entries(files)]
+
+
+def parse_files(data_handler_id: str,
+                files: Iterable[IngestFile],
+                max_workers: int,
+                find_known: Callable[[list[str]], set[str]] = lambda digests: set()) -> Iterator[IngestResult]:
+    """
+    Parses and validates the files with the data handler, in a pool of worker processes if there are several files.
+    Yields the results in the order of the files, reading at most a few files per worker ahead.
+    Files whose digest (see `file_digest`) is returned by `find_known` (asked per batch of files) are not parsed,
+    their result only holds the name and digest.
+    """
+    tasks = _iter_tasks(data_handler_id, files, max(1, max_workers), find_known)
+    if max_workers > 1:
+        # a pool only pays off if there are several files to parse
+        head, n_to_parse = [], 0
+        for task in tasks:
+            head.append(task)
+            n_to_parse += not isinstance(task, IngestResult)
+            if n_to_parse > 1:
+                yield from _parse_in_pool(data_handler_id, chain(head, tasks), max_workers)
+                return
+        tasks = iter(head)
+    for task in tasks:
+        yield task if isinstance(task, IngestResult) else parse_file(data_handler_id, *task)
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Yields lists of `size` consecutive items (the last one may be shorter)"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parse_file(data_handler_id: str, file: IngestFile, digest: Optional[str] = None) -> IngestResult:
+    """Parses and validates a single file with the data handler. The file digest is computed unless given."""
+    # pylint: disable=import-outside-toplevel
+    # (avoids a circular import - the handlers are registered in the package init)
+    from portal.core import DATAHANDLERS
+
+    handler = DATAHANDLERS.get(data_handler_id)
+    result = IngestResult(file.name, digest if digest is not None else file.digest(data_handler_id))
+    try:
+        data, packed_data = handler.load_packed_from_file(ContentFile(file.content, name=file.name))
+        result.validation_results = handler.validate(data)
+    except (UnicodeDecodeError, ValueError) as exc:
+        result.error = f"Failed to read: {exc}"
+        return result
+    result.data = data
+    result.packed_data = bytes(packed_data) if packed_data is not None else None
+    result.digest = handler.digest(data, result.packed_data)
+    return result
+
+
+def _iter_upload_entries(files: list[UploadedFile]) -> Iterator[tuple[str, Callable[[], bytes]]]:
+    """Yields the measurement name of each file of the upload, with a function to read its content"""
+    for file in files:
+        file.seek(0)
+        # by extension, as some data files are zip archives themselves (e.g. numpy .npz)
+        if file.name.lower().endswith('.zip') and zipfile.is_zipfile(file):
+            # reads the members from the (spooled) upload, instead of loading the archive first
+            with zipfile.ZipFile(file) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or _is_hidden(info.filename):
+                        continue
+                    yield _measurement_name(info.filename), partial(archive.read, info)
+        else:
+            yield _measurement_name(file.name), partial(_read_upload, file)
+
+
+def _read_upload(file: UploadedFile) -> bytes:
+    file.seek(0)
+    return file.read()
+
+
+def _iter_tasks(data_handler_id: str,
+                files: Iterable[IngestFile],
+                batch_size: int,
+                find_known: Callable[[list[str]], set[str]]) -> Iterator[Union[IngestResult, tuple[IngestFile, str]]]:
+    """Yields the result of each known file, and (file, digest) of each file to parse"""
+    for batch in batched(files, batch_size):
+        digests = [file.digest(data_handler_id) for file in batch]
+        known = find_known(digests)
+        for file, digest in zip(batch, digests):
+            yield IngestResult(file.name, digest) if digest in known else (file, digest)
+
+
+def _parse_in_pool(data_handler_id: str,
+                   tasks: Iterator[Union[IngestResult, tuple[IngestFile, str]]],
+                   max_workers: int) -> Iterator[IngestResult]:
+    # spawned workers, as forking a (multi-threaded) web worker process is unsafe
+    with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        pending: deque[Union[IngestResult, Future]] = deque()
+        for task in tasks:
+            pending.append(task if isinstance(task, IngestResult)
+                           else executor.submit(parse_file, data_handler_id, *task))
+            # keeps the workers busy, while the files read ahead stay few
+            while len(pending) > 2 * max_workers:
+                yield _pop_result(pending)
+        while pending:
+            yield _pop_result(pending)
+
+
+def _pop_result(pending: deque[Union[IngestResult, Future]]) -> IngestResult:
+    result = pending.popleft()
+    return result if isinstance(result, IngestResult) else result.result()
+
+
+def _measurement_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _is_hidden(path: str) -> bool:
+    # e.g. '__MACOSX/...' resource forks or '.DS_Store' entries, added by some archivers
+    return any(part.startswith(('.', '__MACOSX')) for part in path.split('/'))
@@ -0,0 +1,52 @@
+"""
+Local file storage of numeric matrices as .npy files, read back as memory maps
+"""
+# region imports
+# standard
+import os
+import tempfile
+
+# 3rd party
+import numpy as np
+
+# local
+
+# type hints
+
+# endregion
+
+
+class MatrixFileStore:
+    """
+    Stores matrices as .npy files in a local directory. Reading returns read-only memory maps, such that data is paged
+    in on demand and processes reading the same file share the operating systems page cache.
+    """
+
+    def __init__(self, root: str) -> None:
+        self._root = root
+
+    def save(self, name: str, array: np.ndarray) -> str:
+        """Writes the array to the file '<name>.npy' (replacing it atomically) and returns its relative path"""
+        os.makedirs(self._root, exist_ok=True)
+        path = f"{name}.npy"
+        # write to a temporary file first, such that readers never see a partially written file
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self._root, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                np.save(file, np.ascontiguousarray(array), allow_pickle=False)
+            os.replace(temporary_path, os.path.join(self._root, path))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        return path
+
+    def open(self, path: str) -> np.memmap:
+        """Returns a read-only memory map of the stored array"""
+        return np.load(os.path.join(self._root, path), mmap_mode='r', allow_pickle=False)
+
+    def delete(self, path: str) -> None:
+        """Removes the file, if it exists"""
+        try:
+            os.remove(os.path.join(self._root, path))
+        except FileNotFoundError:
+            pass
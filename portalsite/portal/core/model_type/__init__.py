@@ -2,4 +2,4 @@
 Contains the different prediction models
 """
 
-from .model_type import ModelType
+from .model_type import ModelType, PreprocessingModelType
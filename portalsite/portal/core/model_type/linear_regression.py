@@ -1,14 +1,17 @@
 """Linear regression model"""
 # region imports
 # standard
+import base64
 from json import dumps, loads
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 # 3rd party
 import numpy as np
 from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
 
 # local
+from portal.core.statistics import ColumnStatistics
 from .model_type import ModelStorageType, ModelType
 
 # type hints
@@ -49,7 +52,7 @@ class LinearRegressionModel(ModelType):
 
     def compatible(self, model: 'Model', measurement: 'Measurement') -> bool:
         """Returns true iff the measurement is a valid (prediction) input for the model"""
-        features = len(self.__load_model(model).coef_)
+        features = self.feature_count(model)
         shape: tuple = measurement.model_input().shape
         if len(shape) != 2:
             return False
@@ -57,8 +60,15 @@ class LinearRegressionModel(ModelType):
             return False
         return True
 
+    def feature_count(self, model: 'Model') -> Optional[int]:
+        """Returns the number of input features the model expects"""
+        return len(self.__load_model(model).coef_)
+
     def __load_model(self, model: 'Model') -> LinearRegression:
-        json_data: dict = loads(model.data)
+        return model.deserialized(lambda: self.__parse_model(model.data))
+
+    def __parse_model(self, data: ModelStorageType) -> LinearRegression:
+        json_data: dict = loads(data)
         if ('object_type' not in json_data.keys()
             or 'coef_' not in json_data.keys()
                 or 'intercept_' not in json_data.keys()):
@@ -70,12 +80,21 @@ class LinearRegressionModel(ModelType):
         lreg.intercept_ = json_data['intercept_']
         return lreg
 
-    def __get_model_data(self, lr_model: LinearRegression) -> ModelStorageType:
+    def __get_model_data(self,
+                         lr_model: LinearRegression,
+                         statistics: ColumnStatistics = None,
+                         measurement_keys: list[tuple[int, int]] = None) -> ModelStorageType:
         json_dict = {
             'object_type': self.id_ + "-model_data",
             'coef_': lr_model.coef_.tolist(),
             'intercept_': lr_model.intercept_
         }
+        if statistics is not None:
+            # stored separately, see `split_data`
+            json_dict.update({
+                'statistics': base64.b64encode(statistics.to_binary()).decode('ascii'),
+                'measurements': measurement_keys,
+            })
         return dumps(json_dict)
 
     def score(self, model: 'Model', measurement: 'Measurement') -> float:
@@ -89,18 +108,97 @@ class LinearRegressionModel(ModelType):
         model: LinearRegression = self.__load_model(model)
         return model.predict(measurement.model_input())
 
+    def score_many(self, model: 'Model', measurements: list['Measurement']) -> list[float]:
+        """Returns the models scores, evaluated against each of the _labelled_ measurements (in one product)"""
+        if not measurements:
+            return []
+        matrix, splits = self._stack_rows([measurement.model_input() for measurement in measurements])
+        targets, _ = self._stack_rows([measurement.model_target() for measurement in measurements])
+        predictions = self.__load_model(model).predict(matrix)
+        # the coefficient of determination of each measurement, as in `LinearRegression.score`
+        return [float(r2_score(target, prediction))
+                for target, prediction in zip(np.split(targets, splits), np.split(predictions, splits))]
+
+    def predict_many(self, model: 'Model', measurements: list['Measurement']) -> list[np.ndarray]:
+        """Returns the models predictions of each of the measurements (in one product)"""
+        if not measurements:
+            return []
+        matrix, splits = self._stack_rows([measurement.model_input() for measurement in measurements])
+        return np.split(self.__load_model(model).predict(matrix), splits)
+
     def train(self,
               model: 'Model',
               measurements: list['Measurement'],
-              max_iterations: int,
+              max_iterations: Optional[int],
               max_seconds: int) -> tuple[ModelStorageType, float]:
-        """Trains a model, returning the new model with its score"""
-        X_concat = np.concatenate([m.model_input() for m in measurements], axis=0)
-        y_concat = np.concatenate([m.model_target() for m in measurements], axis=0)
-        lr_current = self.__load_model(model)
-        lr_fitted = lr_current.fit(X_concat, y_concat)
-        score = lr_fitted.score(X_concat, y_concat)
-        return (self.__get_model_data(lr_fitted), score)
+        """
+        Trains a model, returning the new model with its score. The fit is solved from the sufficient statistics of
+        the training data (means and comoments of inputs and target), which are kept with the model: if it was trained
+        on a subset of the measurements before, only the additional measurements are read. Each iteration merges the
+        statistics of one measurement, until the budget is used up (see `ModelType.train`).
+        """
+        keys = [self._measurement_key(measurement) for measurement in measurements]
+        included, statistics = self.__load_statistics(model)
+        if statistics is None or not set(included) <= set(keys):
+            # the statistics can not be reduced, start over
+            included, statistics = [], None
+
+        additional = [measurement for key, measurement in zip(keys, measurements) if key not in included]
+        for measurement in self._within_budget(additional, max_iterations, max_seconds):
+            rows = np.column_stack([measurement.model_input(), measurement.model_target()])
+            contribution = ColumnStatistics.from_matrix(rows)
+            statistics = contribution if statistics is None else statistics.combine(contribution)
+            included = included + [self._measurement_key(measurement)]
+        if statistics is None:
+            raise ValueError("no measurements to train on")
+
+        lr_fitted, score = self.__solve(statistics)
+        return (self.__get_model_data(lr_fitted, statistics, included), score)
+
+    def split_data(self, data: ModelStorageType) -> tuple[ModelStorageType, Optional[ModelStorageType]]:
+        """Splits off the training statistics, which are only needed to retrain"""
+        json_data: dict = loads(data)
+        if 'statistics' not in json_data:
+            return data, None
+        training_data = {
+            'object_type': self.id_ + "-training_data",
+            'statistics': json_data.pop('statistics'),
+            'measurements': json_data.pop('measurements'),
+        }
+        return dumps(json_data), dumps(training_data)
+
+    def __load_statistics(self, model: 'Model') -> tuple[list[tuple[int, int]], Optional[ColumnStatistics]]:
+        """The keys of the measurements the model was trained on and their statistics, if stored with the model"""
+        calibration_data = model.calibration_data
+        if calibration_data is None:
+            return [], None
+        json_data: dict = loads(calibration_data)
+        if json_data.get('object_type') != self.id_ + "-training_data":
+            raise ValueError(self.id_ + " failed to load training data (wrong object_type)")
+        statistics = ColumnStatistics.from_binary(base64.b64decode(json_data['statistics']))
+        return [tuple(key) for key in json_data['measurements']], statistics
+
+    @staticmethod
+    def __solve(statistics: ColumnStatistics) -> tuple[LinearRegression, float]:
+        """The least-squares fit (with intercept) and its R^2 score, from the statistics of the inputs and target"""
+        n_features = statistics.n_columns - 1
+        sxx = statistics.comoments[:n_features, :n_features]
+        sxy = statistics.comoments[:n_features, n_features]
+        syy = statistics.comoments[n_features, n_features]
+        # minimum norm solution of the (centered) normal equations, like the least-squares solver of sklearn
+        coef = np.linalg.lstsq(sxx, sxy, rcond=None)[0]
+        lreg = LinearRegression()
+        lreg.coef_ = coef
+        lreg.intercept_ = float(statistics.mean[n_features] - statistics.mean[:n_features] @ coef)
+
+        # residual sum of squares (the residuals have mean zero, and sxx @ coef = sxy at the minimum)
+        residual = max(0.0, float(syy - coef @ sxy))
+        if syy > 0:
+            score = 1.0 - residual / syy
+        else:
+            # constant target, as in sklearns `r2_score`
+            score = 1.0 if np.isclose(residual, 0.0) else 0.0
+        return lreg, score
 
     def default_data(self, nr_features: int) -> ModelStorageType:
         """Returns the data corresponding to a default (trivial) model with given nr of features"""
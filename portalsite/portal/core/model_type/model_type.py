@@ -1,8 +1,9 @@
 # region imports
 # standard
+import time
 from abc import ABC, abstractmethod
 
-from typing import TYPE_CHECKING, TypeAlias
+from typing import TYPE_CHECKING, Hashable, Iterator, Optional, TypeAlias
 # 3rd party
 import numpy as np
 
@@ -42,11 +43,89 @@ class ModelType(ABC,NamedIdObject):
     def compatible(self, model: 'Model', measurement: 'Measurement') -> bool:
         """Returns true iff the measurement is a valid (prediction) input for the model"""
 
+    @abstractmethod
+    def feature_count(self, model: 'Model') -> Optional[int]:
+        """Returns the number of input features the model expects, None if it accepts any input"""
+
     @classmethod
     @abstractmethod
     def train(cls,
               model: 'Model',
               measurements: list['Measurement'],
-              max_iterations: int,
+              max_iterations: Optional[int],
               max_seconds: int) -> tuple[ModelStorageType, float]:
-        """Trains a model, returning the new model data with its score"""
+        """
+        Trains a model, returning the new model data with its score. Incremental methods merge one measurement per
+        iteration and stop after `max_iterations` (None for no limit) or `max_seconds` (see `_within_budget`), returning
+        the model trained so far - training it again continues with the remaining measurements.
+        """
+
+    def score_many(self, model: 'Model', measurements: list['Measurement']) -> list[float]:
+        """
+        Returns the models scores, evaluated against each of the _labelled_ measurements.
+        By default, they are scored one by one - types should evaluate all of them at once where possible.
+        """
+        return [self.score(model, measurement) for measurement in measurements]
+
+    def predict_many(self, model: 'Model', measurements: list['Measurement']) -> list[np.ndarray]:
+        """
+        Returns the models predictions of each of the measurements.
+        By default, they are predicted one by one - types should evaluate all of them at once where possible.
+        """
+        return [self.predict(model, measurement) for measurement in measurements]
+
+    @staticmethod
+    def _stack_rows(arrays: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the arrays concatenated along the rows, with the indices at which to split results back"""
+        return np.concatenate(arrays, axis=0), np.cumsum([len(array) for array in arrays])[:-1]
+
+    @staticmethod
+    def _within_budget(measurements: list['Measurement'],
+                       max_iterations: Optional[int],
+                       max_seconds: float) -> Iterator['Measurement']:
+        """
+        Yields the measurements to merge, one per iteration, until the iterations or the seconds (counted from the
+        first one) are used up. The first measurement is always yielded, such that a training makes progress.
+        """
+        deadline = time.monotonic() + max_seconds
+        for iteration, measurement in enumerate(measurements):
+            if iteration > 0 and ((max_iterations is not None and iteration >= max_iterations)
+                                  or time.monotonic() >= deadline):
+                return
+            yield measurement
+
+    @staticmethod
+    def _measurement_key(measurement: 'Measurement') -> tuple[int, int]:
+        """Identifies the data of a measurement, to keep track of what a model was trained on"""
+        # payloads are immutable, so the pair changes if the data of the measurement is replaced
+        return (measurement.pk, measurement.payload_id)
+
+    def split_data(self, data: ModelStorageType) -> tuple[ModelStorageType, Optional[ModelStorageType]]:
+        """
+        Splits model data into the part needed for predictions and the part only needed to retrain or recalibrate
+        (None if there is none), which is stored separately. By default, all of the data is needed for predictions.
+        """
+        return data, None
+
+
+class PreprocessingModelType(ModelType):
+    """
+    Type of a prediction model that preprocesses its input separately, such that the input is preprocessed only once
+    for all models with the same preprocessing (see `ModelQuerySet.predict`)
+    """
+
+    @abstractmethod
+    def preprocessing_key(self, model: 'Model') -> Hashable:
+        """Identifies the preprocessing the model applies to its input before predicting"""
+
+    @abstractmethod
+    def preprocess(self, model: 'Model', matrix: np.ndarray) -> np.ndarray:
+        """Returns the model input preprocessed for the model"""
+
+    @abstractmethod
+    def predict_preprocessed(self, model: 'Model', preprocessed: np.ndarray) -> np.ndarray:
+        """Returns a models prediction of a preprocessed model input (see `preprocess`)"""
+
+    @abstractmethod
+    def score_preprocessed(self, model: 'Model', preprocessed: np.ndarray, target: np.ndarray) -> float:
+        """Returns a models score, evaluated against a preprocessed model input (see `preprocess`) and its target"""
@@ -0,0 +1,137 @@
+"""
+Cross-validation of simca models, running the folds in a pool of processes.
+
+The calibration data is placed in shared memory once, and the worker processes read it from there (instead of each
+task receiving a pickled copy). Only the fold number is sent per task, and only the distances of its rows come back.
+"""
+# region - imports
+# standard
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Optional
+
+# 3rd party
+import numpy as np
+
+# local
+from .pca import PCAProjection
+
+# type hints
+if TYPE_CHECKING:
+    from .simca import Simca, SimcaParameters
+
+# endregion
+
+
+@dataclass
+class CrossValidation:
+    """
+    Cross-validated predictions of the calibration rows: each row is projected and predicted by the model generated
+    from the rows of the other folds. Row i belongs to fold i % n_folds ('venetian blinds').
+    """
+    n_folds: int
+    projection: PCAProjection
+    """The scores and Q/T2 distances of each row in the model of its fold (without residuals)"""
+    probabilities: np.ndarray
+    """Matrix (rows x n_comp) of the probabilities of each row to belong to the class, for all component counts"""
+
+    @property
+    def folds(self) -> np.ndarray:
+        """The fold of each row"""
+        return np.arange(self.projection.n_samples) % self.n_folds
+
+    @property
+    def fold_scores(self) -> np.ndarray:
+        """
+        Matrix (folds x n_comp) of the score of each fold as in `Simca.score`, for all component counts
+        (the rows are in class, i.e. the score is the mean probability)
+        """
+        folds = self.folds
+        return np.array([np.mean(self.probabilities[folds == fold], axis=0) for fold in range(self.n_folds)])
+
+    @property
+    def score(self) -> float:
+        """The score over all rows, for the number of components of the model"""
+        return float(np.mean(self.probabilities[:, -1]))
+
+
+def cross_validate(simca: 'Simca', n_folds: Optional[int] = None, max_workers: Optional[int] = None) -> CrossValidation:
+    """
+    Cross-validates the generation of the model on its calibration data, see `Simca.cross_validate`.
+    The folds run in `max_workers` processes (all cores if None), or in this process if it is 1.
+    """
+    if not simca.has_calibration:
+        raise ValueError("can not cross-validate a model without calibration data")
+    data = simca.data
+    n_rows = data.shape[0]
+    n_folds = n_rows if n_folds is None else n_folds
+    if not 2 <= n_folds <= n_rows:
+        raise ValueError(f"can not split {n_rows} rows into {n_folds} folds")
+    n_comp = simca.parameters.n_comp
+    if n_rows - int(np.ceil(n_rows / n_folds)) < n_comp:
+        raise ValueError(f"too few rows per fold to generate models with {n_comp} components")
+
+    if max_workers == 1:
+        _attach_shared_data(None, data)
+        try:
+            results = [_validate_fold(fold, n_folds, simca.parameters) for fold in range(n_folds)]
+        finally:
+            _attach_shared_data(None, None)
+    else:
+        memory = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+        try:
+            np.ndarray(data.shape, data.dtype, buffer=memory.buf)[:] = data
+            max_workers = min(max_workers or os.cpu_count() or 1, n_folds)
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_attach_shared_data,
+                                     initargs=(memory.name, (data.shape, data.dtype.str))) as executor:
+                # several folds per task for leave-one-out, a few tasks per worker to balance the load
+                chunksize = max(1, n_folds // (4 * max_workers))
+                results = list(executor.map(_validate_fold, range(n_folds), [n_folds] * n_folds,
+                                            [simca.parameters] * n_folds, chunksize=chunksize))
+        finally:
+            memory.close()
+            memory.unlink()
+
+    # gather the rows of the folds back in their original order
+    dtype = simca.parameters.precision.dtype
+    scores, Q, T2, probabilities = (np.empty((n_rows, n_comp), dtype=dtype) for _ in range(4))
+    for fold, (fold_scores, fold_Q, fold_T2, fold_probabilities) in enumerate(results):
+        scores[fold::n_folds], Q[fold::n_folds], T2[fold::n_folds] = fold_scores, fold_Q, fold_T2
+        probabilities[fold::n_folds] = fold_probabilities
+    projection = PCAProjection(scores, None, simca.pca, PCAProjection.Distances(Q, T2))
+    return CrossValidation(n_folds, projection, probabilities)
+
+
+# the calibration data in the worker processes, attached once per process (see `_attach_shared_data`)
+_shared_memory: Optional[shared_memory.SharedMemory] = None
+_shared_data: Optional[np.ndarray] = None
+
+
+def _attach_shared_data(name: Optional[str], data) -> None:
+    """Makes the calibration data available to `_validate_fold`: the array itself or (shape, dtype) in shared memory"""
+    global _shared_memory, _shared_data  # pylint: disable=global-statement
+    if name is None:
+        _shared_memory, _shared_data = None, data
+        return
+    # (spawned workers share the resource tracker of the creating process, which unlinks the memory when done)
+    _shared_memory = shared_memory.SharedMemory(name=name)
+    shape, dtype = data
+    _shared_data = np.ndarray(shape, np.dtype(dtype), buffer=_shared_memory.buf)
+    _shared_data.flags.writeable = False
+
+
+def _validate_fold(fold: int, n_folds: int, parameters: 'SimcaParameters') -> tuple[np.ndarray, ...]:
+    """Generates the model without the rows of the fold and returns their scores, Q, T2 and probabilities"""
+    # pylint: disable=import-outside-toplevel
+    from .simca import Simca
+
+    test_rows = np.arange(fold, _shared_data.shape[0], n_folds)
+    model = Simca.generate(np.delete(_shared_data, test_rows, axis=0), parameters)
+    projection = model.pca.project(model.preprocess(_shared_data[test_rows]), parameters.n_comp)
+    return (projection.scores, projection.distances.Q, projection.distances.T2,
+            model.limits.get_probabilities(projection))
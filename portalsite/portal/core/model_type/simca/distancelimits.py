@@ -13,6 +13,7 @@ import numpy as np
 from scipy import stats
 
 # local
+from portal.core.statistics import ColumnStatistics
 from .helpers import nrows, bound
 
 # type hints
@@ -44,6 +45,13 @@ class LimitParameters:
             case _:
                 raise NotImplementedError("limit type not supported (during init of limit parameters")
 
+    @staticmethod
+    def from_statistics(statistics: ColumnStatistics) -> 'LimitParameters':
+        """The moment (DDMOMENTS) parameters of the distances summarized by the statistics"""
+        u0 = statistics.mean
+        Nu = 2 * (u0 / statistics.std(ddof=1))**2
+        return LimitParameters(u0, Nu, statistics.count)
+
     @staticmethod
     def _init_ddmoments(distances: np.ndarray):
         u0 = np.mean(distances, 0)
@@ -85,6 +93,29 @@ class Limits:
 # ' degrees of freedom.
 
 
+@dataclass
+class DistanceStatistics:
+    """
+    Moments of the Q and T2 distances (of all component counts) of the calibration rows, which determine the moment
+    (DDMOMENTS) limits. Unlike the distances, they are combined with those of further rows without keeping the rows.
+    """
+    Q: ColumnStatistics
+    T2: ColumnStatistics
+
+    @staticmethod
+    def from_projection(projection: 'PCAProjection') -> 'DistanceStatistics':
+        return DistanceStatistics(ColumnStatistics.from_matrix(projection.distances.Q, with_comoments=False),
+                                  ColumnStatistics.from_matrix(projection.distances.T2, with_comoments=False))
+
+    @property
+    def count(self) -> int:
+        return self.Q.count
+
+    @property
+    def n_comp(self) -> int:
+        return self.Q.n_columns
+
+
 @dataclass
 class DistanceLimits:
     parameters: 'SimcaParameters'
@@ -116,6 +147,19 @@ class DistanceLimits:
 
         return distance_limits
 
+    @staticmethod
+    def from_statistics(statistics: DistanceStatistics, parameters: 'SimcaParameters') -> 'DistanceLimits':
+        """The moment limits from the distance statistics (equal to `generate` from the distances)"""
+        if parameters.limit_type is not LimitType.DDMOMENTS:
+            raise ValueError("only moment limits can be generated from distance statistics")
+        distance_limits = DistanceLimits(parameters,
+                                         None,
+                                         None,
+                                         LimitParameters.from_statistics(statistics.Q),
+                                         LimitParameters.from_statistics(statistics.T2))
+        distance_limits.init_datadriven_limits()
+        return distance_limits
+
     def init_datadriven_limits(self):
 
         Q_params = self.Q_params
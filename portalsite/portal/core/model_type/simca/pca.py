@@ -2,6 +2,7 @@
 # region - imports
 # standard
 from dataclasses import dataclass
+from typing import Optional
 
 # 3rd party
 import numpy as np
@@ -23,9 +24,9 @@ class PCA:
     eigenvectors corresponding to the the largest eigenvalues (with largest variance).
     """
 
-    matrix: np.ndarray
+    matrix: Optional[np.ndarray]
     """
-    The (preprocessed) matrix that was used for the PCA
+    The (preprocessed) matrix that was used for the PCA - None if only its covariance is known
     """
     covariance: np.ndarray
     """
@@ -45,18 +46,21 @@ class PCA:
     """
 
     @staticmethod
-    def generate(matrix: np.ndarray, bias=False) -> 'PCA':
+    def generate(matrix: np.ndarray, bias=False, covariance: np.ndarray = None) -> 'PCA':
         """
         Computes the eigenvalue decomposition of the covariance (of the transposed sample matrix).
         Note that the covarience is by definition 'implicitely mean centered'
 
         arguments:
-            - matrix: sample matrix
+            - matrix: sample matrix (may be None if the covariance is given)
             - bias (bool): whether to normalize the covariance by N (`True`) or N-1 (`False`)
+            - covariance: the covariance of the matrix, if known already (e.g. from precomputed statistics)
         """
 
         # compute and store values
-        covariance = np.cov(matrix.T, bias=bias)
+        if covariance is None:
+            # np.cov computes in (at least) double precision, we keep the precision of the matrix
+            covariance = np.cov(matrix.T, bias=bias).astype(matrix.dtype, copy=False)
 
         # get eigen decomposition and sort by descending eigenvalues
         # we also force the eigenvalues positive - they might be erroneously negative due to numerical precision limits
@@ -99,8 +103,8 @@ class PCA:
         # for each sample (row), compute the diatnce for the one (Q) or all (T2) involved components
         shape = pca_result.scores.shape
         distances = PCAProjection.Distances(
-            np.empty(shape=shape, dtype=float),
-            np.empty(shape=shape, dtype=float))
+            np.empty(shape=shape, dtype=pca_result.scores.dtype),
+            np.empty(shape=shape, dtype=pca_result.scores.dtype))
 
         # calculate distances and model power for each possible number of components in model
         n_comp = pca_result.n_comp
@@ -3,14 +3,17 @@ Custom serializsation tools to help expose, save and restore simca models as JSO
 """
 # region - imports
 # standard
+from dataclasses import replace
 
 # 3rd party
 import numpy as np
 
 # local
-from .simca import Simca, SimcaParameters, LimitType
+from portal.core.arraypacking import decode_array, encode_array
+from portal.core.statistics import ColumnStatistics
+from .simca import Simca, SimcaParameters, LimitType, Precision
 from .pca import PCA, PCAProjection
-from .distancelimits import DistanceLimits, LimitParameters, Limits
+from .distancelimits import DistanceLimits, DistanceStatistics, LimitParameters, Limits
 
 
 # type hints
@@ -56,7 +59,10 @@ class CustomSerializer:
 
 class ArraySerializer(CustomSerializer):
     """
-    Responsible for (de) serialization of numpy arrays from/to json-compatible dictionaries
+    Responsible for (de) serialization of numpy arrays from/to json-compatible dictionaries.
+
+    Arrays are stored packed (see `core.arraypacking`) as base64 text, which keeps dtype and shape and is much smaller
+    and faster than lists of decimals. Dictionaries with (nested) lists of 'values', as written before, are still read.
     """
 
     def __init__(self) -> None:
@@ -67,15 +73,84 @@ class ArraySerializer(CustomSerializer):
             return None_dict
         json_dict = self.init_dict(array)
         json_dict.update({
-            'values': array.tolist()
+            'packed': encode_array(array)
         })
         return json_dict
 
     def from_dict(self, json_dict: dict) -> np.ndarray:
+        """Returns the array, read-only if it was stored packed"""
+        if json_dict == None_dict:
+            return None
+        self.validate_dict(json_dict)
+        if 'packed' in json_dict:
+            return decode_array(json_dict['packed'])
+        return np.asarray(json_dict['values'], dtype=json_dict.get('dtype'))
+
+
+class ColumnStatisticsSerializer(CustomSerializer):
+    """
+    Responsible for (de) serialization of column statistics from/to json-compatible dictionaries
+    """
+    arrayserializer = ArraySerializer()
+
+    def __init__(self) -> None:
+        super().__init__(ColumnStatistics, type_string='column_statistics')
+
+    def to_dict(self, statistics: ColumnStatistics) -> dict:
+        if statistics is None:
+            return None_dict
+        json_dict = self.init_dict(statistics)
+        json_dict.update({
+            'count': statistics.count,
+            'mean': self.arrayserializer.to_dict(statistics.mean),
+            'sum_centered_squares': self.arrayserializer.to_dict(statistics.sum_centered_squares),
+            'minimum': self.arrayserializer.to_dict(statistics.minimum),
+            'maximum': self.arrayserializer.to_dict(statistics.maximum),
+            'comoments': self.arrayserializer.to_dict(statistics.comoments),
+        })
+        return json_dict
+
+    def from_dict(self, json_dict: dict) -> ColumnStatistics:
+        if json_dict == None_dict:
+            return None
+        self.validate_dict(json_dict)
+        return ColumnStatistics(
+            int(json_dict['count']),
+            self.arrayserializer.from_dict(json_dict['mean']),
+            self.arrayserializer.from_dict(json_dict['sum_centered_squares']),
+            self.arrayserializer.from_dict(json_dict['minimum']),
+            self.arrayserializer.from_dict(json_dict['maximum']),
+            self.arrayserializer.from_dict(json_dict['comoments'])
+        )
+
+
+class DistanceStatisticsSerializer(CustomSerializer):
+    """
+    Responsible for (de) serialization of distance statistics from/to json-compatible dictionaries
+    """
+    statisticsserializer = ColumnStatisticsSerializer()
+
+    def __init__(self) -> None:
+        super().__init__(DistanceStatistics, type_string='distance_statistics')
+
+    def to_dict(self, statistics: DistanceStatistics) -> dict:
+        if statistics is None:
+            return None_dict
+        json_dict = self.init_dict(statistics)
+        json_dict.update({
+            'Q': self.statisticsserializer.to_dict(statistics.Q),
+            'T2': self.statisticsserializer.to_dict(statistics.T2),
+        })
+        return json_dict
+
+    def from_dict(self, json_dict: dict) -> DistanceStatistics:
         if json_dict == None_dict:
             return None
         self.validate_dict(json_dict)
-        return np.asarray(json_dict['values'])
+        return DistanceStatistics(
+            self.statisticsserializer.from_dict(json_dict['Q']),
+            self.statisticsserializer.from_dict(json_dict['T2'])
+        )
 
 
 class SimcaParametersSerializer(CustomSerializer):
@@ -93,7 +168,8 @@ class SimcaParametersSerializer(CustomSerializer):
             'gamma': parameters.gamma,
             'n_comp': parameters.n_comp,
             'limit_type': parameters.limit_type.name,
-            'scale': parameters.scale
+            'scale': parameters.scale,
+            'precision': parameters.precision.name
         })
         return json_dict
 
@@ -104,7 +180,9 @@ class SimcaParametersSerializer(CustomSerializer):
             float(json_dict['gamma']),
             int(json_dict['n_comp']),
             LimitType[json_dict['limit_type']],
-            bool(json_dict['scale'])
+            bool(json_dict['scale']),
+            # models serialized before the precision parameter was added are double precision
+            Precision[json_dict.get('precision', Precision.FLOAT64.name)]
         )
 
 
@@ -267,6 +345,9 @@ class SimcaSerializer(CustomSerializer):
     arrayserializer = ArraySerializer()
     pcaprojectionserializer = PCAProjectionSerializer()
     distancelimitsserializer = DistanceLimitsSerializer()
+    statisticsserializer = ColumnStatisticsSerializer()
+    distancestatisticsserializer = DistanceStatisticsSerializer()
+    calibration_type_string = 'Simca_calibration'
 
     def __init__(self) -> None:
         super().__init__(Simca, type_string='Simca')
@@ -282,11 +363,21 @@ class SimcaSerializer(CustomSerializer):
             'calibration_result': self.pcaprojectionserializer.to_dict(simca.calibration_result),
             'test_result': self.pcaprojectionserializer.to_dict(simca.test_result),
             'limit': self.distancelimitsserializer.to_dict(simca.limits),
+            'statistics': self.statisticsserializer.to_dict(simca.statistics),
+            'distance_statistics': self.distancestatisticsserializer.to_dict(simca.distance_statistics),
         })
         return json_dict
 
-    def from_dict(self, json_dict) -> Simca:
+    def from_dict(self, json_dict, calibration_dict: dict = None) -> Simca:
+        """
+        Restores the model. An inference artifact (see `Simca.inference_artifact`) is restored with its calibration
+        data if `calibration_dict` (as returned by `calibration_to_dict`) is given.
+        """
         self.validate_dict(json_dict)
+        if calibration_dict is not None:
+            if calibration_dict.get(CustomSerializer.dict_type_key) != self.calibration_type_string:
+                raise ValueError("can not recognize the calibration data")
+            json_dict = {**json_dict, **calibration_dict}
         pca = self.pcaserializer.from_dict(json_dict['pca'])
         parameters = self.parametersserializer.from_dict(json_dict['parameters'])
         return Simca(
@@ -297,5 +388,30 @@ class SimcaSerializer(CustomSerializer):
             self.pcaprojectionserializer.from_dict(json_dict['calibration_result'], pca),
             self.pcaprojectionserializer.from_dict(json_dict['test_result'], pca),
             self.distancelimitsserializer.from_dict(json_dict['limit'], parameters),
-            parameters
+            parameters,
+            self.statisticsserializer.from_dict(json_dict.get('statistics', None_dict)),
+            self.distancestatisticsserializer.from_dict(json_dict.get('distance_statistics', None_dict))
         )
+
+    def calibration_to_dict(self, simca: Simca, with_rows: bool = True) -> dict:
+        """
+        The parts of the model only needed to recalibrate or update it: the data, the full PCA, the calibration
+        projection and the statistics. Together with the dictionary of its inference artifact, they restore the model.
+        Without rows, the data, the matrix of the PCA and the calibration projection are left out (see
+        `Simca.restore_calibration`), which leaves what `Simca.update` needs.
+        """
+        self.init_dict(simca)
+        if not simca.has_calibration and simca.statistics is None:
+            raise ValueError("the model has no calibration data")
+        pca, calibration_result = simca.pca, simca.calibration_result
+        if not with_rows:
+            pca, calibration_result = replace(pca, matrix=None), None
+        return {
+            CustomSerializer.dict_type_key: self.calibration_type_string,
+            'pca': self.pcaserializer.to_dict(pca),
+            'data': self.arrayserializer.to_dict(simca.data if with_rows else None),
+            'calibration_result': self.pcaprojectionserializer.to_dict(calibration_result),
+            'test_result': self.pcaprojectionserializer.to_dict(simca.test_result),
+            'statistics': self.statisticsserializer.to_dict(simca.statistics),
+            'distance_statistics': self.distancestatisticsserializer.to_dict(simca.distance_statistics),
+        }
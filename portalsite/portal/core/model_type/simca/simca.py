@@ -5,20 +5,41 @@ This is a port of selected concepts from the R package 'mdatools' - https://mdat
 """
 # region - imports
 # standard
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
+from enum import Enum
+from typing import Iterable, Optional
 
 # 3rd party
 import numpy as np
 
 # local
+from portal.core.statistics import ColumnStatistics
+from .crossvalidation import CrossValidation, cross_validate
 from .pca import PCA, PCAProjection
-from .distancelimits import LimitType, DistanceLimits
+from .distancelimits import DistanceLimits, DistanceStatistics, LimitType
+from .sweep import ParameterSweep, sweep
 
 # type hints
 
 # endregion
 
 
+class Precision(Enum):
+    """
+    Floating point precision of the model arrays and computations.
+
+    FLOAT32 halves memory and the size of serialized models, which matters for spectra with thousands of features.
+    Compared to FLOAT64 (see `compare_precision`), the probabilities typically differ by less than 1e-4 for well
+    conditioned data. Components with eigenvalues below ~1e-6 of the largest are dominated by rounding errors.
+    """
+    FLOAT64 = 'float64'
+    FLOAT32 = 'float32'
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(self.value)
+
+
 @dataclass(frozen=True)
 class SimcaParameters:
     alpha: int
@@ -30,11 +51,14 @@ class SimcaParameters:
     Whether to standardize before performing the PCA.
     (Equivalent to decomposing the correlation instead of the covariance matrix).
     """
+    precision: Precision = Precision.FLOAT64
+    """Floating point precision of the model data and computations"""
 
 
 @dataclass
 class Simca:
-    data: np.ndarray
+    data: Optional[np.ndarray]
+    """The unprocessed one class data - None for an inference artifact (see `inference_artifact`)"""
     preprocessing_mean: np.ndarray
     preprocessing_std: np.ndarray
     pca: PCA
@@ -43,19 +67,27 @@ class Simca:
     limits: DistanceLimits
     parameters: SimcaParameters
     _parameters: SimcaParameters = field(init=False, repr=False)
+    statistics: Optional[ColumnStatistics] = None
+    """Statistics (with comoments) of the unprocessed calibration data, which allow to `update` the model"""
+    distance_statistics: Optional[DistanceStatistics] = None
+    """Moments of the calibration distances, which allow to `update` the (moment) limits"""
 
     @staticmethod
     def generate(one_class_data: np.ndarray, parameters: SimcaParameters,
-                 test_matrix: np.ndarray = None) -> 'Simca':
+                 test_matrix: np.ndarray = None, statistics: ColumnStatistics = None) -> 'Simca':
+        """
+        Generates a model from the one class data. If the column statistics of the data are given (with comoments),
+        the mean, standard deviation and covariance are taken from them instead of being computed from the data.
+        """
 
         # store unprocessed data
-        data = one_class_data.astype(float)
-
-        # compute and store preprocessing parameters
-        preprocessing_mean = np.mean(data, 0)
-        preprocessing_std = np.std(data, 0, ddof=1) if parameters.scale else None
+        dtype = parameters.precision.dtype
+        data = one_class_data.astype(dtype)
+        if statistics is None or statistics.comoments is None or statistics.count != data.shape[0]:
+            statistics = ColumnStatistics.from_matrix(data)
 
         # intialize fields that are required to generate the subsequent fields
+        preprocessing_mean, preprocessing_std, covariance = Simca._preprocessing(statistics, parameters)
         simca = Simca(data,
                       preprocessing_mean,
                       preprocessing_std,
@@ -63,35 +95,188 @@ class Simca:
                       None,
                       None,
                       None,
-                      parameters)
-        simca.pca = PCA.generate(simca._preprocess(data))
+                      parameters,
+                      statistics)
+        simca.pca = PCA.generate(simca.preprocess(data), covariance=covariance)
         simca.recalibrate(parameters)
 
-        # pylint: disable=fixme
-        # TODO: test-prediction, (cross)-validation?
-        simca.test_result = simca.pca.project(test_matrix, simca.parameters.n_comp) if test_matrix else None
+        # see also `cross_validate`, which sets the cross-validated projection of the calibration data instead
+        if test_matrix is not None:
+            simca.test_result = simca.pca.project(simca.preprocess(test_matrix), simca.parameters.n_comp)
         return simca
 
+    def cross_validate(self, n_folds: Optional[int] = None, max_workers: Optional[int] = None) -> CrossValidation:
+        """
+        Cross-validates the model: the calibration rows are split into `n_folds` folds (leave-one-out if None), and
+        the rows of each fold are predicted by the model generated from the other rows with the same parameters.
+        The folds are generated in parallel, in `max_workers` processes (all cores if None). Sets the cross-validated
+        scores and Q/T2 distances as `test_result` and returns them with the probabilities (see `CrossValidation`).
+        """
+        result = cross_validate(self, n_folds, max_workers)
+        self.test_result = result.projection
+        return result
+
+    def sweep(self,
+              matrix: np.ndarray,
+              target_values: np.ndarray,
+              n_comps: Optional[Iterable[int]] = None,
+              alphas: Optional[Iterable[float]] = None,
+              gammas: Optional[Iterable[float]] = None,
+              limit_types: Optional[Iterable[LimitType]] = None,
+              splits: Optional[np.ndarray] = None) -> ParameterSweep:
+        """
+        Scores all combinations of the parameter grids (the current value where a grid is None) on the labelled
+        validation data, as `score` of the model recalibrated to them. Reuses the PCA of the model, which is projected
+        only once with the largest component count (see `ParameterSweep`). If `splits` are given, the rows are split
+        there into measurements (see `ModelType._stack_rows`) which are scored separately, then averaged.
+        Note that gamma only sets the outlier limits, it does not change the probabilities and scores.
+        """
+        return sweep(self, matrix, target_values, n_comps, alphas, gammas, limit_types, splits)
+
+    def update(self, one_class_data: np.ndarray) -> 'Simca':
+        """
+        Returns the model for the calibration rows extended by the (unprocessed) one class rows, without the previous
+        rows (see `can_update`): the mean and covariance are merged from the statistics, the PCA decomposes the merged
+        covariance and only the new rows are projected. The moments of their distances are merged with those of the
+        previous rows, which were computed by the model the rows were added to: these are rescaled to the exact mean
+        distances of the new model (which follow from its eigenvalues), but their spread is approximated.
+        Hence the preprocessing, PCA and limit means equal those of the model generated from all rows, while the
+        degrees of freedom of the limits (and with them the probabilities) approximate them.
+        The returned model has no calibration data, see `restore_calibration`.
+        """
+        if not self.can_update:
+            raise ValueError("can not update a model without its statistics, or with other than moment limits")
+        parameters = self.parameters
+        data = one_class_data.astype(parameters.precision.dtype)
+        if data.shape[0] == 0:
+            return self
+        statistics = self.statistics.combine(ColumnStatistics.from_matrix(data))
+        preprocessing_mean, preprocessing_std, covariance = Simca._preprocessing(statistics, parameters)
+        simca = Simca(None,
+                      preprocessing_mean,
+                      preprocessing_std,
+                      PCA.generate(None, covariance=covariance),
+                      None,
+                      None,
+                      None,
+                      parameters,
+                      statistics)
+
+        # the mean squared score of component k over all rows is its eigenvalue (times (n-1)/n), which gives the mean
+        # distances of all rows - the previous distances are rescaled to match them
+        n_comp, count = parameters.n_comp, statistics.count
+        new = DistanceStatistics.from_projection(simca.pca.project(simca.preprocess(data), n_comp))
+        previous = self.distance_statistics
+        factor = (count - 1) / count
+        mean_Q = factor * (np.trace(covariance) - np.cumsum(simca.pca.eigenvalues[:n_comp]))
+        mean_T2 = factor * np.arange(1, n_comp + 1)
+        simca.distance_statistics = DistanceStatistics(
+            Simca._rescaled(previous.Q, count * mean_Q - new.Q.count * new.Q.mean).combine(new.Q),
+            Simca._rescaled(previous.T2, count * mean_T2 - new.T2.count * new.T2.mean).combine(new.T2))
+        simca.limits = DistanceLimits.from_statistics(simca.distance_statistics, parameters)
+        return simca
+
+    @staticmethod
+    def _rescaled(statistics: ColumnStatistics, sums: np.ndarray) -> ColumnStatistics:
+        """The (distance) statistics scaled to the column sums (columns that can not be scaled are kept)"""
+        current = statistics.count * statistics.mean
+        scalable = (current > 0) & (sums > 0)
+        factors = np.where(scalable, sums / np.where(scalable, current, 1.0), 1.0)
+        return replace(statistics,
+                       mean=statistics.mean * factors,
+                       sum_centered_squares=statistics.sum_centered_squares * factors**2,
+                       minimum=statistics.minimum * factors,
+                       maximum=statistics.maximum * factors)
+
+    def restore_calibration(self, one_class_data: np.ndarray) -> None:
+        """
+        Sets the (unprocessed) calibration rows of a model stored without them, which must be the rows its statistics
+        were computed from. The calibration projection is recomputed from them.
+        """
+        data = one_class_data.astype(self.parameters.precision.dtype)
+        if self.statistics is not None and self.statistics.count != data.shape[0]:
+            raise ValueError(f"expected {self.statistics.count} calibration rows, got {data.shape[0]}")
+        if data.ndim != 2 or data.shape[1] != self.n_features:
+            raise ValueError(f"expected calibration rows with {self.n_features} features")
+        self.data = data
+        self.pca.matrix = self.preprocess(data)
+        self.calibration_result = self.pca.project(self.pca.matrix, self.parameters.n_comp)
+
+    @staticmethod
+    def _preprocessing(statistics: ColumnStatistics,
+                       parameters: SimcaParameters) -> tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+        """The preprocessing mean and standard deviation and the covariance of the preprocessed data"""
+        dtype = parameters.precision.dtype
+        mean = statistics.mean.astype(dtype)
+        # the covariance of the preprocessed data, i.e. the correlation if scaled
+        covariance = statistics.covariance(ddof=1)
+        std = None
+        if parameters.scale:
+            std = statistics.std(ddof=1).astype(dtype)
+            covariance = covariance / np.outer(std, std)
+        return mean, std, covariance.astype(dtype)
+
     @property
     def parameters(self) -> SimcaParameters:
         return self._parameters
 
+    @property
+    def n_features(self) -> int:
+        return len(self.preprocessing_mean)
+
+    @property
+    def has_calibration(self) -> bool:
+        """Whether the calibration data is available, i.e. the model can be recalibrated"""
+        return self.data is not None
+
+    @property
+    def can_update(self) -> bool:
+        """
+        Whether the model can be updated with more rows (see `update`): this requires the statistics (with comoments)
+        and distance statistics of all rows, but not the rows themselves. Models with robust limits can not be
+        updated, as the quantiles of all distances can not be merged from those of the previous rows.
+        """
+        statistics, distance_statistics = self.statistics, self.distance_statistics
+        return (self.parameters.limit_type is LimitType.DDMOMENTS
+                and statistics is not None
+                and statistics.comoments is not None
+                and distance_statistics is not None
+                and distance_statistics.count == statistics.count
+                and distance_statistics.n_comp == self.parameters.n_comp)
+
+    def inference_artifact(self) -> 'Simca':
+        """
+        Returns a copy holding only what `predict` needs: the preprocessing parameters, the leading `n_comp`
+        eigenvectors and eigenvalues and the limits. Its size is of order features x components (instead of
+        samples x features), but it can not be recalibrated.
+        """
+        n_comp = self.parameters.n_comp
+        pca = PCA(None, None, self.pca.eigenvalues[:n_comp], self.pca.eigenvectors[:, :n_comp], self.pca.bias)
+        return Simca(None, self.preprocessing_mean, self.preprocessing_std, pca, None, None, self.limits,
+                     self.parameters)
+
     # we clean up any attempt to set invalid parameters
     def _cleaned_parameters(self, parameters: SimcaParameters) -> SimcaParameters:
         alpha = float(max(0.0, min(parameters.alpha, 1.0)))
         gamma = float(max(0.0, min(parameters.gamma, 1.0)))
         # note that this might fail if data has not been set yet:
-        n_comp = int(max(0, min(parameters.n_comp,
-                                self.data.shape[0],
-                                self.data.shape[1])))
+        if self.data is not None:
+            max_comp = min(self.data.shape[0], self.data.shape[1])
+        else:
+            max_comp = len(self.pca.eigenvalues)
+        n_comp = int(max(0, min(parameters.n_comp, max_comp)))
         if not isinstance(parameters.limit_type, LimitType):
             raise TypeError("limit_type parameter is not recognized")
-        return SimcaParameters(alpha, gamma, n_comp, parameters.limit_type, parameters.scale)
+        if not isinstance(parameters.precision, Precision):
+            raise TypeError("precision parameter is not recognized")
+        return SimcaParameters(alpha, gamma, n_comp, parameters.limit_type, parameters.scale, parameters.precision)
 
     @parameters.setter
     def parameters(self, new_value: SimcaParameters):
         if '_parameters' in self.__dict__ and self._parameters.scale != new_value.scale:
             raise ValueError("changing the scale parameter is not possible")
+        if '_parameters' in self.__dict__ and self._parameters.precision != new_value.precision:
+            raise ValueError("changing the precision parameter is not possible")
         self._parameters = self._cleaned_parameters(new_value)
 
     def recalibrate(self, new_parameters: SimcaParameters):
@@ -99,12 +284,15 @@ class Simca:
         Adjust the model limits to the provided new parameters and sets the calibration data.
         Note: The PCA and the preprocessing data is not changed.
         """
+        if not self.has_calibration:
+            raise ValueError("can not recalibrate a model without calibration data")
         new_calibration_result = self.pca.project(self.pca.matrix, new_parameters.n_comp)
         new_limits = DistanceLimits.generate(new_calibration_result, new_parameters)
         # only set values if previous methods concluded to avoid a failed state
         self.parameters = new_parameters
         self.calibration_result = new_calibration_result
         self.limits = new_limits
+        self.distance_statistics = DistanceStatistics.from_projection(new_calibration_result)
 
     def predict_all_components(self, matrix: np.ndarray) -> np.ndarray:
         """
@@ -113,7 +301,11 @@ class Simca:
 
         Returns: Matrix (m x n), where m = rowcount of input matrix, n = `self.parameters.n_comp`
         """
-        projection = self.pca.project(self._preprocess(matrix), self.parameters.n_comp)
+        return self.predict_all_components_preprocessed(self.preprocess(matrix))
+
+    def predict_all_components_preprocessed(self, preprocessed: np.ndarray) -> np.ndarray:
+        """As `predict_all_components`, for a matrix that is preprocessed already (see `preprocess`)"""
+        projection = self.pca.project(preprocessed, self.parameters.n_comp)
         probabilities = self.limits.get_probabilities(projection)
         return probabilities
 
@@ -126,15 +318,27 @@ class Simca:
             - comp_nr: The desired principal component count.
         The default of 0 is interpreted as all (maximal nr of) components for which the pca was calculated.
         """
+        return self.predict_preprocessed(self.preprocess(matrix), comp_count)
+
+    def predict_preprocessed(self, preprocessed: np.ndarray, comp_count: int = 0) -> np.ndarray:
+        """As `predict`, for a matrix that is preprocessed already (see `preprocess`)"""
         if (comp_count < 0 or comp_count > self.parameters.n_comp):
             raise ValueError("chosen comp_nr is invalid or incompatible with the model")
-        return self.predict_all_components(matrix)[:, comp_count-1]
+        return self.predict_all_components_preprocessed(preprocessed)[:, comp_count-1]
 
-    def _preprocess(self, matrix: np.ndarray) -> np.ndarray:
+    def preprocessing_key(self) -> tuple:
+        """
+        Identifies the preprocessing: models with equal keys (e.g. trained on the same data with other component
+        counts or limits) preprocess a matrix alike, such that it is preprocessed once for all of them.
+        """
+        std = self.preprocessing_std.tobytes() if self.parameters.scale else None
+        return self.parameters.precision.dtype.str, self.preprocessing_mean.tobytes(), std
+
+    def preprocess(self, matrix: np.ndarray) -> np.ndarray:
         """
         Returns a preprocessed matrix: Centered by the mean and (if enabled) scaled by the standard deviation.
         """
-        preprocessed = matrix - self.preprocessing_mean
+        preprocessed = np.asarray(matrix, dtype=self.parameters.precision.dtype) - self.preprocessing_mean
         if self.parameters.scale:
             preprocessed /= self.preprocessing_std
         return preprocessed
@@ -149,11 +353,36 @@ class Simca:
             - components (int): Number of components to be used for the prediction.
             If set to None, the value is read from simca parameters.
         """
+        return self.score_preprocessed(self.preprocess(matrix), target_values, components)
+
+    def score_preprocessed(self, preprocessed: np.ndarray, target_values: np.ndarray, components: int = None) -> float:
+        """As `score`, for a matrix that is preprocessed already (see `preprocess`)"""
         if components is None:
             components = self.parameters.n_comp
 
         if (components < 0 or components > self.parameters.n_comp):
             raise ValueError("chosen comp_nr is invalid or incompatible with the model")
 
-        predictions = self.predict(matrix, components)
+        predictions = self.predict_preprocessed(preprocessed, components)
         return float(1.0 - np.mean(np.abs(target_values - predictions)))
+
+
+def compare_precision(one_class_data: np.ndarray,
+                      parameters: SimcaParameters,
+                      matrix: np.ndarray) -> dict[str, float]:
+    """
+    Accuracy check of the float32 computation: generates the model in both precisions and returns the largest
+    absolute differences of the preprocessing mean, the eigenvalues (relative to the largest) and the probabilities
+    predicted for the matrix (for all component counts).
+    """
+    model64 = Simca.generate(one_class_data, replace(parameters, precision=Precision.FLOAT64))
+    model32 = Simca.generate(one_class_data, replace(parameters, precision=Precision.FLOAT32))
+    eigenvalues64 = model64.pca.eigenvalues
+    n_comp = model64.parameters.n_comp
+    return {
+        'mean': float(np.max(np.abs(model64.preprocessing_mean - model32.preprocessing_mean))),
+        'eigenvalues': float(np.max(np.abs(eigenvalues64[:n_comp] - model32.pca.eigenvalues[:n_comp]))
+                             / eigenvalues64[0]),
+        'probabilities': float(np.max(np.abs(model64.predict_all_components(matrix)
+                                             - model32.predict_all_components(matrix)))),
+    }
@@ -0,0 +1,93 @@
+"""
+Hyperparameter sweep of simca models: scores a grid of parameters on validation data, reusing one decomposition.
+
+Column i of the Q/T2 distances of a projection only depends on the first i+1 components (see `PCA._set_distances`),
+so projecting once with the largest component count gives the distances of every smaller count. The limit parameters
+only depend on the limit type (and are computed per component count), such that each grid point only evaluates the
+limits and probabilities from the cached distances.
+"""
+# region - imports
+# standard
+from dataclasses import dataclass, replace
+from itertools import product
+from typing import TYPE_CHECKING, Iterable, Optional
+
+# 3rd party
+import numpy as np
+
+# local
+from .distancelimits import DistanceLimits, LimitParameters, LimitType
+
+# type hints
+if TYPE_CHECKING:
+    from .simca import Simca, SimcaParameters
+
+# endregion
+
+
+@dataclass
+class ParameterSweep:
+    """Scores of a grid of simca parameters, evaluated on labelled validation data (see `Simca.score`)"""
+    parameters: list['SimcaParameters']
+    scores: np.ndarray
+    """The score of each of the parameters"""
+
+    def best(self) -> 'SimcaParameters':
+        """The parameters with the highest score (the first of them, if several have it)"""
+        return self.parameters[int(np.argmax(self.scores))]
+
+    def table(self) -> list[dict]:
+        """The score table, with one json-compatible row per parameters (in grid order)"""
+        return [{
+            'n_comp': parameters.n_comp,
+            'alpha': parameters.alpha,
+            'gamma': parameters.gamma,
+            'limit_type': parameters.limit_type.name,
+            'score': float(score),
+        } for parameters, score in zip(self.parameters, self.scores)]
+
+
+def sweep(simca: 'Simca',
+          matrix: np.ndarray,
+          target_values: np.ndarray,
+          n_comps: Optional[Iterable[int]] = None,
+          alphas: Optional[Iterable[float]] = None,
+          gammas: Optional[Iterable[float]] = None,
+          limit_types: Optional[Iterable[LimitType]] = None,
+          splits: Optional[np.ndarray] = None) -> ParameterSweep:
+    """Scores the grid of parameters on the validation data, see `Simca.sweep`"""
+    if not simca.has_calibration:
+        raise ValueError("can not sweep the parameters of a model without calibration data")
+    current = simca.parameters
+    # pylint: disable=protected-access
+    grid = [simca._cleaned_parameters(replace(current, n_comp=n_comp, alpha=alpha, gamma=gamma, limit_type=limit_type))
+            for n_comp, alpha, gamma, limit_type in product(
+                [current.n_comp] if n_comps is None else n_comps,
+                [current.alpha] if alphas is None else alphas,
+                [current.gamma] if gammas is None else gammas,
+                [current.limit_type] if limit_types is None else limit_types)]
+    if not grid:
+        raise ValueError("the parameter grid is empty")
+
+    # the only decomposition is the one of the model, projected once with the largest component count
+    max_comp = max(parameters.n_comp for parameters in grid)
+    calibration = simca.pca.project(simca.pca.matrix, max_comp)
+    validation = simca.pca.project(simca.preprocess(matrix), max_comp)
+    limit_parameters = {limit_type: (LimitParameters.generate(calibration.distances.Q, limit_type),
+                                     LimitParameters.generate(calibration.distances.T2, limit_type))
+                        for limit_type in {parameters.limit_type for parameters in grid}}
+
+    # the probabilities (of all component counts) only depend on alpha and the limit type
+    errors = {}
+    scores = np.empty(len(grid))
+    for index, parameters in enumerate(grid):
+        key = (parameters.alpha, parameters.limit_type)
+        if key not in errors:
+            limits = DistanceLimits(replace(parameters, n_comp=max_comp), None, None, *limit_parameters[key[1]])
+            limits.init_datadriven_limits()
+            errors[key] = np.abs(target_values.reshape(-1, 1) - limits.get_probabilities(validation))
+        column = errors[key][:, parameters.n_comp - 1]
+        # as `SimcaModel.score_many`: each measurement is scored separately, then the scores are averaged
+        parts = np.split(column, splits) if splits is not None else [column]
+        scores[index] = np.mean([1.0 - np.mean(part) for part in parts])
+    return ParameterSweep(grid, scores)
@@ -2,15 +2,18 @@
 # region imports
 # standard
 from json import dumps, loads
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Hashable, Iterable, Optional
 
 # 3rd party
 import numpy as np
 
 
 # local
-from .model_type import ModelStorageType, ModelType
+from portal.core.statistics import ColumnStatistics
+from .model_type import ModelStorageType, PreprocessingModelType
+from .simca.crossvalidation import CrossValidation
 from .simca.simca import Simca, SimcaParameters, LimitType
+from .simca.sweep import ParameterSweep
 from .simca.serializer import SimcaSerializer
 
 # type hints
@@ -20,7 +23,7 @@ if TYPE_CHECKING:
 # endregion
 
 
-class SimcaModel(ModelType):
+class SimcaModel(PreprocessingModelType):
     """
     SIMCA stands for Soft Independent Modelling of Class Analogy and is a one-class classification model.
     See also https://mdatools.com/docs/simca.html and https://doi.org/10.1002/cem.2506.
@@ -56,18 +59,19 @@ class SimcaModel(ModelType):
         """A formatted text describing the concrete data/paramters of the given model"""
         simca = self.__load_model(model)
         return (
-            f"Simca model for numerical data with {int(simca.data.shape[1])} features\n"
+            f"Simca model for numerical data with {simca.n_features} features\n"
             + "Model parameters:\n"
             + f"- alpha: {simca.parameters.alpha}\n"
             + f"- gamma: {simca.parameters.gamma}\n"
             + f"- limit type: {simca.parameters.limit_type}\n"
             + f"- components: {simca.parameters.n_comp}\n"
-            + f"- scale: {simca.parameters.scale}"
+            + f"- scale: {simca.parameters.scale}\n"
+            + f"- precision: {simca.parameters.precision.value}"
         )
 
     def compatible(self, model: 'Model', measurement: 'Measurement') -> bool:
         """Returns true iff the measurement is a valid (prediction) input for the model"""
-        features = int(self.__load_model(model).data.shape[1])
+        features = self.feature_count(model)
         shape: tuple = measurement.model_input().shape
         if len(shape) != 2:
             return False
@@ -75,9 +79,95 @@ class SimcaModel(ModelType):
             return False
         return True
 
+    def feature_count(self, model: 'Model') -> Optional[int]:
+        """Returns the number of input features the model expects"""
+        return self.__load_model(model).n_features
+
+    def split_data(self, data: ModelStorageType) -> tuple[ModelStorageType, Optional[ModelStorageType]]:
+        """
+        Splits the model into its inference artifact (see `Simca.inference_artifact`) and the calibration data,
+        such that loading the model for predictions does not parse the (large) calibration data. The calibration rows
+        of models trained on measurements are not stored, they are read from the measurements when needed.
+        """
+        serializer = SimcaSerializer()
+        json_data: dict = loads(data)
+        simca = serializer.from_dict(json_data)
+        if not simca.has_calibration and simca.statistics is None:
+            return data, None
+        # the measurements the model was trained on (see `train`)
+        trained_on = json_data.get('measurements')
+        calibration_dict = serializer.calibration_to_dict(simca, with_rows=trained_on is None)
+        if trained_on is not None:
+            calibration_dict['measurements'] = trained_on
+        return dumps(serializer.to_dict(simca.inference_artifact())), dumps(calibration_dict)
+
+    def recalibrate(self, model: 'Model', parameters: SimcaParameters) -> ModelStorageType:
+        """Returns the model data with the limits recalibrated for the parameters (keeping the PCA)"""
+        simca = self.__load_calibrated_model(model)
+        simca.recalibrate(parameters)
+        return self.__get_model_data(simca)
+
+    def cross_validate(self,
+                       model: 'Model',
+                       n_folds: Optional[int] = None,
+                       max_workers: Optional[int] = None) -> tuple[ModelStorageType, CrossValidation]:
+        """
+        Cross-validates the model on its calibration data (see `Simca.cross_validate`), returning the model data with
+        the cross-validated projection as test result, and the cross-validation
+        """
+        simca = self.__load_calibrated_model(model)
+        result = simca.cross_validate(n_folds, max_workers)
+        return self.__get_model_data(simca), result
+
+    def sweep(self,  # pylint: disable=too-many-arguments
+              model: 'Model',
+              measurements: list['Measurement'],
+              *,
+              n_comps: Optional[Iterable[int]] = None,
+              alphas: Optional[Iterable[float]] = None,
+              gammas: Optional[Iterable[float]] = None,
+              limit_types: Optional[Iterable[LimitType]] = None) -> ParameterSweep:
+        """
+        Scores the grid of parameters against the _labelled_ validation measurements (see `Simca.sweep`), reusing
+        the PCA of the model. The best parameters can then be applied with `recalibrate`.
+        """
+        if not measurements:
+            raise ValueError("no measurements to validate on")
+        matrix, splits = self._stack_rows([measurement.model_input() for measurement in measurements])
+        targets, _ = self._stack_rows([measurement.model_target() for measurement in measurements])
+        return self.__load_calibrated_model(model).sweep(matrix, targets, n_comps, alphas, gammas, limit_types, splits)
+
     def __load_model(self, model: 'Model') -> Simca:
-        json_data: dict = loads(model.data)
-        return SimcaSerializer().from_dict(json_data)
+        return model.deserialized(lambda: SimcaSerializer().from_dict(loads(model.data)))
+
+    def __load_calibrated_model(self, model: 'Model') -> Simca:
+        """
+        The model with its calibration data, read from the measurements it was trained on if stored without.
+        Raises ValueError if the calibration data is not available.
+        """
+        calibration_data = model.calibration_data
+        calibration_dict = loads(calibration_data) if calibration_data is not None else None
+        simca = SimcaSerializer().from_dict(loads(model.data), calibration_dict)
+        if not simca.has_calibration and calibration_dict is not None and 'measurements' in calibration_dict:
+            measurements = self.__trained_measurements([tuple(key) for key in calibration_dict['measurements']])
+            if measurements is not None:
+                simca.restore_calibration(self.__one_class_rows(measurements))
+        if not simca.has_calibration:
+            raise ValueError(f"'{model.name}' is stored without its calibration data - train it to restore it")
+        return simca
+
+    @staticmethod
+    def __trained_measurements(keys: list[tuple[int, int]]) -> Optional[list['Measurement']]:
+        """The measurements of the keys (see `_measurement_key`), None if any was deleted or its data replaced"""
+        # pylint: disable=import-outside-toplevel
+        # (the database models import the model types)
+        from portal.models import Measurement
+
+        by_key = {SimcaModel._measurement_key(measurement): measurement
+                  for measurement in Measurement.objects.filter(pk__in=[pk for pk, _ in keys])}
+        if any(key not in by_key for key in keys):
+            return None
+        return [by_key[key] for key in keys]
 
     def __get_model_data(self, simca: Simca) -> ModelStorageType:
         return dumps(SimcaSerializer().to_dict(simca))
@@ -92,25 +182,113 @@ class SimcaModel(ModelType):
         simca: Simca = self.__load_model(model)
         return simca.predict(measurement.model_input())
 
+    def preprocessing_key(self, model: 'Model') -> Hashable:
+        """The mean (and scale) the model centers its input with, see `Simca.preprocessing_key`"""
+        return self.__load_model(model).preprocessing_key()
+
+    def preprocess(self, model: 'Model', matrix: np.ndarray) -> np.ndarray:
+        """Returns the model input centered (and scaled) for the model"""
+        return self.__load_model(model).preprocess(matrix)
+
+    def predict_preprocessed(self, model: 'Model', preprocessed: np.ndarray) -> np.ndarray:
+        """Returns a models prediction of a preprocessed model input"""
+        return self.__load_model(model).predict_preprocessed(preprocessed)
+
+    def score_preprocessed(self, model: 'Model', preprocessed: np.ndarray, target: np.ndarray) -> float:
+        """Returns a models score, evaluated against a preprocessed model input and its target"""
+        return self.__load_model(model).score_preprocessed(preprocessed, target)
+
+    def score_many(self, model: 'Model', measurements: list['Measurement']) -> list[float]:
+        """Returns the models scores, evaluated against each of the _labelled_ measurements (in one projection)"""
+        return self.__score_many(self.__load_model(model), measurements)
+
+    def predict_many(self, model: 'Model', measurements: list['Measurement']) -> list[np.ndarray]:
+        """Returns the models predictions of each of the measurements (in one projection)"""
+        if not measurements:
+            return []
+        matrix, splits = self._stack_rows([measurement.model_input() for measurement in measurements])
+        return np.split(self.__load_model(model).predict(matrix), splits)
+
+    def __score_many(self, simca: Simca, measurements: list['Measurement']) -> list[float]:
+        if not measurements:
+            return []
+        matrix, splits = self._stack_rows([measurement.model_input() for measurement in measurements])
+        targets, _ = self._stack_rows([measurement.model_target() for measurement in measurements])
+        # the score of each measurement, as in `Simca.score`
+        errors = np.abs(targets - simca.predict(matrix, simca.parameters.n_comp))
+        return [float(1.0 - np.mean(part)) for part in np.split(errors, splits)]
+
     def train(self,
               model: 'Model',
               measurements: list['Measurement'],
-              max_iterations: int,
+              max_iterations: Optional[int],
               max_seconds: int) -> tuple[ModelStorageType, float]:
-        """Trains a model, returning the new model with its score"""
+        """
+        Trains a model, returning the new model with its score. If the model was trained on a subset of the
+        measurements before, it is updated with the additional measurements only (see `Simca.update`), without
+        reading the previous ones. Otherwise, it is generated from all of them. Each iteration reads one measurement,
+        until the budget is used up (see `ModelType.train`).
+        """
+        keys = [self._measurement_key(measurement) for measurement in measurements]
+        included, simca_trained = self.__load_training_state(model)
+        if simca_trained is None or not set(included) <= set(keys):
+            included, simca_trained = [], None
+
+        additional = [measurement for key, measurement in zip(keys, measurements) if key not in included]
+        merged, rows = [], []
+        for measurement in self._within_budget(additional, max_iterations, max_seconds):
+            rows.append(self.__one_class_rows([measurement]))
+            merged.append(measurement)
+        if simca_trained is not None:
+            simca_new = simca_trained
+            if merged:
+                simca_new = simca_new.update(np.concatenate(rows, axis=0))
+        else:
+            simca_new = self.__generate(model, merged, np.concatenate(rows, axis=0))
+        # the calibration rows are in the order of the measurements (see `__load_calibrated_model`)
+        included = included + [self._measurement_key(measurement) for measurement in merged]
+
+        # score it
+        score = sum(self.__score_many(simca_new, measurements)) / len(measurements)
+        return (dumps({**SimcaSerializer().to_dict(simca_new), 'measurements': included}), score)
+
+    def __generate(self, model: 'Model', measurements: list['Measurement'], one_class_rows: np.ndarray) -> Simca:
+        """A new model with the parameters of the model, generated from the one class rows of the measurements"""
+        # if all rows are in class, their statistics are known already from the stored measurements
+        statistics = None
+        if len(one_class_rows) == sum(len(measurement.model_target()) for measurement in measurements):
+            statistics = self.__combined_statistics(measurements)
+        return Simca.generate(one_class_rows, self.__load_model(model).parameters, statistics=statistics)
+
+    @staticmethod
+    def __one_class_rows(measurements: list['Measurement']) -> np.ndarray:
         X_concat: np.ndarray = np.concatenate([m.model_input() for m in measurements], axis=0)
         y_concat: np.ndarray = np.concatenate([m.model_target() for m in measurements], axis=0)
-
         one_class_indices: np.ndarray = np.argwhere(np.where(y_concat == 1.0, y_concat, 0.0)).flatten()
-        X_one_class = X_concat[one_class_indices, :]
+        return X_concat[one_class_indices, :]
 
-        # generate new model with old parameters but new data
-        simca_current = self.__load_model(model)
-        simca_new = Simca.generate(X_one_class, simca_current.parameters)
+    def __load_training_state(self, model: 'Model') -> tuple[list[tuple[int, int]], Optional[Simca]]:
+        """
+        The keys of the measurements the model was trained on and the model with what `Simca.update` needs (but not
+        the calibration rows), if both are stored with the model
+        """
+        calibration_data = model.calibration_data
+        if calibration_data is None:
+            return [], None
+        calibration_dict: dict = loads(calibration_data)
+        if 'measurements' not in calibration_dict:
+            return [], None
+        simca = SimcaSerializer().from_dict(loads(model.data), calibration_dict)
+        if not simca.can_update:
+            return [], None
+        return [tuple(key) for key in calibration_dict['measurements']], simca
 
-        # score it
-        score = sum(simca_new.score(m.model_input(), m.model_target()) for m in measurements) / len(measurements)
-        return (self.__get_model_data(simca_new), score)
+    @staticmethod
+    def __combined_statistics(measurements: list['Measurement']) -> Optional[ColumnStatistics]:
+        statistics = [measurement.column_statistics() for measurement in measurements]
+        if any(item is None for item in statistics):
+            return None
+        return ColumnStatistics.combine_all(statistics)
 
     def default_data(
         self, nr_features: int = 2,
@@ -1,7 +1,7 @@
 """A dummy model for testing and base examples"""
 # region imports
 # standard
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 # 3rd party
 import numpy as np
@@ -56,12 +56,16 @@ class TestModelType(ModelType):
         """Returns true iff the measurement is a valid (prediction) input for the model"""
         return True
 
+    def feature_count(self, model: 'Model') -> Optional[int]:
+        """Returns None: the model accepts any input"""
+        return None
+
     def train(self,
               model: 'Model',
               measurements: list['Measurement'],
-              max_iterations: int,
+              max_iterations: Optional[int],
               max_seconds: int) -> tuple[ModelStorageType, float]:
-        """Trains a model, returning the same model data with a score of 0"""
+        """Trains a model, returning the same model data with a score of 0 (without iterating, for any budget)"""
         return (model.data, 0.0)
 
     def default_data(self) -> ModelStorageType:
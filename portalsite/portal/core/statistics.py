@@ -0,0 +1,163 @@
+"""
+Per-column summary statistics of numeric matrices, combinable across matrices without access to their rows
+"""
+# region imports
+# standard
+import io
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+# 3rd party
+import numpy as np
+
+# local
+
+# type hints
+
+# endregion
+
+
+@dataclass(frozen=True)
+class ColumnStatistics:
+    """
+    Count, mean, centered (co-)moments, minimum and maximum of the columns of a matrix.
+
+    Statistics of several matrices are combined with the pairwise formulas of Chan et al., giving the statistics of
+    the stacked matrices. Storing centered moments instead of raw sums of squares avoids the loss of precision of
+    `sum_squares - sum**2 / count` for columns with a large mean.
+    """
+    count: int
+    mean: np.ndarray
+    sum_centered_squares: np.ndarray
+    """Sum of squared deviations from the mean, per column"""
+    minimum: np.ndarray
+    maximum: np.ndarray
+    comoments: Optional[np.ndarray] = None
+    """Sum of the products of deviations from the mean (features x features), None if not computed"""
+
+    @staticmethod
+    def from_matrix(matrix: np.ndarray, with_comoments: bool = True) -> 'ColumnStatistics':
+        """Computes the statistics of the columns of the (2d) matrix, with the comoment matrix if requested"""
+        matrix = np.asarray(matrix, dtype=float)
+        if matrix.ndim != 2:
+            raise ValueError(f"can not compute column statistics of an array with {matrix.ndim} dimensions")
+        if matrix.shape[0] == 0:
+            return ColumnStatistics.empty(matrix.shape[1], with_comoments)
+        mean = matrix.mean(axis=0)
+        centered = matrix - mean
+        return ColumnStatistics(
+            count=matrix.shape[0],
+            mean=mean,
+            sum_centered_squares=np.einsum('ij,ij->j', centered, centered),
+            minimum=matrix.min(axis=0),
+            maximum=matrix.max(axis=0),
+            comoments=centered.T @ centered if with_comoments else None)
+
+    @staticmethod
+    def empty(n_columns: int, with_comoments: bool = True) -> 'ColumnStatistics':
+        """The statistics of a matrix without rows (the neutral element of `combine`)"""
+        return ColumnStatistics(
+            count=0,
+            mean=np.zeros(n_columns),
+            sum_centered_squares=np.zeros(n_columns),
+            minimum=np.full(n_columns, np.inf),
+            maximum=np.full(n_columns, -np.inf),
+            comoments=np.zeros((n_columns, n_columns)) if with_comoments else None)
+
+    @property
+    def n_columns(self) -> int:
+        return len(self.mean)
+
+    @property
+    def sum(self) -> np.ndarray:
+        return self.count * self.mean
+
+    @property
+    def sum_squares(self) -> np.ndarray:
+        return self.sum_centered_squares + self.count * self.mean**2
+
+    @property
+    def cross_products(self) -> Optional[np.ndarray]:
+        """The (uncentered) cross product matrix X^T X, None if the comoments were not computed"""
+        if self.comoments is None:
+            return None
+        return self.comoments + self.count * np.outer(self.mean, self.mean)
+
+    def variance(self, ddof: int = 1) -> np.ndarray:
+        """Variance of each column, normalized by count - ddof (NaN if there are not enough rows)"""
+        if self.count <= ddof:
+            return np.full(self.n_columns, np.nan)
+        return self.sum_centered_squares / (self.count - ddof)
+
+    def std(self, ddof: int = 1) -> np.ndarray:
+        """Standard deviation of each column, normalized by count - ddof"""
+        return np.sqrt(self.variance(ddof))
+
+    def covariance(self, ddof: int = 1) -> np.ndarray:
+        """Covariance matrix of the columns, normalized by count - ddof (like `np.cov(matrix.T, ddof=ddof)`)"""
+        if self.comoments is None:
+            raise ValueError("the comoments were not computed, the covariance is not available")
+        if self.count <= ddof:
+            return np.full((self.n_columns, self.n_columns), np.nan)
+        return self.comoments / (self.count - ddof)
+
+    def combine(self, other: 'ColumnStatistics') -> 'ColumnStatistics':
+        """
+        Returns the statistics of the rows of both matrices. The comoments are kept only if both have them.
+        """
+        if self.n_columns != other.n_columns:
+            raise ValueError(f"can not combine statistics of {self.n_columns} and {other.n_columns} columns")
+        count = self.count + other.count
+        with_comoments = self.comoments is not None and other.comoments is not None
+        if self.count == 0 or other.count == 0:
+            result = other if self.count == 0 else self
+            if with_comoments or result.comoments is None:
+                return result
+            return ColumnStatistics(result.count, result.mean, result.sum_centered_squares,
+                                    result.minimum, result.maximum)
+
+        delta = other.mean - self.mean
+        weight = self.count * other.count / count
+        return ColumnStatistics(
+            count=count,
+            mean=self.mean + delta * (other.count / count),
+            sum_centered_squares=self.sum_centered_squares + other.sum_centered_squares + delta**2 * weight,
+            minimum=np.minimum(self.minimum, other.minimum),
+            maximum=np.maximum(self.maximum, other.maximum),
+            comoments=(self.comoments + other.comoments + np.outer(delta, delta) * weight
+                       if with_comoments else None))
+
+    @staticmethod
+    def combine_all(statistics: Iterable['ColumnStatistics']) -> Optional['ColumnStatistics']:
+        """Returns the combined statistics (see `combine`), None if there are none"""
+        result = None
+        for item in statistics:
+            result = item if result is None else result.combine(item)
+        return result
+
+    def to_binary(self) -> bytes:
+        """Returns the statistics packed to binary (an uncompressed .npz archive)"""
+        arrays = {
+            'count': np.array(self.count, dtype=np.int64),
+            'mean': self.mean,
+            'sum_centered_squares': self.sum_centered_squares,
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+        }
+        if self.comoments is not None:
+            arrays['comoments'] = self.comoments
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    @staticmethod
+    def from_binary(binary: bytes | memoryview) -> 'ColumnStatistics':
+        """Returns the statistics packed by `to_binary`"""
+        with np.load(io.BytesIO(bytes(binary)), allow_pickle=False) as arrays:
+            return ColumnStatistics(
+                count=int(arrays['count']),
+                mean=arrays['mean'],
+                sum_centered_squares=arrays['sum_centered_squares'],
+                minimum=arrays['minimum'],
+                maximum=arrays['maximum'],
+                comoments=arrays['comoments'] if 'comoments' in arrays.files else None)
@@ -6,6 +6,7 @@ possibly with some inheritance pattern for common repeated code)
 """
 
 from django import forms
+from django.conf import settings
 from django.forms.widgets import Textarea
 
 
@@ -30,6 +31,36 @@ class MeasurementUploadForm(forms.Form):
     notes = forms.CharField(required=False, widget=Textarea)
 
 
+class MultipleFileInput(forms.ClearableFileInput):
+    """File input allowing to select several files"""
+    allow_multiple_selected = True
+
+
+class MeasurementBulkUploadForm(forms.Form):
+    """Upload of several measurement files (or zip archives of them) with shared metadata"""
+
+    def __init__(self,
+                 data_handler_choices: list,
+                 source_choices: list,
+                 groups_choices: list,
+                 *args,
+                 **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.fields['data_handler'].choices = data_handler_choices
+        self.fields['source'].choices = source_choices
+        self.fields['groups'].choices = groups_choices
+
+    measured = forms.DateTimeField()
+    data_handler = forms.ChoiceField()
+    source = forms.ChoiceField()
+    groups = forms.MultipleChoiceField(required=False)
+    files = forms.FileField(required=False,
+                            widget=MultipleFileInput(attrs={'multiple': True}),
+                            help_text="several files or zip archives - each file is saved as a measurement named "
+                            "after the file")
+    notes = forms.CharField(required=False, widget=Textarea)
+
+
 class PredictionUploadForm(forms.Form):
     def __init__(self, data_handler_choices: list, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -68,10 +99,15 @@ class ModelTrainForm(forms.Form):
     name = forms.CharField(required=False,
                            help_text="(leave blank to update the current model)")
     measurements = forms.ModelMultipleChoiceField(queryset=None)
+    max_seconds = forms.IntegerField(required=False, min_value=1,
+                                     help_text="(time budget, the training is stopped after it)")
+    max_iterations = forms.IntegerField(required=False, min_value=1,
+                                        help_text="(measurements merged at most, leave blank for all)")
 
     def __init__(self, measurement_query_set, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.fields['measurements'].queryset = measurement_query_set
+        self.fields['max_seconds'].initial = settings.PORTAL_TRAINING_MAX_SECONDS
 
 
 class NewLinearRegssionModelForm(forms.Form):
@@ -102,6 +138,46 @@ class NewSimcaModelForm(forms.Form):
     gamma = forms.FloatField(min_value=0, max_value=1, initial=0.01, required=True)
     limit_type = forms.ChoiceField()
     scale = forms.BooleanField(required=False, initial=False)
+    single_precision = forms.BooleanField(required=False, initial=False,
+                                          help_text="compute and store in float32: half the size, slightly less "
+                                          + "accurate (for data with many features)")
+
+
+class CrossValidationForm(forms.Form):
+    """Cross-validation of a SIMCA model on its calibration data"""
+
+    n_folds = forms.IntegerField(required=False, min_value=2, help_text="(leave blank for leave-one-out)")
+
+
+class SweepForm(forms.Form):
+    """Grid of SIMCA parameters to score against validation measurements"""
+
+    def __init__(self, limit_type_choices: list, measurement_query_set, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.fields['limit_types'].choices = limit_type_choices
+        self.fields['measurements'].queryset = measurement_query_set
+
+    measurements = forms.ModelMultipleChoiceField(queryset=None, help_text="(labelled validation measurements)")
+    components = forms.CharField(required=True, initial="1, 2, 3", help_text="(comma separated)")
+    alphas = forms.CharField(required=True, initial="0.01, 0.05, 0.1", help_text="(comma separated)")
+    gammas = forms.CharField(required=True, initial="0.01", help_text="(comma separated)")
+    limit_types = forms.MultipleChoiceField(required=True)
+
+    @staticmethod
+    def _parse_list(text: str, value_type: type) -> list:
+        try:
+            return [value_type(value) for value in text.split(',') if value.strip()]
+        except ValueError as exc:
+            raise forms.ValidationError("Enter a comma separated list of numbers") from exc
+
+    def clean_components(self) -> list[int]:
+        return self._parse_list(self.cleaned_data['components'], int)
+
+    def clean_alphas(self) -> list[float]:
+        return self._parse_list(self.cleaned_data['alphas'], float)
+
+    def clean_gammas(self) -> list[float]:
+        return self._parse_list(self.cleaned_data['gammas'], float)
 
 
 class CopyModelForm(forms.Form):
@@ -0,0 +1,267 @@
+"""
+Background execution of jobs in local thread pools of the web worker processes (no external broker), such that
+requests return immediately while the work is done afterwards.
+
+The jobs (and the files of uploads) are stored in the database, such that the processes (also of several hosts) share
+the queue: any process may run a queued job, as it claims the job atomically first. Each process resumes the queued
+jobs when its pool is created, and when a queued job is looked at (see `resume_if_queued`).
+
+Training jobs run in a separate worker process (started by the thread of the job), which can be stopped once their
+time budget is exceeded or a cancellation is requested.
+"""
+# region imports
+# standard
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable
+
+# 3rd party
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+# local
+from portal import training_worker
+from portal.models.ingest_job import IngestJob
+from portal.models.training_job import TrainingJob
+
+# type hints
+
+# endregion
+
+_LOGGER = logging.getLogger(__name__)
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+"""The thread pools of this process, by the job type they run"""
+_executor_lock = Lock()
+_pending_jobs: set[tuple[str, int]] = set()
+"""The jobs submitted to the pools of this process that have not started yet"""
+_pending_lock = Lock()
+
+_POLL_SECONDS = 0.5
+"""How often a running training job checks for messages, its time budget and cancellation"""
+
+_STALE_GRACE_SECONDS = 60
+"""Running training jobs are considered stale this long after they should have been stopped"""
+
+_STALE_INGEST_SECONDS = 3600
+"""Running uploads of other hosts (whose processes can not be checked) are considered stale after this long"""
+
+
+def _get_ingest_executor() -> ThreadPoolExecutor:
+    """
+    The thread pool of this process for uploads, created on first use. Uploads left queued (e.g. by a restart) are
+    resumed then. Uploads have their own pool, such that they do not wait behind long trainings.
+    """
+    return _get_executor(IngestJob, _run_ingest_job, getattr(settings, 'PORTAL_JOB_WORKERS', 1), 'portal-ingest')
+
+
+def _get_training_executor() -> ThreadPoolExecutor:
+    """The thread pool of this process for trainings, created on first use (resuming queued trainings then)"""
+    return _get_executor(TrainingJob, _run_training_job, getattr(settings, 'PORTAL_TRAINING_WORKERS', 1),
+                         'portal-training')
+
+
+def _get_executor(job_type: type[IngestJob] | type[TrainingJob],
+                  run: Callable[[int], None],
+                  max_workers: int,
+                  thread_name_prefix: str) -> ThreadPoolExecutor:
+    with _executor_lock:
+        executor = _executors.get(job_type.__name__)
+        if executor is None:
+            _fail_stale_jobs()
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+            _executors[job_type.__name__] = executor
+            _resume(executor, job_type, run)
+        return executor
+
+
+def _resume(executor: ThreadPoolExecutor,
+            job_type: type[IngestJob] | type[TrainingJob],
+            run: Callable[[int], None]) -> None:
+    """Submits the queued jobs of the type (whichever process claims a job first runs it)"""
+    for job_id in job_type.objects.filter(status=job_type.Status.QUEUED).values_list('pk', flat=True):
+        _submit(executor, run, job_id)
+
+
+def _submit(executor: ThreadPoolExecutor, run: Callable[[int], None], job_id: int) -> None:
+    """Submits the job to the pool, unless it is waiting there already"""
+    key = (run.__name__, job_id)
+    with _pending_lock:
+        if key in _pending_jobs:
+            return
+        _pending_jobs.add(key)
+
+    def start() -> None:
+        with _pending_lock:
+            _pending_jobs.discard(key)
+        run(job_id)
+
+    executor.submit(start)
+
+
+def resume_if_queued(job: IngestJob | TrainingJob) -> None:
+    """
+    Submits the queued jobs of the type of the job to this process if it is queued (and run in the background), e.g.
+    as the process that accepted it stopped meanwhile
+    """
+    if job.status != job.Status.QUEUED:
+        return
+    if isinstance(job, IngestJob):
+        if settings.PORTAL_INGEST_IN_BACKGROUND:
+            _resume(_get_ingest_executor(), IngestJob, _run_ingest_job)
+    elif settings.PORTAL_TRAINING_IN_BACKGROUND:
+        _resume(_get_training_executor(), TrainingJob, _run_training_job)
+
+
+def _fail_stale_jobs() -> None:
+    """
+    Marks running jobs as failed whose process is gone, e.g. as the server was restarted while they ran: jobs claimed
+    by a process of this host that no longer exists (or before processes were recorded), and jobs running well beyond
+    their time budget - the processes of other hosts can not be checked, so their jobs are only failed then.
+    Jobs of other processes that are still running are left alone.
+    """
+    host = socket.gethostname()
+    now = timezone.now()
+    for job in IngestJob.objects.filter(status=IngestJob.Status.RUNNING).only('worker', 'time_started'):
+        overdue = (job.time_started is not None
+                   and (now - job.time_started).total_seconds() > _STALE_INGEST_SECONDS)
+        if overdue or _is_gone(job.worker, host):
+            _fail_stale_job(IngestJob, job.pk, job.worker)
+    for job in TrainingJob.objects.filter(status=TrainingJob.Status.RUNNING).only('worker', 'time_started',
+                                                                                   'max_seconds'):
+        overdue = (job.time_started is not None
+                   and (now - job.time_started).total_seconds()
+                   > job.max_seconds + TrainingJob.GRACE_SECONDS + _STALE_GRACE_SECONDS)
+        if overdue or _is_gone(job.worker, host):
+            _fail_stale_job(TrainingJob, job.pk, job.worker)
+
+
+def _fail_stale_job(job_type: type[IngestJob] | type[TrainingJob], job_id: int, worker: str) -> None:
+    # only if it was not finished or claimed again meanwhile
+    job_type.objects.filter(pk=job_id, status=job_type.Status.RUNNING, worker=worker).update(
+        status=job_type.Status.FAILED,
+        message="Interrupted",
+        details="The server stopped while the job was running",
+        time_finished=timezone.now())
+    _LOGGER.warning("marked stale %s %s (worker '%s') as failed", job_type.__name__, job_id, worker)
+
+
+def _worker_name() -> str:
+    """Identifies this process, recorded on the jobs it claims (see `_fail_stale_jobs`)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _is_gone(worker: str, host: str) -> bool:
+    """Whether the process that claimed a job is known to be gone (only processes of this host can be checked)"""
+    if not worker:
+        return True
+    worker_host, _, pid = worker.rpartition(':')
+    if worker_host != host:
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+    return False
+
+
+def submit_ingest_job(job: IngestJob) -> None:
+    """Queues the (saved) job to be run in the background"""
+    _submit(_get_ingest_executor(), _run_ingest_job, job.pk)
+
+
+def run_ingest_job(job: IngestJob) -> None:
+    """Runs the (saved) job right away, unless it was claimed already"""
+    if job.claim(_worker_name()):
+        job.run()
+
+
+def _run_ingest_job(job_id: int) -> None:
+    # each thread has its own database connection, which must be closed when done (there is no request cycle)
+    close_old_connections()
+    try:
+        job = IngestJob.objects.filter(pk=job_id).first()
+        if job is not None:
+            run_ingest_job(job)
+    except Exception:  # pylint: disable=broad-except
+        _LOGGER.exception("ingest job %s failed", job_id)
+        IngestJob.objects.filter(pk=job_id, status=IngestJob.Status.RUNNING).update(
+            status=IngestJob.Status.FAILED, message="Internal problem")
+    finally:
+        connection.close()
+
+
+def submit_training_job(job: TrainingJob) -> None:
+    """Queues the (saved) job to be run in the background, in a worker process"""
+    _submit(_get_training_executor(), _run_training_job, job.pk)
+
+
+def run_training_job(job: TrainingJob) -> None:
+    """Runs the (saved) job right away in this thread, unless it was claimed already"""
+    if job.claim(_worker_name()):
+        job.run()
+
+
+def _run_training_job(job_id: int) -> None:
+    close_old_connections()
+    try:
+        job = TrainingJob.objects.filter(pk=job_id).first()
+        if job is not None and job.claim(_worker_name()):
+            _supervise_training(job)
+    except Exception:  # pylint: disable=broad-except
+        _LOGGER.exception("training job %s failed", job_id)
+        TrainingJob.objects.filter(pk=job_id, status=TrainingJob.Status.RUNNING).update(
+            status=TrainingJob.Status.FAILED, message="Internal problem")
+    finally:
+        connection.close()
+
+
+def _supervise_training(job: TrainingJob) -> None:
+    """
+    Trains in a worker process, relaying its progress, and stops it when cancelled or out of time (the worker merges
+    measurements within the budget, and is given `TrainingJob.GRACE_SECONDS` more to return the model)
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=training_worker.train, args=(job.pk, sender),
+                              name=f'portal-training-{job.pk}', daemon=True)
+    process.start()
+    sender.close()
+    deadline = time.monotonic() + job.max_seconds + TrainingJob.GRACE_SECONDS
+    try:
+        while True:
+            if receiver.poll(_POLL_SECONDS):
+                try:
+                    kind, *values = receiver.recv()
+                except EOFError:
+                    job.finish(TrainingJob.Status.FAILED, "Training failed",
+                               f"The worker process stopped unexpectedly (exit code {process.exitcode})")
+                    return
+                if kind == 'progress':
+                    job.report(values[0])
+                    continue
+                if kind == 'result':
+                    job.store(*values)
+                else:
+                    job.finish(TrainingJob.Status.FAILED, "Training failed", values[0])
+                return
+            if time.monotonic() > deadline:
+                job.finish(TrainingJob.Status.FAILED, "Time budget exceeded",
+                           f"The training was stopped after {job.max_seconds} seconds")
+                return
+            if job.is_cancel_requested():
+                job.finish(TrainingJob.Status.CANCELLED, "Training cancelled", "The training was stopped on request")
+                return
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.terminate()
+        process.join()
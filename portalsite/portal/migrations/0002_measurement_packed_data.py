@@ -0,0 +1,32 @@
+# Generated by Django 3.2.9 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+def pack_existing_data(apps, schema_editor):
+    # pylint: disable=import-outside-toplevel
+    from portal.core import DATAHANDLERS
+
+    Measurement = apps.get_model('portal', 'Measurement')
+    for measurement in Measurement.objects.filter(packed_data__isnull=True).iterator():
+        try:
+            measurement.packed_data = DATAHANDLERS.get(measurement.data_handler).to_binary(measurement.data)
+        except ValueError:
+            continue
+        measurement.save(update_fields=['packed_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurement',
+            name='packed_data',
+            field=models.BinaryField(help_text='numeric content of the data, packed to binary by the data handler (derived from data on save)', null=True),
+        ),
+        migrations.RunPython(pack_existing_data, migrations.RunPython.noop),
+    ]
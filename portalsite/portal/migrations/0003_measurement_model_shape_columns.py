@@ -0,0 +1,77 @@
+# Generated by Django 3.2.9 on 2026-10-17 01:41
+
+import json
+
+from django.db import migrations, models
+import numpy as np
+
+
+def _model_feature_count(model_type, data):
+    # read from the stored json (as written at this point), such that the migration does not depend on app code
+    json_data = json.loads(data)
+    if model_type == 'LinearRegr':
+        return len(json_data['coef_'])
+    if model_type == 'Simca':
+        return len(json_data['preprocessing_mean']['values'])
+    return None
+
+
+def fill_shape_columns(apps, schema_editor):
+    Measurement = apps.get_model('portal', 'Measurement')
+    for measurement in Measurement.objects.iterator():
+        # numeric csv content, as json: the first column is the model target, the others the model input
+        try:
+            rows = json.loads(measurement.data)['rows']
+            model_input = np.asarray([[float(value) for value in row[1:]] for row in rows])
+            model_target = np.asarray([float(row[0]) for row in rows])
+        except (ValueError, KeyError, IndexError, TypeError):
+            continue
+        measurement.n_rows = int(model_input.shape[0])
+        measurement.n_features = int(model_input.shape[1]) if model_input.ndim == 2 else None
+        measurement.is_labelled = True
+        measurement.n_distinct_labels = len(np.unique(model_target))
+        measurement.save(update_fields=['n_rows', 'n_features', 'is_labelled', 'n_distinct_labels'])
+
+    Model = apps.get_model('portal', 'Model')
+    for model in Model.objects.iterator():
+        try:
+            model.n_features = _model_feature_count(model.model_type, model.data)
+        except (ValueError, KeyError, TypeError):
+            model.n_features = None
+        model.save(update_fields=['n_features'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0002_measurement_packed_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurement',
+            name='is_labelled',
+            field=models.BooleanField(db_index=True, default=False, editable=False, help_text='whether the data has model target values'),
+        ),
+        migrations.AddField(
+            model_name='measurement',
+            name='n_distinct_labels',
+            field=models.IntegerField(editable=False, help_text='number of distinct model target values', null=True),
+        ),
+        migrations.AddField(
+            model_name='measurement',
+            name='n_features',
+            field=models.IntegerField(db_index=True, editable=False, help_text='number of model input features (columns)', null=True),
+        ),
+        migrations.AddField(
+            model_name='measurement',
+            name='n_rows',
+            field=models.IntegerField(db_index=True, editable=False, help_text='number of rows (samples)', null=True),
+        ),
+        migrations.AddField(
+            model_name='model',
+            name='n_features',
+            field=models.IntegerField(db_index=True, editable=False, help_text='number of input features the model expects, empty if it accepts any (derived from data on save)', null=True),
+        ),
+        migrations.RunPython(fill_shape_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 3.2.9 on 2026-10-17 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_data_to_payloads(apps, schema_editor):
+    # pylint: disable=import-outside-toplevel
+    from portal.core import DATAHANDLERS
+
+    Measurement = apps.get_model('portal', 'Measurement')
+    Payload = apps.get_model('portal', 'Payload')
+    for measurement in Measurement.objects.iterator():
+        handler = DATAHANDLERS.get(measurement.data_handler)
+        packed_data = measurement.packed_data
+        if packed_data is None:
+            try:
+                packed_data = handler.to_binary(measurement.data)
+            except ValueError:
+                pass
+        payload, _ = Payload.objects.get_or_create(
+            digest=handler.digest(measurement.data, packed_data),
+            defaults={
+                'data_handler': measurement.data_handler,
+                'data': measurement.data,
+                'packed_data': packed_data,
+                'n_rows': measurement.n_rows,
+                'n_features': measurement.n_features,
+                'is_labelled': measurement.is_labelled,
+                'n_distinct_labels': measurement.n_distinct_labels,
+            })
+        measurement.payload = payload
+        measurement.save(update_fields=['payload'])
+
+
+def copy_data_from_payloads(apps, schema_editor):
+    Measurement = apps.get_model('portal', 'Measurement')
+    for measurement in Measurement.objects.select_related('payload').iterator():
+        measurement.data = measurement.payload.data
+        measurement.packed_data = measurement.payload.packed_data
+        measurement.save(update_fields=['data', 'packed_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0003_measurement_model_shape_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(editable=False, help_text='hash of the (normalized) content, computed by the data handler', max_length=64, unique=True)),
+                ('file_digest', models.CharField(db_index=True, editable=False, help_text='hash of the raw file this was first read from, to skip parsing it again', max_length=64, null=True)),
+                ('time_created', models.DateTimeField(auto_now_add=True, help_text='fist time this data was saved to database')),
+                ('data', models.TextField(help_text='file data, serialized to string in a suitable way')),
+                ('data_handler', models.CharField(choices=[('NumericCsv', 'NumericCsv')], max_length=10)),
+                ('packed_data', models.BinaryField(help_text='numeric content of the data, packed to binary by the data handler', null=True)),
+                ('n_rows', models.IntegerField(editable=False, help_text='number of rows (samples)', null=True)),
+                ('n_features', models.IntegerField(editable=False, help_text='number of model input features (columns)', null=True)),
+                ('is_labelled', models.BooleanField(default=False, editable=False, help_text='whether the data has model target values')),
+                ('n_distinct_labels', models.IntegerField(editable=False, help_text='number of distinct model target values', null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='measurement',
+            name='payload',
+            field=models.ForeignKey(help_text='the data, shared by all measurements with the same content', null=True, on_delete=django.db.models.deletion.PROTECT, to='portal.payload'),
+        ),
+        # nullable while the data is moved, such that the migration can be reversed
+        migrations.AlterField(
+            model_name='measurement',
+            name='data',
+            field=models.TextField(help_text='file data, serialized to string in a suitable way', null=True),
+        ),
+        migrations.RunPython(move_data_to_payloads, copy_data_from_payloads),
+        migrations.RemoveField(
+            model_name='measurement',
+            name='data',
+        ),
+        migrations.RemoveField(
+            model_name='measurement',
+            name='packed_data',
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='payload',
+            field=models.ForeignKey(help_text='the data, shared by all measurements with the same content', on_delete=django.db.models.deletion.PROTECT, to='portal.payload'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 3.2.9 on 2026-10-17 10:05
+
+from django.db import migrations, models
+import portal.models.fields
+
+
+def copy_data(source_field: str, target_field: str):
+    """Returns a migration function copying the data column (compressing or decompressing it via the fields)"""
+    def copy(apps, schema_editor):
+        for model_name in ('Payload', 'Model'):
+            model = apps.get_model('portal', model_name)
+            for instance in model.objects.iterator():
+                setattr(instance, target_field, getattr(instance, source_field))
+                instance.save(update_fields=[target_field])
+    return copy
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0004_payload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='model',
+            name='compressed_data',
+            field=portal.models.fields.CompressedTextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='payload',
+            name='compressed_data',
+            field=portal.models.fields.CompressedTextField(null=True),
+        ),
+        # nullable while the data is copied, such that the migration can be reversed
+        migrations.AlterField(
+            model_name='model',
+            name='data',
+            field=models.TextField(help_text='model data (weights, parameters, coefficients, etc.), serialized to string', null=True),
+        ),
+        migrations.AlterField(
+            model_name='payload',
+            name='data',
+            field=models.TextField(help_text='file data, serialized to string in a suitable way', null=True),
+        ),
+        migrations.RunPython(copy_data('data', 'compressed_data'), copy_data('compressed_data', 'data')),
+        migrations.RemoveField(
+            model_name='model',
+            name='data',
+        ),
+        migrations.RemoveField(
+            model_name='payload',
+            name='data',
+        ),
+        migrations.RenameField(
+            model_name='model',
+            old_name='compressed_data',
+            new_name='data',
+        ),
+        migrations.RenameField(
+            model_name='payload',
+            old_name='compressed_data',
+            new_name='data',
+        ),
+        migrations.AlterField(
+            model_name='model',
+            name='data',
+            field=portal.models.fields.CompressedTextField(help_text='model data (weights, parameters, coefficients, etc.), serialized to string (stored compressed)'),
+        ),
+        migrations.AlterField(
+            model_name='payload',
+            name='data',
+            field=portal.models.fields.CompressedTextField(help_text='file data, serialized to string in a suitable way (stored compressed)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0005_compress_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payload',
+            name='matrix_file',
+            field=models.CharField(editable=False, help_text='file with the numeric content (see core.matrixfiles), used instead of the packed data if large', max_length=100, null=True),
+        ),
+    ]
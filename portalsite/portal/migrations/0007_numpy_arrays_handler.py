@@ -0,0 +1,23 @@
+# Generated by Django 3.2.9 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0006_payload_matrix_file'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='measurement',
+            name='data_handler',
+            field=models.CharField(choices=[('NumericCsv', 'NumericCsv'), ('NumpyArray', 'NumpyArrays')], max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='payload',
+            name='data_handler',
+            field=models.CharField(choices=[('NumericCsv', 'NumericCsv'), ('NumpyArray', 'NumpyArrays')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0007_numpy_arrays_handler'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payload',
+            name='packed_statistics',
+            field=models.BinaryField(help_text='statistics of the model input columns (see core.statistics), computed once from the data', null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.9 on 2026-10-17 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portal', '0008_payload_column_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=10)),
+                ('time_created', models.DateTimeField(auto_now_add=True, help_text='time the upload was accepted')),
+                ('time_started', models.DateTimeField(blank=True, help_text='time the processing started', null=True)),
+                ('time_finished', models.DateTimeField(blank=True, help_text='time the processing finished', null=True)),
+                ('name', models.CharField(max_length=50)),
+                ('data_handler', models.CharField(choices=[('NumericCsv', 'NumericCsv'), ('NumpyArray', 'NumpyArrays')], max_length=10)),
+                ('time_measured', models.DateTimeField(help_text='time the data was measured')),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('file_name', models.CharField(max_length=255)),
+                ('content', models.BinaryField(help_text='the uploaded file, removed once processed', null=True)),
+                ('message', models.CharField(blank=True, max_length=100)),
+                ('details', models.TextField(blank=True)),
+                ('validation_results', models.JSONField(blank=True, default=list, help_text='the validation results, as list of json objects')),
+                ('groups', models.ManyToManyField(blank=True, to='portal.Group')),
+                ('measurement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='portal.measurement')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='portal.source')),
+                ('user_created', models.ForeignKey(help_text='user that uploaded the file', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-time_created'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.9 on 2026-10-17 17:05
+
+from django.db import migrations
+import portal.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0009_ingestjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='model',
+            name='calibration_data',
+            field=portal.models.fields.CompressedTextField(blank=True, editable=False, help_text='model data only needed to retrain or recalibrate (e.g. the calibration data of SIMCA models), split off on save (stored compressed)', null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.9 on 2026-10-17 18:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portal', '0010_model_calibration_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], db_index=True, default='queued', max_length=10)),
+                ('time_created', models.DateTimeField(auto_now_add=True, help_text='time the training was requested')),
+                ('time_started', models.DateTimeField(blank=True, help_text='time the training started', null=True)),
+                ('time_finished', models.DateTimeField(blank=True, help_text='time the training finished', null=True)),
+                ('new_name', models.CharField(blank=True, help_text='name of the trained model to create (empty to update the model)', max_length=50)),
+                ('max_iterations', models.PositiveIntegerField(default=1)),
+                ('max_seconds', models.PositiveIntegerField(default=600, help_text='time budget, the training is stopped after it')),
+                ('cancel_requested', models.BooleanField(default=False)),
+                ('progress', models.CharField(blank=True, help_text='the current step, while running', max_length=100)),
+                ('message', models.CharField(blank=True, max_length=100)),
+                ('details', models.TextField(blank=True)),
+                ('score_before', models.FloatField(blank=True, null=True)),
+                ('score_after', models.FloatField(blank=True, null=True)),
+                ('measurements', models.ManyToManyField(help_text='the measurements to train on', to='portal.Measurement')),
+                ('model', models.ForeignKey(help_text='the model to train', on_delete=django.db.models.deletion.CASCADE, to='portal.model')),
+                ('trained_model', models.ForeignKey(blank=True, help_text='the created or updated model', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portal.model')),
+                ('user_created', models.ForeignKey(help_text='user that requested the training', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-time_created'],
+            },
+        ),
+    ]
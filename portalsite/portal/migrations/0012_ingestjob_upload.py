@@ -0,0 +1,33 @@
+# Generated by Django 3.2.9 on 2026-10-17 19:30
+
+from django.core.files.base import ContentFile
+from django.db import migrations, models
+
+
+def spool_contents(apps, schema_editor):
+    # unprocessed uploads are moved from the database to files
+    IngestJob = apps.get_model('portal', 'IngestJob')
+    for job in IngestJob.objects.filter(content__isnull=False).iterator():
+        job.upload.save(job.file_name, ContentFile(bytes(job.content)), save=False)
+        job.content = None
+        job.save(update_fields=['upload', 'content'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0011_trainingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='upload',
+            field=models.FileField(blank=True, help_text='the uploaded file (under MEDIA_ROOT), removed once processed', null=True, upload_to='ingest'),
+        ),
+        migrations.RunPython(spool_contents, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='ingestjob',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.9 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0012_ingestjob_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='worker',
+            field=models.CharField(blank=True, help_text='host and process id that runs the job', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='worker',
+            field=models.CharField(blank=True, help_text='host and process id that runs the job', max_length=100),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0013_job_worker'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trainingjob',
+            name='max_iterations',
+            field=models.PositiveIntegerField(blank=True, help_text='measurements merged at most (no limit if empty)', null=True),
+        ),
+    ]
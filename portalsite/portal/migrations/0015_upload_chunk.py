@@ -0,0 +1,49 @@
+# Generated by Django 3.2.9 on 2026-10-17 20:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+CHUNK_SIZE = 2**20
+
+
+def store_uploads(apps, schema_editor):
+    # the files of unprocessed uploads are moved into the database (if still present on this host)
+    IngestJob = apps.get_model('portal', 'IngestJob')
+    UploadChunk = apps.get_model('portal', 'UploadChunk')
+    for job in IngestJob.objects.exclude(upload='').exclude(upload__isnull=True).iterator():
+        if job.upload.storage.exists(job.upload.name):
+            with job.upload.open('rb') as upload:
+                for index, data in enumerate(upload.chunks(CHUNK_SIZE)):
+                    UploadChunk.objects.create(job=job, index=index, data=data)
+            job.upload.delete(save=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0014_trainingjob_max_iterations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(help_text='position of the chunk in the file')),
+                ('data', models.BinaryField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_chunks', to='portal.ingestjob')),
+            ],
+            options={
+                'ordering': ['job', 'index'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='uploadchunk',
+            constraint=models.UniqueConstraint(fields=('job', 'index'), name='unique_upload_chunk'),
+        ),
+        migrations.RunPython(store_uploads, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='ingestjob',
+            name='upload',
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.9 on 2026-10-17 20:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_derived_data(apps, schema_editor):
+    # the packed data and column statistics were computed (and written) on first read for older rows
+    # pylint: disable=import-outside-toplevel
+    from portal.core import DATAHANDLERS, MATRIX_FILES
+    from portal.core.arraypacking import unpack_array
+    from portal.core.statistics import ColumnStatistics
+
+    Payload = apps.get_model('portal', 'Payload')
+    max_features = getattr(settings, 'PORTAL_STATISTICS_COMOMENTS_MAX_FEATURES', 500)
+    payloads = Payload.objects.filter(n_features__isnull=False)
+    missing = models.Q(packed_data__isnull=True, matrix_file__isnull=True) | models.Q(packed_statistics__isnull=True)
+    for payload in payloads.filter(missing).iterator():
+        handler = DATAHANDLERS.get(payload.data_handler)
+        try:
+            if payload.matrix_file is not None:
+                model_input = handler.matrix_to_model_input(MATRIX_FILES.open(payload.matrix_file))
+            else:
+                if handler.supports_packing and payload.packed_data is None:
+                    payload.packed_data = handler.to_binary(payload.data)
+                model_input = (handler.matrix_to_model_input(unpack_array(payload.packed_data))
+                               if payload.packed_data is not None else handler.to_model_input(payload.data))
+        except ValueError:
+            continue
+        if model_input.ndim == 2 and model_input.dtype.kind in 'biuf':
+            statistics = ColumnStatistics.from_matrix(model_input, model_input.shape[1] <= max_features)
+            payload.packed_statistics = statistics.to_binary()
+        payload.save(update_fields=['packed_data', 'packed_statistics'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0015_upload_chunk'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_derived_data, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.9 on 2026-10-17 20:55
+
+from django.db import migrations
+
+
+def pack_numpy_arrays(apps, schema_editor):
+    # numpy arrays were decoded from their json text on every read, they are read from the packed matrix now
+    # pylint: disable=import-outside-toplevel
+    from portal.core import NUMPYARRAYSHANDLER
+
+    Payload = apps.get_model('portal', 'Payload')
+    payloads = Payload.objects.filter(data_handler=NUMPYARRAYSHANDLER.id_, packed_data__isnull=True,
+                                      matrix_file__isnull=True)
+    for payload in payloads.iterator():
+        try:
+            payload.packed_data = NUMPYARRAYSHANDLER.to_binary(payload.data)
+        except ValueError:
+            continue
+        payload.save(update_fields=['packed_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0016_payload_derived_data'),
+    ]
+
+    operations = [
+        migrations.RunPython(pack_numpy_arrays, migrations.RunPython.noop),
+    ]
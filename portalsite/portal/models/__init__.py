@@ -3,8 +3,12 @@ Contains all DJANGO database models
 """
 
 from .group import Group
+from .ingest_job import IngestJob
 from .measurement import Measurement
 from .model import Model
+from .payload import Payload
 from .scoring import Scoring
 from .source import Source
 from .prediction import Prediction
+from .training_job import TrainingJob
+from .upload_chunk import UploadChunk
@@ -0,0 +1,109 @@
+"""Custom data base fields"""
+
+# region imports
+# standard
+from typing import Any, Optional
+
+# 3rd party
+from django import forms
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+# local
+from portal.core import compression
+from portal.core.compression import BlobSizes
+
+# type hints
+
+# endregion
+
+
+class CompressedText:  # pylint: disable=too-few-public-methods
+    """Text as loaded from the database, decompressed on first access"""
+
+    def __init__(self, blob: bytes) -> None:
+        self.blob = blob
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = compression.decompress(self.blob)
+        return self._text
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """Returns the text of the field, decompressing it lazily (and only once) on access"""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        return value.text if isinstance(value, CompressedText) else value
+
+    def __set__(self, instance, value) -> None:
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.BinaryField):
+    """
+    Text field that is stored compressed (see `core.compression`), using the codec and level from the settings
+    `PORTAL_COMPRESSION_CODEC` and `PORTAL_COMPRESSION_LEVEL`. Blobs are decompressed lazily on attribute access,
+    and unchanged blobs are written back without recompression. Serializes to plain text (e.g. in fixtures).
+    """
+    descriptor_class = CompressedTextDescriptor
+
+    def __init__(self, *args, **kwargs) -> None:
+        # unlike binary data, text can be edited (e.g. in the admin)
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get('editable') is True:
+            del kwargs['editable']
+        else:
+            kwargs['editable'] = False
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, _expression, _connection) -> Optional[CompressedText]:
+        if value is None:
+            return None
+        return CompressedText(bytes(value))
+
+    def to_python(self, value: Any) -> Optional[str]:
+        if isinstance(value, CompressedText):
+            return value.text
+        return value
+
+    def get_prep_value(self, value: Any) -> Optional[bytes]:
+        if value is None:
+            return None
+        if isinstance(value, CompressedText):
+            return value.blob
+        return compression.compress(value,
+                                    getattr(settings, 'PORTAL_COMPRESSION_CODEC', 'zlib'),
+                                    getattr(settings, 'PORTAL_COMPRESSION_LEVEL', None))
+
+    def value_to_string(self, obj) -> str:
+        return self.value_from_object(obj)
+
+    def formfield(self, form_class=None, choices_form_class=None, **kwargs):
+        return models.Field.formfield(self, form_class=form_class or forms.CharField,
+                                      choices_form_class=choices_form_class, **{'widget': forms.Textarea, **kwargs})
+
+    def is_unchanged(self, instance: models.Model) -> bool:
+        """Whether the value of the instance is as loaded from the database (i.e. not assigned since, or deferred)"""
+        return (self.attname not in instance.__dict__
+                or isinstance(instance.__dict__[self.attname], CompressedText))
+
+    def sizes(self, instance: models.Model) -> Optional[BlobSizes]:
+        """Returns the stored and logical size of the field value of the instance (None if the value is None)"""
+        # read through the parent descriptor, to get the blob without decompressing it
+        value = DeferredAttribute.__get__(getattr(type(instance), self.attname), instance)
+        if value is None:
+            return None
+        if isinstance(value, CompressedText):
+            return compression.sizes(value.blob)
+        return compression.sizes(self.get_prep_value(value))
@@ -0,0 +1,192 @@
+"""Data base model: IngestJob"""
+
+# region imports
+# standard
+import logging
+from contextlib import contextmanager
+from dataclasses import asdict
+from tempfile import SpooledTemporaryFile
+from typing import IO, TYPE_CHECKING, Iterator
+from django.conf import settings
+from django.core.files.base import File
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+# 3rd party
+
+# local
+from portal.core import DATAHANDLERS
+from .group import Group
+from .measurement import Measurement
+from .payload import Payload
+from .source import Source
+from .upload_chunk import UploadChunk
+
+# type hints
+if TYPE_CHECKING:
+    from core.dataclasses import ValidationResult
+
+# endregion
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# the state columns are set by methods (see `claim` and `_finish`), which pylint counts as instance attributes
+class IngestJob(models.Model):  # pylint: disable=too-many-instance-attributes
+    """
+    Upload of a measurement file, accepted immediately and parsed, validated and saved later
+    (in the background, see `portal.jobs`). Keeps the raw file (in chunks, see `UploadChunk`) until it is processed,
+    and the outcome afterwards.
+    """
+
+    class Status(models.TextChoices):
+        """State of an upload, see `IngestJob.claim` and `IngestJob.run`"""
+        QUEUED = 'queued'
+        RUNNING = 'running'
+        SUCCEEDED = 'succeeded'
+        FAILED = 'failed'
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    time_created = models.DateTimeField(auto_now_add=True, help_text="time the upload was accepted")
+    time_started = models.DateTimeField(null=True, blank=True, help_text="time the processing started")
+    time_finished = models.DateTimeField(null=True, blank=True, help_text="time the processing finished")
+    worker = models.CharField(max_length=100, blank=True, help_text="host and process id that runs the job")
+    user_created = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        help_text="user that uploaded the file",
+        related_name='+',
+    )
+
+    # the measurement to create
+    name = models.CharField(max_length=50)
+    data_handler = models.CharField(max_length=DATAHANDLERS.id_length, choices=DATAHANDLERS.choices)
+    source = models.ForeignKey(Source, on_delete=models.CASCADE)
+    groups = models.ManyToManyField(Group, blank=True)
+    time_measured = models.DateTimeField(help_text="time the data was measured")
+    notes = models.TextField(null=True, blank=True)
+    file_name = models.CharField(max_length=255)
+
+    # outcome
+    message = models.CharField(max_length=100, blank=True)
+    details = models.TextField(blank=True)
+    validation_results = models.JSONField(default=list, blank=True,
+                                          help_text="the validation results, as list of json objects")
+    measurement = models.ForeignKey(Measurement, null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        ordering = ['-time_created']
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.status})"
+
+    def get_absolute_url(self) -> str:
+        """Returns the url to display the object."""
+        return reverse('ingestjob-detail', args=[str(self.id)])
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (IngestJob.Status.SUCCEEDED, IngestJob.Status.FAILED)
+
+    def status_dict(self) -> dict:
+        """The status and outcome, as json-compatible dictionary"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'time_created': self.time_created,
+            'time_started': self.time_started,
+            'time_finished': self.time_finished,
+            'message': self.message,
+            'details': self.details,
+            'validation_results': self.validation_results,
+            'measurement': self.measurement.get_absolute_url() if self.measurement is not None else None,
+        }
+
+    def claim(self, worker: str = "") -> bool:
+        """
+        Marks a queued job as running by the worker (process). Returns False if it is not queued (e.g. claimed by
+        another worker).
+        """
+        now = timezone.now()
+        claimed = IngestJob.objects.filter(pk=self.pk, status=IngestJob.Status.QUEUED).update(
+            status=IngestJob.Status.RUNNING, time_started=now, worker=worker)
+        if claimed:
+            self.status, self.time_started, self.worker = IngestJob.Status.RUNNING, now, worker
+        return claimed == 1
+
+    def store_upload(self, file: File) -> None:
+        """Stores the file of the (saved) job chunk by chunk, to be processed by `run`"""
+        for index, data in enumerate(file.chunks(UploadChunk.SIZE)):
+            UploadChunk.objects.create(job=self, index=index, data=data)
+
+    @contextmanager
+    def _open_upload(self) -> Iterator[IO[bytes]]:
+        """The stored file, spooled to a local temporary file (in memory if small) such that it can be seeked"""
+        with SpooledTemporaryFile(max_size=UploadChunk.SIZE) as upload:
+            chunks = UploadChunk.objects.filter(job=self).order_by('index').values_list('data', flat=True)
+            for data in chunks.iterator(chunk_size=1):
+                upload.write(data)
+            upload.seek(0)
+            yield upload
+
+    def run(self) -> None:
+        """Parses and validates the file and saves the measurement, recording the outcome (for a claimed job)"""
+        try:
+            # the file is read in chunks, as the upload was spooled
+            with self._open_upload() as upload:
+                payload, validation_results = Payload.from_file(self.data_handler, File(upload, name=self.file_name))
+        except UnicodeDecodeError as decode_error:
+            self._finish(False, "Unicode decoding error", str(decode_error))
+            return
+        except ValueError as read_error:
+            self._finish(False, "Failed to read file", str(read_error))
+            return
+
+        if any(not result.success for result in validation_results):
+            self._finish(False, "Validation failed",
+                         "\n".join(f"{result.name}: {result.details}" for result in validation_results),
+                         validation_results)
+            return
+
+        payload_is_new = payload.pk is None
+        measurement = Measurement()
+        measurement.data_handler = self.data_handler
+        measurement.set_payload(payload)
+        measurement.source = self.source
+        measurement.name = self.name
+        measurement.time_measured = self.time_measured
+        measurement.user_created = self.user_created
+        measurement.user_changed = self.user_created
+        measurement.notes = self.notes
+        try:
+            with transaction.atomic():
+                if Measurement.objects.filter(name__exact=self.name).exists():
+                    self._finish(False, "Name already exists", "A measurement with this name was saved meanwhile")
+                    return
+                measurement.save()
+                measurement.groups.set(self.groups.all())
+        except Exception as exc:  # pylint: disable=broad-except
+            if payload_is_new:
+                # the file written for the new payload was rolled back with it
+                payload.discard_matrix_file()
+            _LOGGER.exception("saving the measurement of ingest job %s failed", self.pk)
+            self._finish(False, "Internal problem", str(exc))
+            return
+
+        self.measurement = measurement
+        self._finish(True, "Data uploaded and saved", "", validation_results)
+
+    def _finish(self,
+                success: bool,
+                message: str,
+                details: str,
+                validation_results: list['ValidationResult'] = None) -> None:
+        self.status = IngestJob.Status.SUCCEEDED if success else IngestJob.Status.FAILED
+        self.message = message
+        self.details = details
+        self.validation_results = [asdict(result) for result in validation_results or []]
+        self.time_finished = timezone.now()
+        UploadChunk.objects.filter(job=self).delete()
+        self.save()
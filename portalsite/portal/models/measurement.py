@@ -2,8 +2,8 @@
 
 # region imports
 # standard
-from typing import TYPE_CHECKING
-from django.db import models
+from typing import TYPE_CHECKING, Optional
+from django.db import models, transaction
 from django.urls import reverse
 from django.conf import settings
 
@@ -12,17 +12,65 @@ from numpy import ndarray
 
 # local
 from portal.core import DATAHANDLERS
+from portal.core.statistics import ColumnStatistics
+from .payload import Payload
 from .source import Source
 from .group import Group
 
 # type hints
 if TYPE_CHECKING:
-    from core.dataclasses import ValidationResult
+    from core.compression import BlobSizes
+    from core.dataclasses import DataPreview, ValidationResult
     from core.data_handler import DataHandler
+    from .model import Model
 
 # endregion
 
 
+class MeasurementQuerySet(models.QuerySet):
+    """Measurement queries, filtering on the data shape and label columns in the database"""
+
+    def compatible_with(self, model: 'Model') -> 'MeasurementQuerySet':
+        """Measurements that are a valid (prediction) input for the model"""
+        if model.n_features is None:
+            return self
+        return self.filter(n_features=model.n_features)
+
+    def trainable_for(self, model: 'Model') -> 'MeasurementQuerySet':
+        """Labelled measurements that are compatible with the model"""
+        return self.compatible_with(model).filter(is_labelled=True)
+
+    def column_statistics(self) -> Optional[ColumnStatistics]:
+        """
+        Combined statistics of the model input columns of the measurements, read from the stored statistics without
+        loading the data. None if there are no measurements or some have no statistics (e.g. non-numeric data).
+        """
+        by_payload: dict[int, Optional[ColumnStatistics]] = {}
+        statistics = []
+        for measurement in self.select_related('payload').defer('payload__data', 'payload__packed_data'):
+            if measurement.payload_id not in by_payload:
+                by_payload[measurement.payload_id] = measurement.payload.column_statistics()
+            if by_payload[measurement.payload_id] is None:
+                return None
+            statistics.append(by_payload[measurement.payload_id])
+        return ColumnStatistics.combine_all(statistics)
+
+    def check_new_names(self, names: list[str]) -> dict[str, str]:
+        """Returns the reasons the names can not be given to new measurements: invalid, repeated or existing names"""
+        max_length = self.model._meta.get_field('name').max_length
+        existing = set(self.filter(name__in=names).values_list('name', flat=True))
+        report, seen = {}, set()
+        for name in names:
+            if name in seen:
+                report[name] = "name appears more than once in the upload"
+            elif name in existing:
+                report[name] = "name already exists"
+            elif not name or len(name) > max_length:
+                report[name] = f"name must have between 1 and {max_length} characters"
+            seen.add(name)
+        return report
+
+
 class Measurement(models.Model):
     """Represents a measurement"""
 
@@ -59,17 +107,25 @@ class Measurement(models.Model):
     )
 
     # data interface
-    data = models.TextField(help_text='file data, serialized to string in a suitable way')
     data_handler = models.CharField(max_length=DATAHANDLERS.id_length, choices=DATAHANDLERS.choices)
+    payload = models.ForeignKey(Payload, on_delete=models.PROTECT,
+                                help_text="the data, shared by all measurements with the same content")
+
+    # data shape and labels (copied from the payload, for filtering without joins)
+    n_rows = models.IntegerField(null=True, editable=False, db_index=True, help_text="number of rows (samples)")
+    n_features = models.IntegerField(null=True, editable=False, db_index=True,
+                                     help_text="number of model input features (columns)")
+    is_labelled = models.BooleanField(default=False, editable=False, db_index=True,
+                                      help_text="whether the data has model target values")
+    n_distinct_labels = models.IntegerField(null=True, editable=False,
+                                            help_text="number of distinct model target values")
+
+    objects = MeasurementQuerySet.as_manager()
 
     @property
     def handler(self) -> 'DataHandler':
         return DATAHANDLERS.get(self.data_handler)
 
-    @property
-    def is_labelled(self) -> bool:
-        return not self.model_target is None
-
     # this is a not very elegant short cut - the length parameter should really be controlled in the view
     @property
     def groups_as_short_text(self) -> str:
@@ -81,6 +137,33 @@ class Measurement(models.Model):
     def __str__(self) -> str:
         return str(self.name)
 
+    @property
+    def data(self) -> str:
+        return self.payload.data
+
+    def data_sizes(self) -> 'BlobSizes':
+        """Stored (compressed) and logical size of the data"""
+        return self.payload.data_sizes()
+
+    def save(self, *args, **kwargs) -> None:
+        if self.payload_id is None:
+            # new data (see `set_data`) is stored along with the measurement
+            self.set_payload(self.payload.save_unique())
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        payload_id = self.payload_id
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            # keep payloads only while referenced, e.g. temporary uploads for predictions are not kept. The payload is
+            # locked before looking for references: an upload reusing it concurrently either commits first (and the
+            # payload is kept) or waits and then fails on the foreign key, instead of pointing to a deleted payload
+            orphan = (Payload.objects.select_for_update().filter(pk=payload_id)
+                      .defer('data', 'packed_data', 'packed_statistics').first())
+            if orphan is not None and not Measurement.objects.filter(payload_id=payload_id).exists():
+                orphan.delete()
+        return result
+
     def get_absolute_url(self) -> str:
         """Returns the url to display the object."""
         return reverse('measurement-detail', args=[str(self.id)])
@@ -99,11 +182,36 @@ class Measurement(models.Model):
     def as_json(self) -> str:
         return self.handler.to_json(self.data)
 
+    def preview(self, row_start: int, row_count: int, column_start: int, column_count: int) -> 'DataPreview':
+        """Returns a window of the data, to be displayed (see `DataHandler.preview`)"""
+        return self.payload.preview(row_start, row_count, column_start, column_count)
+
+    def column_statistics(self) -> Optional[ColumnStatistics]:
+        """Statistics of the model input columns, computed once when the data was stored"""
+        return self.payload.column_statistics()
+
     def model_input(self) -> ndarray:
-        return self.handler.to_model_input(self.data)
+        """Returns the model input as (read-only) array, cached per process and shared with equal measurements"""
+        return self.payload.model_input()
 
     def model_target(self) -> ndarray:
-        return self.handler.to_model_target(self.data)
+        """Returns the model target as (read-only) array, cached per process and shared with equal measurements"""
+        return self.payload.model_target()
+
+    def set_data(self, data: str, packed_data: Optional[bytes] = None, file_digest: Optional[str] = None) -> None:
+        """
+        Sets the data (using the data handler of this measurement), together with its packed binary if already at hand.
+        Data with the same content as stored data is deduplicated. New data is stored on save.
+        """
+        self.set_payload(Payload.from_data(self.data_handler, data, packed_data, file_digest))
+
+    def set_payload(self, payload: Payload) -> None:
+        """Points this measurement to the payload, copying its shape and label columns."""
+        self.payload = payload
+        self.n_rows = payload.n_rows
+        self.n_features = payload.n_features
+        self.is_labelled = payload.is_labelled
+        self.n_distinct_labels = payload.n_distinct_labels
 
     def validate(self) -> list['ValidationResult']:
-        return self.handler.validate(self.data)
+        return self.payload.validate()
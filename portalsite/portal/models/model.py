@@ -2,31 +2,82 @@
 
 # region imports
 # standard
-from typing import TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Hashable, Optional
 
 # 3rd party
-from django.db import models
+import numpy as np
+from django.db import connection, models
 from django.urls import reverse
 from django.conf import settings
 
 # local
-from portal.core import MODELTYPES
+from portal.core import MODEL_OBJECTS, MODELTYPES
+from portal.core.model_type import PreprocessingModelType
 from .scoring import Scoring
 from .prediction import Prediction
 from .group import Group
+from .fields import CompressedTextField
 
 # type hints
 if TYPE_CHECKING:
+    from portal.core.compression import BlobSizes
     from portal.core.model_type import ModelType
     from portal.models import Measurement
 # endregion
 
 
+class ModelQuerySet(models.QuerySet):
+    """Model queries, filtering on the feature count column in the database"""
+
+    def compatible_with(self, measurement: 'Measurement') -> 'ModelQuerySet':
+        """Models that accept the measurement as (prediction) input"""
+        return self.filter(models.Q(n_features=measurement.n_features) | models.Q(n_features__isnull=True))
+
+    def predict(self, measurement: 'Measurement') -> list[Prediction]:
+        """
+        Returns new (unsaved) predictions of the measurement by each of the models that is compatible with it.
+        The measurement is parsed once and shared, it is preprocessed once per group of models with the same
+        preprocessing (see `PreprocessingModelType.preprocessing_key`), and the models predict in parallel threads
+        (at most `PORTAL_PREDICTION_WORKERS`).
+        """
+        compatible_models = [model for model in self if model.is_compatible(measurement)]
+        # parse (and cache) the data before the threads use it
+        model_input = measurement.model_input()
+        if measurement.is_labelled:
+            measurement.model_target()
+        preprocessed: dict[Hashable, np.ndarray] = {}
+        keys = [model.get_type.preprocessing_key(model) if isinstance(model.get_type, PreprocessingModelType) else None
+                for model in compatible_models]
+        for model, key in zip(compatible_models, keys):
+            if key is not None and key not in preprocessed:
+                preprocessed[key] = model.get_type.preprocess(model, model_input)
+
+        workers = min(len(compatible_models), getattr(settings, 'PORTAL_PREDICTION_WORKERS', 4))
+        if workers <= 1:
+            return [model.predict(measurement, preprocessed.get(key)) for model, key in zip(compatible_models, keys)]
+
+        def predict(model: 'Model', key: Optional[Hashable]) -> Prediction:
+            try:
+                return model.predict(measurement, preprocessed.get(key))
+            finally:
+                # a thread that needed the database has its own connection, which must be closed when done
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='portal-predict') as executor:
+            return list(executor.map(predict, compatible_models, keys))
+
+
 class Model(models.Model):
     """Prediction model: combines with measurement to create a scoring"""
 
     name = models.CharField(unique=True, max_length=50)
-    data = models.TextField(help_text='model data (weights, parameters, coefficients, etc.), serialized to string')
+    data = CompressedTextField(help_text='model data (weights, parameters, coefficients, etc.), serialized to string'
+                               + ' (stored compressed)')
+    calibration_data = CompressedTextField(null=True, blank=True, editable=False,
+                                           help_text='model data only needed to retrain or recalibrate (e.g. the'
+                                           + ' calibration data of SIMCA models), split off on save'
+                                           + ' (stored compressed)')
 
     groups = models.ManyToManyField(Group)
 
@@ -35,6 +86,11 @@ class Model(models.Model):
 
     # type interface
     model_type = models.CharField(max_length=MODELTYPES.id_length, choices=MODELTYPES.choices)
+    n_features = models.IntegerField(null=True, editable=False, db_index=True,
+                                     help_text="number of input features the model expects, empty if it accepts any"
+                                     + " (derived from data on save)")
+
+    objects = ModelQuerySet.as_manager()
 
     # change tracking attributes
     time_created = models.DateTimeField(auto_now_add=True, help_text="fist time this measurement was saved to database")
@@ -78,6 +134,19 @@ class Model(models.Model):
             text = text[: max(1, max_length-3)] + "..."
         return text
 
+    def data_sizes(self) -> 'BlobSizes':
+        """Stored (compressed) and logical size of the data"""
+        return self._meta.get_field('data').sizes(self)
+
+    def deserialized(self, load: Callable[[], Any]) -> Any:
+        """
+        Returns the deserialized data, as created by `load` - cached per process for saved models, keyed by the time
+        the model was changed. The returned object is shared and must not be modified.
+        """
+        if self.pk is None or not self._meta.get_field('data').is_unchanged(self):
+            return load()
+        return MODEL_OBJECTS.get_or_create((self.pk, self.time_changed), load)
+
     def score(self, measurement: 'Measurement') -> Scoring:
         """Returns a new scoring"""
         if not measurement.is_labelled:
@@ -87,18 +156,56 @@ class Model(models.Model):
             model=self,
             measurement=measurement)
 
-    def predict(self, measurement: 'Measurement') -> Prediction:
-        """Returns a new prediction"""
-        return Prediction(
-            result=self.get_type.predict(self, measurement),
-            score=self.get_type.score(self, measurement) if measurement.is_labelled else float('NaN'),
-            model=self,
-            measurement=measurement)
+    def predict(self, measurement: 'Measurement', preprocessed: Optional[np.ndarray] = None) -> Prediction:
+        """Returns a new prediction, from the preprocessed model input if given (see `PreprocessingModelType`)"""
+        if preprocessed is None:
+            result = self.get_type.predict(self, measurement)
+            score = self.get_type.score(self, measurement) if measurement.is_labelled else float('NaN')
+        else:
+            result = self.get_type.predict_preprocessed(self, preprocessed)
+            score = (self.get_type.score_preprocessed(self, preprocessed, measurement.model_target())
+                     if measurement.is_labelled else float('NaN'))
+        return Prediction(result=result, score=score, model=self, measurement=measurement)
+
+    def score_many(self, measurements: list['Measurement']) -> list[Scoring]:
+        """Returns new scorings of the (labelled) measurements, evaluated at once"""
+        values = self.get_type.score_many(self, measurements)
+        return [Scoring(value=value, model=self, measurement=measurement)
+                for value, measurement in zip(values, measurements)]
+
+    def predict_many(self, measurements: list['Measurement']) -> list[Prediction]:
+        """Returns new predictions of the measurements, evaluated at once"""
+        results = self.get_type.predict_many(self, measurements)
+        scores = iter(self.get_type.score_many(
+            self, [measurement for measurement in measurements if measurement.is_labelled]))
+        return [Prediction(result=result,
+                           score=next(scores) if measurement.is_labelled else float('NaN'),
+                           model=self,
+                           measurement=measurement)
+                for result, measurement in zip(results, measurements)]
 
     def is_compatible(self, measurement: 'Measurement') -> bool:
         """Returns true iff the measurement is a valid input (for this models prediction)"""
+        if self.n_features is not None and measurement.n_features is not None:
+            return self.n_features == measurement.n_features
         return self.get_type.compatible(self, measurement)
 
+    def save(self, *args, **kwargs) -> None:
+        if not self._meta.get_field('data').is_unchanged(self):
+            self.data, calibration_data = self.get_type.split_data(self.data)
+            if calibration_data is not None:
+                self.calibration_data = calibration_data
+        self.n_features = self.get_type.feature_count(self)
+        super().save(*args, **kwargs)
+        # entries of older versions are not used anymore
+        MODEL_OBJECTS.invalidate(lambda key: key[0] == self.pk)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        result = super().delete(*args, **kwargs)
+        MODEL_OBJECTS.invalidate(lambda key: key[0] == pk)
+        return result
+
     def __str__(self):
         return str(self.name)
 
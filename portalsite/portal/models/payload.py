@@ -0,0 +1,286 @@
+"""Data base model: Payload"""
+
+# region imports
+# standard
+from dataclasses import replace
+from uuid import uuid4
+from typing import TYPE_CHECKING, Callable, Optional
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+
+# 3rd party
+import numpy as np
+from numpy import ndarray
+
+# local
+from portal.core import DATAHANDLERS, MATRIX_FILES, PAYLOAD_ARRAYS
+from portal.core.arraypacking import unpack_array
+from portal.core.ingest import file_digest
+from portal.core.statistics import ColumnStatistics
+from .fields import CompressedTextField
+
+# type hints
+if TYPE_CHECKING:
+    from django.core.files.uploadedfile import UploadedFile
+    from core.compression import BlobSizes
+    from core.dataclasses import DataPreview, ValidationResult
+    from core.data_handler import DataHandler
+
+# endregion
+
+
+class PayloadQuerySet(models.QuerySet):
+    """Payload queries, looking up stored data by digest"""
+
+    def for_file(self, data_handler: str, raw_digest: str) -> Optional['Payload']:
+        """The payload stored from a file with this digest (see `core.ingest.file_digest`), if any"""
+        return self.filter(data_handler=data_handler, file_digest=raw_digest).first()
+
+    def store(self, payloads: list['Payload']) -> dict[str, 'Payload']:
+        """
+        Stores the new payloads in bulk, skipping content that is stored already.
+        Returns the stored payloads for all given digests (without their data loaded), by digest.
+        If the transaction is rolled back, the caller removes the matrix files of the new payloads
+        (see `discard_matrix_file`).
+        """
+        new_payloads = {payload.digest: payload for payload in payloads if payload.pk is None}
+        for payload in new_payloads.values():
+            # bulk_create does not call save
+            payload.move_matrix_to_file()
+        self.bulk_create(new_payloads.values(), batch_size=100, ignore_conflicts=True)
+        digests = [payload.digest for payload in payloads]
+        stored = {payload.digest: payload
+                  for payload in self.filter(digest__in=digests).defer('data', 'packed_data', 'packed_statistics')}
+        for digest, payload in new_payloads.items():
+            if stored[digest].matrix_file != payload.matrix_file:
+                # the content was stored before (or meanwhile), with a file of its own
+                payload.discard_matrix_file()
+        return stored
+
+
+# the derived columns are filled by methods (see `build`), which pylint counts as instance attributes
+class Payload(models.Model):  # pylint: disable=too-many-instance-attributes
+    """
+    Measurement data, stored once per distinct content (addressed by the digest of the data handler)
+    and shared by all measurements with that content. Payloads are immutable once saved.
+    """
+
+    digest = models.CharField(unique=True, max_length=64, editable=False,
+                              help_text="hash of the (normalized) content, computed by the data handler")
+    file_digest = models.CharField(null=True, max_length=64, editable=False, db_index=True,
+                                   help_text="hash of the raw file this was first read from, to skip parsing it again")
+    time_created = models.DateTimeField(auto_now_add=True, help_text="fist time this data was saved to database")
+
+    # data interface
+    data = CompressedTextField(help_text='file data, serialized to string in a suitable way (stored compressed)')
+    data_handler = models.CharField(max_length=DATAHANDLERS.id_length, choices=DATAHANDLERS.choices)
+    packed_data = models.BinaryField(
+        null=True,
+        editable=False,
+        help_text='numeric content of the data, packed to binary by the data handler')
+    matrix_file = models.CharField(
+        null=True,
+        max_length=100,
+        editable=False,
+        help_text='file with the numeric content (see core.matrixfiles), used instead of the packed data if large')
+    packed_statistics = models.BinaryField(
+        null=True,
+        editable=False,
+        help_text='statistics of the model input columns (see core.statistics), computed once from the data')
+
+    # data shape and labels (derived from data)
+    n_rows = models.IntegerField(null=True, editable=False, help_text="number of rows (samples)")
+    n_features = models.IntegerField(null=True, editable=False, help_text="number of model input features (columns)")
+    is_labelled = models.BooleanField(default=False, editable=False,
+                                      help_text="whether the data has model target values")
+    n_distinct_labels = models.IntegerField(null=True, editable=False,
+                                            help_text="number of distinct model target values")
+
+    objects = PayloadQuerySet.as_manager()
+
+    @property
+    def handler(self) -> 'DataHandler':
+        return DATAHANDLERS.get(self.data_handler)
+
+    def __str__(self) -> str:
+        return str(self.digest)
+
+    def data_sizes(self) -> 'BlobSizes':
+        """Stored (compressed) and logical size of the data"""
+        return self._meta.get_field('data').sizes(self)
+
+    @staticmethod
+    def from_data(data_handler: str,
+                  data: str,
+                  packed_data: Optional[bytes] = None,
+                  raw_digest: Optional[str] = None) -> 'Payload':
+        """Returns the stored payload with the same content, or a new (unsaved) one (see `build`)"""
+        payload = Payload.build(data_handler, data, packed_data, raw_digest)
+        existing = Payload.objects.filter(digest=payload.digest).first()
+        if existing is None:
+            return payload
+        if existing.file_digest is None and raw_digest is not None:
+            # remember the file, to skip parsing it on the next upload
+            existing.file_digest = raw_digest
+            Payload.objects.filter(pk=existing.pk).update(file_digest=raw_digest)
+        return existing
+
+    @staticmethod
+    def from_file(data_handler: str, file: 'UploadedFile') -> tuple['Payload', list['ValidationResult']]:
+        """
+        Returns the payload for the uploaded file and its validation results. Stored payloads are returned without
+        parsing (if the same file was uploaded before) or validating (if the same content was uploaded before).
+        Raises UnicodeDecodeError or ValueError if the file can not be read.
+        """
+        digest = file_digest(data_handler, file.chunks())
+        payload = Payload.objects.for_file(data_handler, digest)
+        if payload is not None:
+            return payload, []
+
+        data, packed_data = DATAHANDLERS.get(data_handler).load_packed_from_file(file)
+        payload = Payload.from_data(data_handler, data, packed_data, digest)
+        if payload.pk is not None:
+            return payload, []
+        return payload, payload.validate()
+
+    @staticmethod
+    def build(data_handler: str,
+              data: str,
+              packed_data: Optional[bytes] = None,
+              raw_digest: Optional[str] = None,
+              digest: Optional[str] = None) -> 'Payload':
+        """
+        Returns a new (unsaved) payload with its derived columns filled, remembering the digest of the raw file it was
+        read from (if any). The packed data and digest are computed unless given.
+        """
+        payload = Payload(data_handler=data_handler, data=data, packed_data=packed_data, file_digest=raw_digest)
+        if packed_data is None:
+            payload.pack_data()
+        payload.digest = digest if digest is not None else payload.handler.digest(data, payload.packed_data)
+        payload.refresh_metadata()
+        return payload
+
+    def save(self, *args, **kwargs) -> None:
+        if self.pk is None:
+            self.move_matrix_to_file()
+        super().save(*args, **kwargs)
+
+    def save_unique(self) -> 'Payload':
+        """Saves the payload if new and returns the stored one, which differs if the same content was saved meanwhile"""
+        if self.pk is not None:
+            return self
+        try:
+            with transaction.atomic():
+                self.save()
+        except IntegrityError:
+            self.discard_matrix_file()
+            return Payload.objects.get(digest=self.digest)
+        return self
+
+    def model_input(self) -> ndarray:
+        """Returns the model input as (read-only) array, cached per process for saved payloads"""
+        return self._cached_array('input', self._load_model_input)
+
+    def model_target(self) -> ndarray:
+        """Returns the model target as (read-only) array, cached per process for saved payloads"""
+        return self._cached_array('target', self._load_model_target)
+
+    def _cached_array(self, part: str, load: Callable[[], ndarray]) -> ndarray:
+        if self.pk is None or self.matrix_file is not None:
+            # memory maps are not copied into the cache, they share the page cache of the operating system instead
+            return load()
+        # payloads are immutable, so the cached arrays never go stale
+        return PAYLOAD_ARRAYS.get_or_create((self.pk, part), load)
+
+    def _load_model_input(self) -> ndarray:
+        matrix = self._load_matrix()
+        if matrix is None:
+            return self.handler.to_model_input(self.data)
+        return self.handler.matrix_to_model_input(matrix)
+
+    def _load_model_target(self) -> ndarray:
+        matrix = self._load_matrix()
+        if matrix is None:
+            return self.handler.to_model_target(self.data)
+        return self.handler.matrix_to_model_target(matrix)
+
+    def _load_matrix(self) -> Optional[ndarray]:
+        """The unpacked numeric content, memory mapped if stored in a file. None if the data can not be packed."""
+        if not self.handler.supports_packing:
+            return None
+        if self.matrix_file is not None:
+            return MATRIX_FILES.open(self.matrix_file)
+        return unpack_array(self.packed_data) if self.packed_data is not None else None
+
+    def pack_data(self) -> None:
+        """(Re)computes the packed data from the data, leaving it empty if the data can not be packed."""
+        try:
+            self.packed_data = self.handler.to_binary(self.data)
+        except ValueError:
+            self.packed_data = None
+
+    def refresh_metadata(self) -> None:
+        """Recomputes the shape and label columns from the data, leaving them empty if the data can not be read."""
+        try:
+            model_input = self._load_model_input()
+            model_target = self._load_model_target()
+        except ValueError:
+            self.n_rows, self.n_features, self.is_labelled, self.n_distinct_labels = None, None, False, None
+            self.packed_statistics = None
+            return
+        self.n_rows = int(model_input.shape[0])
+        self.n_features = int(model_input.shape[1]) if model_input.ndim == 2 else None
+        self.is_labelled = model_target.size > 0
+        self.n_distinct_labels = len(np.unique(model_target)) if self.is_labelled else None
+        self.packed_statistics = self._compute_statistics(model_input)
+
+    def column_statistics(self) -> Optional[ColumnStatistics]:
+        """Statistics of the model input columns, None if the data is not a numeric matrix"""
+        if self.packed_statistics is not None:
+            return ColumnStatistics.from_binary(self.packed_statistics)
+        if self.n_features is None:
+            return None
+        # the statistics are stored with the payload (see `build`), rows without them are not written on reads
+        packed_statistics = self._compute_statistics(self.model_input())
+        return ColumnStatistics.from_binary(packed_statistics) if packed_statistics is not None else None
+
+    @staticmethod
+    def _compute_statistics(model_input: ndarray) -> Optional[bytes]:
+        """Packed column statistics, with comoments up to `PORTAL_STATISTICS_COMOMENTS_MAX_FEATURES` features"""
+        if model_input.ndim != 2 or model_input.dtype.kind not in 'biuf':
+            return None
+        max_features = getattr(settings, 'PORTAL_STATISTICS_COMOMENTS_MAX_FEATURES', 500)
+        return ColumnStatistics.from_matrix(model_input, model_input.shape[1] <= max_features).to_binary()
+
+    def move_matrix_to_file(self) -> None:
+        """Moves the packed data to a matrix file, if it is large (see setting `PORTAL_MATRIX_FILE_MIN_BYTES`)"""
+        min_bytes = getattr(settings, 'PORTAL_MATRIX_FILE_MIN_BYTES', None)
+        if min_bytes is None or self.packed_data is None or len(self.packed_data) < min_bytes:
+            return
+        # the name is unique per write, such that a file belongs to the one row it was written for
+        self.matrix_file = MATRIX_FILES.save(f"{self.digest}-{uuid4().hex[:8]}", unpack_array(self.packed_data))
+        self.packed_data = None
+
+    def discard_matrix_file(self) -> None:
+        """Removes the matrix file written for this payload, if it was not stored (e.g. rolled back)"""
+        if self.matrix_file is not None:
+            MATRIX_FILES.delete(self.matrix_file)
+            self.matrix_file = None
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        if self.matrix_file is not None:
+            # the file is kept until the row is gone for good, it is still read if the deletion is rolled back
+            matrix_file = self.matrix_file
+            transaction.on_commit(lambda: MATRIX_FILES.delete(matrix_file))
+        return result
+
+    def preview(self, row_start: int, row_count: int, column_start: int, column_count: int) -> 'DataPreview':
+        """Returns a window of the data (see `DataHandler.preview`), with the total number of rows filled if known"""
+        preview = self.handler.preview(self.data, row_start, row_count, column_start, column_count)
+        if preview.n_rows is None and self.n_rows is not None:
+            preview = replace(preview, n_rows=self.n_rows)
+        return preview
+
+    def validate(self) -> list['ValidationResult']:
+        return self.handler.validate(self.data)
@@ -0,0 +1,218 @@
+"""Data base model: TrainingJob"""
+
+# region imports
+# standard
+import time
+from typing import Callable, Optional
+from django.conf import settings
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+# 3rd party
+
+# local
+from .measurement import Measurement
+from .model import Model
+
+# type hints
+
+# endregion
+
+
+# the state columns are set by methods (see `claim` and `finish`), which pylint counts as instance attributes
+class TrainingJob(models.Model):  # pylint: disable=too-many-instance-attributes
+    """
+    Training of a model on measurements, accepted immediately and run later (in a worker process, see `portal.jobs`)
+    within a time and iteration budget. Holds the progress while running, and the outcome afterwards.
+    """
+
+    # the states of uploads are the same, except that they can not be cancelled
+    # pylint: disable=duplicate-code
+    class Status(models.TextChoices):
+        """State of a training, see `TrainingJob.claim` and `portal.jobs`"""
+        QUEUED = 'queued'
+        RUNNING = 'running'
+        SUCCEEDED = 'succeeded'
+        FAILED = 'failed'
+        CANCELLED = 'cancelled'
+    # pylint: enable=duplicate-code
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    time_created = models.DateTimeField(auto_now_add=True, help_text="time the training was requested")
+    time_started = models.DateTimeField(null=True, blank=True, help_text="time the training started")
+    time_finished = models.DateTimeField(null=True, blank=True, help_text="time the training finished")
+    worker = models.CharField(max_length=100, blank=True, help_text="host and process id that runs the job")
+    user_created = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        help_text="user that requested the training",
+        related_name='+',
+    )
+
+    # the training to run
+    model = models.ForeignKey(Model, on_delete=models.CASCADE, help_text="the model to train")
+    measurements = models.ManyToManyField(Measurement, help_text="the measurements to train on")
+    new_name = models.CharField(max_length=50, blank=True,
+                                help_text="name of the trained model to create (empty to update the model)")
+    max_iterations = models.PositiveIntegerField(null=True, blank=True,
+                                                 help_text="measurements merged at most (no limit if empty)")
+    max_seconds = models.PositiveIntegerField(default=600, help_text="time budget, the training is stopped after it")
+    cancel_requested = models.BooleanField(default=False)
+    progress = models.CharField(max_length=100, blank=True, help_text="the current step, while running")
+
+    # outcome
+    message = models.CharField(max_length=100, blank=True)
+    details = models.TextField(blank=True)
+    score_before = models.FloatField(null=True, blank=True)
+    score_after = models.FloatField(null=True, blank=True)
+    trained_model = models.ForeignKey(Model, null=True, blank=True, on_delete=models.SET_NULL, related_name='+',
+                                      help_text="the created or updated model")
+
+    GRACE_SECONDS = 30
+    """Time beyond the budget to score and store the model trained within it, after which the training is stopped"""
+
+    class Meta:
+        ordering = ['-time_created']
+
+    def __str__(self) -> str:
+        return f"{self.model.name} ({self.status})"
+
+    def get_absolute_url(self) -> str:
+        """Returns the url to display the object."""
+        return reverse('trainingjob-detail', args=[str(self.id)])
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (TrainingJob.Status.SUCCEEDED, TrainingJob.Status.FAILED, TrainingJob.Status.CANCELLED)
+
+    def status_dict(self) -> dict:
+        """The status, progress and outcome, as json-compatible dictionary"""
+        return {
+            'id': self.id,
+            'model': self.model.get_absolute_url(),
+            'status': self.status,
+            'time_created': self.time_created,
+            'time_started': self.time_started,
+            'time_finished': self.time_finished,
+            'max_iterations': self.max_iterations,
+            'max_seconds': self.max_seconds,
+            'cancel_requested': self.cancel_requested,
+            'progress': self.progress,
+            'message': self.message,
+            'details': self.details,
+            'score_before': self.score_before,
+            'score_after': self.score_after,
+            'trained_model': self.trained_model.get_absolute_url() if self.trained_model is not None else None,
+        }
+
+    def claim(self, worker: str = "") -> bool:
+        """
+        Marks a queued job as running by the worker (process). Returns False if it is not queued (e.g. claimed by
+        another worker).
+        """
+        now = timezone.now()
+        claimed = TrainingJob.objects.filter(pk=self.pk, status=TrainingJob.Status.QUEUED).update(
+            status=TrainingJob.Status.RUNNING, time_started=now, worker=worker)
+        if claimed:
+            self.status, self.time_started, self.worker = TrainingJob.Status.RUNNING, now, worker
+        return claimed == 1
+
+    def cancel(self) -> bool:
+        """
+        Cancels a queued job right away, and asks a running one to stop (its worker ends it).
+        Returns False if the job is finished already.
+        """
+        if TrainingJob.objects.filter(pk=self.pk, status=TrainingJob.Status.QUEUED).update(
+                status=TrainingJob.Status.CANCELLED, message="Training cancelled", time_finished=timezone.now()):
+            return True
+        return TrainingJob.objects.filter(pk=self.pk, status=TrainingJob.Status.RUNNING).update(
+            cancel_requested=True) == 1
+
+    def is_cancel_requested(self) -> bool:
+        """Whether a cancellation was requested meanwhile (reads the database)"""
+        return TrainingJob.objects.filter(pk=self.pk, cancel_requested=True).exists()
+
+    def report(self, progress: str) -> None:
+        """Records the current step of the running job"""
+        self.progress = progress[:100]
+        TrainingJob.objects.filter(pk=self.pk).update(progress=self.progress)
+
+    def compute(self, report: Optional[Callable[[str], None]] = None) -> tuple[str, float, float]:
+        """
+        Scores the model, trains it within the remaining budget and returns the trained model data with the scores
+        before and after. Only reads from the database, such that it can run in a separate worker process.
+        """
+        started = time.monotonic()
+        report = report or self.report
+        measurements = list(self.measurements.all())
+        if not measurements:
+            raise ValueError("no measurements to train on")
+        model = self.model
+        model_type = model.get_type
+
+        report("Scoring the current model")
+        score_before = sum(model_type.score_many(model, measurements))/len(measurements)
+        report(f"Training on {len(measurements)} measurements")
+        trained_model_data, score_after = model_type.train(
+            model,
+            measurements,
+            max_iterations=self.max_iterations,
+            max_seconds=max(0, int(self.max_seconds - (time.monotonic() - started))))
+        return trained_model_data, score_before, float(score_after)
+
+    def run(self) -> None:
+        """
+        Trains the model in this thread and stores the outcome (for a claimed job). As the thread can not be stopped
+        like a worker process, the model is discarded if the job was cancelled or ran out of time meanwhile.
+        """
+        deadline = time.monotonic() + self.max_seconds + self.GRACE_SECONDS
+        try:
+            trained_model_data, score_before, score_after = self.compute()
+        except Exception as exc:  # pylint: disable=broad-except
+            self.finish(TrainingJob.Status.FAILED, "Training failed", str(exc))
+            return
+        if self.is_cancel_requested():
+            self.finish(TrainingJob.Status.CANCELLED, "Training cancelled", "The training was stopped on request")
+            return
+        if time.monotonic() > deadline:
+            self.finish(TrainingJob.Status.FAILED, "Time budget exceeded",
+                        f"The training took longer than {self.max_seconds} seconds")
+            return
+        self.store(trained_model_data, score_before, score_after)
+
+    def store(self, trained_model_data: str, score_before: float, score_after: float) -> None:
+        """Saves the trained model (as new model or update) and records the outcome"""
+        self.report("Saving the trained model")
+        self.score_before, self.score_after = score_before, score_after
+        with transaction.atomic():
+            if self.new_name:
+                if Model.objects.filter(name=self.new_name).exists():
+                    self.finish(TrainingJob.Status.FAILED, "Model already exists",
+                                "A model with this name was saved meanwhile")
+                    return
+                trained_model = Model(name=self.new_name,
+                                      data=trained_model_data,
+                                      user_created=self.user_created,
+                                      user_changed=self.user_created,
+                                      model_type=self.model.model_type)
+                operation_text = f"'{self.new_name}' was saved"
+            else:
+                trained_model = self.model
+                trained_model.data = trained_model_data
+                trained_model.user_changed = self.user_created
+                operation_text = f"'{trained_model.name}' was updated"
+            trained_model.save()
+
+        self.trained_model = trained_model
+        self.finish(TrainingJob.Status.SUCCEEDED, "Training finished",
+                    f"score before: {score_before}\nscore after: {score_after}\n{operation_text}")
+
+    def finish(self, status: 'TrainingJob.Status', message: str, details: str = "") -> None:
+        """Records the outcome of the job"""
+        self.status = status
+        self.message = message
+        self.details = details
+        self.progress = ""
+        self.time_finished = timezone.now()
+        self.save()
@@ -0,0 +1,31 @@
+"""Data base model: UploadChunk"""
+
+# region imports
+# standard
+from django.db import models
+
+# 3rd party
+
+# local
+
+# type hints
+
+# endregion
+
+
+class UploadChunk(models.Model):
+    """
+    Part of the file of an upload job, stored in the database such that any process can run the job (the local files
+    of a process are not visible to others, e.g. on other hosts). Removed once the job is processed.
+    """
+
+    SIZE = 2**20
+    """Bytes per chunk (but the last), which bounds the memory to store and read an upload"""
+
+    job = models.ForeignKey('IngestJob', on_delete=models.CASCADE, related_name='upload_chunks')
+    index = models.PositiveIntegerField(help_text="position of the chunk in the file")
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ['job', 'index']
+        constraints = [models.UniqueConstraint(fields=['job', 'index'], name='unique_upload_chunk')]
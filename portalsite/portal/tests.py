@@ -2,6 +2,579 @@
 Standard DJANGO tests file
 """
 
-# from django.test import TestCase
+import os
+import socket
+import subprocess
+from datetime import timedelta
+from io import BytesIO
+from json import loads
+from typing import Optional
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from sklearn.linear_model import LinearRegression
+
+from portal.core import LINEARREGRESSIONMODEL, NUMERICCSVHANDLER, NUMPYARRAYSHANDLER, PAYLOAD_ARRAYS, SIMCAMODEL
+from portal import jobs
+from portal.core import compression
+from portal.core.arraypacking import PackedMatrixBuilder, decode_array, encode_array, pack_array, unpack_array
+from portal.core.csvtools import NumericCsvValidator
+from portal.core.dataclasses import CsvContent
+from portal.core.model_type.simca.serializer import SimcaSerializer
+from portal.core.model_type.simca.simca import LimitType, Simca, SimcaParameters
+from portal.core.statistics import ColumnStatistics
+from portal.models import IngestJob, Measurement, Model, Payload, Source, TrainingJob, UploadChunk
+
+
+class SimcaIncrementalTrainingTest(TestCase):
+    """Retraining a SIMCA model on (a superset of) its measurements keeps its calibration data"""
+    fixtures = ['initial_seed_data.json']
+
+    def setUp(self) -> None:
+        # the arrays are cached per primary key, which the rolled back tests reuse
+        PAYLOAD_ARRAYS.clear()
+        fixture_model = Model.objects.get(name='Setosa trained simca')
+        self.measurements = list(Measurement.objects.compatible_with(fixture_model).order_by('pk'))
+        # moment limits, which used to be merged approximately
+        self.model = Model(name='incremental',
+                           model_type=fixture_model.model_type,
+                           data=SIMCAMODEL.default_data(4, SimcaParameters(0.05, 0.01, 2, LimitType.DDMOMENTS, False)),
+                           user_created=fixture_model.user_created,
+                           user_changed=fixture_model.user_created)
+        self.model.save()
+
+    def _train(self, measurements: list[Measurement]) -> None:
+        data, _ = SIMCAMODEL.train(self.model, measurements, max_iterations=None, max_seconds=10)
+        self.model.data = data
+        self.model.save()
+        self.model = Model.objects.get(pk=self.model.pk)
+
+    def _trained(self) -> Simca:
+        return SimcaSerializer().from_dict(loads(self.model.data), loads(self.model.calibration_data))
+
+    def test_retrain_keeps_calibration(self):
+        self._train(self.measurements)
+        calibration_data = self.model.calibration_data
+        self._train(self.measurements)
+        self.assertEqual(self.model.calibration_data, calibration_data)
+        self.assertTrue(self._trained().can_update)
+        # the calibration rows are read from the measurements
+        SIMCAMODEL.recalibrate(self.model, SIMCAMODEL.sweep(self.model, self.measurements).best())
+        SIMCAMODEL.cross_validate(self.model, 3, max_workers=1)
+
+    def test_update_approximates_generate(self):
+        self._train(self.measurements[:4])
+        self._train(self.measurements)
+        self.assertTrue(self._trained().can_update)
+
+        # batches drawn from the calibration distribution, in which the spread of the distances is kept
+        rows = np.concatenate([measurement.model_input() for measurement in self.measurements])
+        targets = np.concatenate([measurement.model_target() for measurement in self.measurements])
+        one_class_rows = np.random.default_rng(0).permutation(rows[targets == 1.0])
+        parameters = self._trained().parameters
+        updated = Simca.generate(one_class_rows[:150], parameters)
+        for start in range(150, one_class_rows.shape[0], 25):
+            updated = updated.update(one_class_rows[start:start + 25])
+        generated = Simca.generate(one_class_rows, parameters)
+
+        # the preprocessing, PCA and limit means are exact, the degrees of freedom approximated
+        self.assertTrue(np.allclose(updated.preprocessing_mean, generated.preprocessing_mean))
+        self.assertTrue(np.allclose(updated.pca.eigenvalues, generated.pca.eigenvalues))
+        for name in ('Q_params', 'T2_params'):
+            updated_parameters, generated_parameters = getattr(updated.limits, name), getattr(generated.limits, name)
+            self.assertTrue(np.allclose(updated_parameters.u0, generated_parameters.u0))
+            self.assertTrue(np.allclose(updated_parameters.Nu, generated_parameters.Nu, rtol=0.2))
+        self.assertLess(np.mean(np.abs(updated.predict_all_components(rows)
+                                       - generated.predict_all_components(rows))), 0.02)
+
+    def test_iterations_are_capped(self):
+        for trained_on in (2, 4):
+            data, _ = SIMCAMODEL.train(self.model, self.measurements, max_iterations=2, max_seconds=10)
+            self.model.data = data
+            self.model.save()
+            self.assertEqual(len(loads(self.model.calibration_data)['measurements']), trained_on)
+        self.assertEqual(self._trained().statistics.count,
+                         sum(int(np.sum(measurement.model_target() == 1.0)) for measurement in self.measurements[:4]))
+
+    def test_robust_limits_are_generated(self):
+        parameters = SimcaParameters(0.05, 0.01, 2, LimitType.DDROBUST, False)
+        self.model.data = SIMCAMODEL.default_data(4, parameters)
+        self.model.save()
+        self._train(self.measurements[:4])
+        self.assertFalse(self._trained().can_update)
+        self._train(self.measurements)
+
+        rows = np.concatenate([measurement.model_input() for measurement in self.measurements])
+        targets = np.concatenate([measurement.model_target() for measurement in self.measurements])
+        generated = Simca.generate(rows[targets == 1.0], parameters)
+        self.assertTrue(np.allclose(self._trained().predict_all_components(rows),
+                                    generated.predict_all_components(rows)))
+
+    def test_update_does_not_store_rows(self):
+        self._train(self.measurements[:2])
+        self._train(self.measurements)
+        calibration = loads(self.model.calibration_data)
+        self.assertEqual(calibration['data'], {'object_type': 'None'})
+        self.assertEqual(calibration['pca']['matrix'], {'object_type': 'None'})
+
+        # restored from the measurements, the calibration equals the generated one
+        _, validation = SIMCAMODEL.cross_validate(self.model, 3, max_workers=1)
+        self.assertEqual(validation.projection.n_samples, self._trained().statistics.count)
+
+
+class PredictionTest(TestCase):
+    """Models with the same preprocessing share the preprocessed input when predicting a measurement"""
+    fixtures = ['initial_seed_data.json']
+
+    def test_preprocessed_once_per_group(self):
+        PAYLOAD_ARRAYS.clear()
+        copy = Model.objects.get(name='Setosa trained simca')
+        copy.pk = None
+        copy.name = 'same preprocessing'
+        copy.save()
+        measurement = Measurement.objects.get(pk=1)
+        expected = {model.pk: model.predict(measurement) for model in Model.objects.all()}
+
+        for workers in (1, 4):
+            with self.settings(PORTAL_PREDICTION_WORKERS=workers), \
+                    mock.patch.object(Simca, 'preprocess', autospec=True, side_effect=Simca.preprocess) as preprocess:
+                predictions = Model.objects.all().predict(measurement)
+            self.assertEqual(preprocess.call_count, 1)
+            self.assertEqual(len(predictions), 3)
+            for prediction in predictions:
+                self.assertTrue(np.allclose(prediction.result, expected[prediction.model.pk].result))
+                self.assertAlmostEqual(prediction.score, expected[prediction.model.pk].score)
+
+
+class TrainingJobTest(TestCase):
+    """Training jobs (run in this thread) keep to their iteration and time budget, and can be cancelled"""
+    fixtures = ['initial_seed_data.json']
+
+    def setUp(self) -> None:
+        PAYLOAD_ARRAYS.clear()
+        fixture_model = Model.objects.get(name='Setosa trained simca')
+        self.measurements = list(Measurement.objects.compatible_with(fixture_model).order_by('pk'))
+        self.model = Model(name='regression',
+                           model_type=LINEARREGRESSIONMODEL.id_,
+                           data=LINEARREGRESSIONMODEL.default_data(4),
+                           user_created=fixture_model.user_created,
+                           user_changed=fixture_model.user_created)
+        self.model.save()
+
+    def _run(self, max_iterations: Optional[int] = None, max_seconds: int = 60, cancel: bool = False) -> TrainingJob:
+        job = TrainingJob(model=Model.objects.get(pk=self.model.pk),
+                          user_created=self.model.user_created,
+                          max_iterations=max_iterations,
+                          max_seconds=max_seconds)
+        job.save()
+        job.measurements.set(self.measurements)
+        self.assertTrue(job.claim("test"))
+        if cancel:
+            self.assertTrue(job.cancel())
+        job.run()
+        return TrainingJob.objects.get(pk=job.pk)
+
+    def _trained_on(self) -> int:
+        calibration_data = Model.objects.get(pk=self.model.pk).calibration_data
+        return len(loads(calibration_data)['measurements']) if calibration_data is not None else 0
+
+    def test_iterations_are_capped(self):
+        for trained_on in (2, 4, len(self.measurements)):
+            job = self._run(max_iterations=2)
+            self.assertEqual(job.status, TrainingJob.Status.SUCCEEDED)
+            self.assertEqual(self._trained_on(), trained_on)
+        # continuing in steps gives the model trained at once
+        stepwise = loads(Model.objects.get(pk=self.model.pk).data)
+        self.model.calibration_data = None
+        self.model.save()
+        self._run()
+        at_once = loads(Model.objects.get(pk=self.model.pk).data)
+        self.assertTrue(np.allclose(stepwise['coef_'], at_once['coef_']))
+
+    def test_time_budget_merges_first_measurement(self):
+        self.assertEqual(self._run(max_seconds=0).status, TrainingJob.Status.SUCCEEDED)
+        self.assertEqual(self._trained_on(), 1)
+
+    def test_overrun_is_not_stored(self):
+        with mock.patch.object(TrainingJob, 'GRACE_SECONDS', -1):
+            job = self._run(max_seconds=0)
+        self.assertEqual((job.status, job.message), (TrainingJob.Status.FAILED, "Time budget exceeded"))
+        self.assertEqual(Model.objects.get(pk=self.model.pk).data, self.model.data)
+
+    def test_cancelled_while_running(self):
+        job = self._run(cancel=True)
+        self.assertEqual(job.status, TrainingJob.Status.CANCELLED)
+        self.assertEqual(Model.objects.get(pk=self.model.pk).data, self.model.data)
+        self.assertFalse(job.cancel())
+
+    def test_cancelled_while_queued(self):
+        job = TrainingJob(model=self.model, user_created=self.model.user_created)
+        job.save()
+        self.assertTrue(job.cancel())
+        self.assertFalse(job.claim("test"))
+        self.assertEqual(TrainingJob.objects.get(pk=job.pk).status, TrainingJob.Status.CANCELLED)
+
+
+class IngestJobTest(TestCase):
+    """Upload jobs keep their file in the database until they are processed"""
+    fixtures = ['initial_seed_data.json']
+
+    def test_upload_is_stored_in_chunks(self):
+        fixture_model = Model.objects.get(name='Setosa trained simca')
+        job = IngestJob(name='chunked',
+                        data_handler='NumericCsv',
+                        source=Source.objects.first(),
+                        time_measured=fixture_model.time_created,
+                        file_name='chunked.csv',
+                        user_created=fixture_model.user_created)
+        job.save()
+        content = b"label,a,b\n" + b"".join(b"1,%d,%d\n" % (row, 2 * row) for row in range(100))
+        with mock.patch.object(UploadChunk, 'SIZE', 64):
+            job.store_upload(ContentFile(content))
+            self.assertEqual(UploadChunk.objects.filter(job=job).count(), -(-len(content) // 64))
+            # any process can claim the job, but only one
+            self.assertTrue(IngestJob.objects.get(pk=job.pk).claim("elsewhere:1"))
+            self.assertFalse(job.claim("here:1"))
+            job.run()
+
+        self.assertEqual(job.status, IngestJob.Status.SUCCEEDED, job.details)
+        self.assertTrue(np.array_equal(job.measurement.model_input(),
+                                       np.column_stack([np.arange(100), 2 * np.arange(100)])))
+        self.assertFalse(UploadChunk.objects.filter(job=job).exists())
+
+
+# the pages are rendered without collecting the static files
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class MatrixFileTest(TestCase):
+    """Matrix files are only kept for the payloads that were stored"""
+    fixtures = ['initial_seed_data.json']
+
+    def setUp(self) -> None:
+        self.csv = b"label,a,b\n" + b"".join(b"1,%d,%d\n" % (row, row % 7) for row in range(100))
+
+    def _payload(self, csv: bytes) -> Payload:
+        return Payload.build(NUMERICCSVHANDLER.id_, NUMERICCSVHANDLER.load_from_file(ContentFile(csv)))
+
+    @staticmethod
+    def _exists(matrix_file: str) -> bool:
+        return os.path.exists(os.path.join(settings.MEDIA_ROOT, 'matrices', matrix_file))
+
+    def test_store_discards_file_of_stored_content(self):
+        with self.settings(PORTAL_MATRIX_FILE_MIN_BYTES=1):
+            stored = Payload.objects.store([self._payload(self.csv)])
+            again = self._payload(self.csv)
+            self.assertEqual(Payload.objects.store([again]), stored)
+        matrix_file = next(iter(stored.values())).matrix_file
+        self.assertTrue(self._exists(matrix_file))
+        self.assertIsNone(again.matrix_file)
+        self.assertEqual(sum(name.startswith(again.digest) for name in os.listdir(os.path.dirname(
+            os.path.join(settings.MEDIA_ROOT, 'matrices', matrix_file)))), 1)
+
+    def test_rolled_back_bulk_upload_removes_files(self):
+        self.client.login(username='scientist_test_user', password='SC1ENCE!')
+        files = [SimpleUploadedFile(f'rolled back {index}.csv', self.csv + b"1,%d,0\n" % index) for index in range(2)]
+        payloads = [self._payload(file.read()) for file in files]
+        for file in files:
+            file.seek(0)
+        with self.settings(PORTAL_MATRIX_FILE_MIN_BYTES=1, PORTAL_INGEST_WORKERS=0), \
+                mock.patch.object(Measurement.objects, 'bulk_create', side_effect=RuntimeError("insert failed")):
+            response = self.client.post(reverse('measurements-bulk'),
+                                        {'measured': '2022-01-01 10:00',
+                                         'data_handler': NUMERICCSVHANDLER.id_,
+                                         'source': Source.objects.first().pk,
+                                         'notes': '',
+                                         'files': files})
+        self.assertContains(response, "insert failed")
+        self.assertFalse(Payload.objects.filter(digest__in=[payload.digest for payload in payloads]).exists())
+        matrices = os.path.join(settings.MEDIA_ROOT, 'matrices')
+        names = os.listdir(matrices) if os.path.isdir(matrices) else []
+        self.assertFalse(any(name.startswith(payload.digest) for name in names for payload in payloads))
+
+
+class PayloadTest(TestCase):
+    """Payloads are written once, when created, and removed with their last measurement"""
+    fixtures = ['initial_seed_data.json']
+
+    def setUp(self) -> None:
+        PAYLOAD_ARRAYS.clear()
+
+    def test_reads_do_not_write(self):
+        payload = Payload.objects.get(pk=1)
+        self.assertIsNotNone(payload.packed_data)
+        with self.assertNumQueries(0):
+            statistics = payload.column_statistics()
+            model_input = payload.model_input()
+        self.assertTrue(np.allclose(statistics.mean, model_input.mean(axis=0)))
+
+        # rows without statistics get them computed, but not stored
+        Payload.objects.filter(pk=1).update(packed_statistics=None)
+        payload = Payload.objects.get(pk=1)
+        with self.assertNumQueries(0):
+            self.assertTrue(np.allclose(payload.column_statistics().mean, statistics.mean))
+        self.assertIsNone(Payload.objects.get(pk=1).packed_statistics)
+
+    def test_payload_is_deleted_with_last_measurement(self):
+        measurement = Measurement.objects.get(pk=1)
+        payload_id = measurement.payload_id
+        copy = Measurement.objects.get(pk=1)
+        copy.pk = None
+        copy.name = 'same content'
+        copy.save()
+        self.assertEqual(copy.payload_id, payload_id)
+
+        measurement.delete()
+        self.assertTrue(Payload.objects.filter(pk=payload_id).exists())
+        copy.delete()
+        self.assertFalse(Payload.objects.filter(pk=payload_id).exists())
+
+
+class NumpyArraysTest(TestCase):
+    """Numpy arrays are read from the packed matrix, an unlabelled upload has an empty target"""
+
+    def setUp(self) -> None:
+        PAYLOAD_ARRAYS.clear()
+
+    def _stored(self, file: ContentFile) -> Payload:
+        payload = Payload.build(NUMPYARRAYSHANDLER.id_, *NUMPYARRAYSHANDLER.load_packed_from_file(file))
+        payload.save()
+        return Payload.objects.defer('data').get(pk=payload.pk)
+
+    def test_unlabelled_payload_has_empty_target(self):
+        payload = self._stored(_npy_file(np.eye(3)))
+        self.assertFalse(payload.is_labelled)
+        # the second call is served from the cache
+        for _ in range(2):
+            self.assertEqual(payload.model_target().shape, (0,))
+            self.assertTrue(np.array_equal(payload.model_input(), np.eye(3)))
+
+    def test_arrays_are_read_packed(self):
+        model_input = np.arange(12, dtype=np.int32).reshape(4, 3)
+        buffer = BytesIO()
+        np.savez(buffer, input=model_input, target=np.array([0, 1, 1, 0]))
+        payload = self._stored(ContentFile(buffer.getvalue(), name='data.npz'))
+        self.assertIsNotNone(payload.packed_data)
+        self.assertEqual((payload.n_rows, payload.n_features, payload.n_distinct_labels), (4, 3, 2))
+        # no json decoding, the data is not loaded
+        with self.assertNumQueries(0), mock.patch.object(NUMPYARRAYSHANDLER, 'to_model_input') as to_model_input:
+            self.assertTrue(np.array_equal(payload.model_input(), model_input))
+            self.assertTrue(np.array_equal(payload.model_target(), [0, 1, 1, 0]))
+        to_model_input.assert_not_called()
+        # downloads keep the uploaded types
+        with np.load(BytesIO(NUMPYARRAYSHANDLER.to_file(Payload.objects.get(pk=payload.pk).data).read())) as arrays:
+            self.assertEqual(arrays['input'].dtype, np.int32)
+            self.assertTrue(np.array_equal(arrays['target'], [0, 1, 1, 0]))
+
+
+class CompressionTest(TestCase):
+    """Texts round-trip through every codec and level it accepts, other levels are rejected"""
+
+    def test_round_trip(self):
+        text = "measurement data, " * 100 + "ünïcode"
+        for codec in compression.CODECS:
+            for level in [None, *compression.LEVELS[codec]]:
+                blob = compression.compress(text, codec, level)
+                self.assertEqual(compression.decompress(blob), text, (codec, level))
+                self.assertEqual(compression.sizes(blob).logical, len(text.encode('utf-8')))
+
+    def test_invalid_levels(self):
+        for codec, level in (('bz2', 0), ('zlib', 10), ('lzma', -1), ('none', 1), ('gzip', None)):
+            with self.assertRaises(ValueError, msg=(codec, level)):
+                compression.compress("text", codec, level)
+
+
+class CsvTest(TestCase):
+    """Csv files are read chunk by chunk into the json text and packed matrix, and validated in bulk"""
+
+    def test_round_trip_across_chunk_boundaries(self):
+        rows = [[str(row), f"{row * 0.25:g}", f"-{row}e-3"] for row in range(50)]
+        text = "länge,brütto,µ\r\n" + "".join(",".join(row) + "\r\n" for row in rows)
+        expected = np.array(rows, dtype=float)
+        for chunk_size in (1, 2, 5, 64, 2**16):
+            with mock.patch.object(ContentFile, 'DEFAULT_CHUNK_SIZE', chunk_size):
+                data, packed_data = NUMERICCSVHANDLER.load_packed_from_file(ContentFile(text.encode()))
+            self.assertEqual(CsvContent.from_json(data).headers, ["länge", "brütto", "µ"], chunk_size)
+            self.assertEqual(CsvContent.from_json(data).rows, rows, chunk_size)
+            self.assertTrue(np.array_equal(unpack_array(packed_data), expected), chunk_size)
+            self.assertEqual(b"".join(NUMERICCSVHANDLER.iter_file(data, rows_per_piece=7)).decode(),
+                             text.replace("\r\n", "\n"))
+
+    def test_validator_counts_and_locations(self):
+        rows = [["1", "2", "3"], ["1", "x", "3"], ["1", "2"], ["y", "2", "z"], ["1", "2", "3", "4"]]
+        rows += [["1", "", "3"]] * 5
+        results = {result.name: result
+                   for result in NumericCsvValidator.validate(CsvContent(["a", "2.5", "c"], rows), max_locations=3)}
+        self.assertEqual(results["Numeric value in header"].count, 1)
+        self.assertEqual(results["Nr of entries is incosistent"].count, 2)
+        self.assertEqual(results["Nr of entries is incosistent"].locations, [(2,), (4,)])
+        self.assertEqual(results["Not a float"].count, 8)
+        self.assertEqual(results["Not a float"].locations, [(1, 1), (3, 0), (3, 2)])
+        self.assertFalse(any(result.success for result in results.values()))
+        self.assertEqual(NumericCsvValidator.validate(CsvContent(["a", "b"], [["1", "2"], ["3", "4e2"]])), [])
+
+
+class PackingTest(TestCase):
+    """Arrays round-trip through packing and the base64 encoding, keeping dtype and shape"""
+
+    def test_round_trip(self):
+        rng = np.random.default_rng(0)
+        arrays = [rng.normal(size=(7, 3)), rng.normal(size=5).astype(np.float32), np.arange(24).reshape(2, 3, 4),
+                  np.array([True, False]), np.empty((0, 4)), np.array(3.5), np.arange(6, dtype='>i2')]
+        for array in arrays:
+            for unpacked in (unpack_array(pack_array(array)), decode_array(encode_array(array))):
+                self.assertEqual((unpacked.dtype, unpacked.shape), (array.dtype, array.shape))
+                self.assertTrue(np.array_equal(unpacked, array))
+                self.assertFalse(unpacked.flags.writeable)
+        with self.assertRaises(ValueError):
+            unpack_array(b"not packed" + bytes(16))
+
+    def test_builder_packs_like_array(self):
+        rows = [[str(row), str(row / 3)] for row in range(10)]
+        builder = PackedMatrixBuilder(2, block_size=3)
+        for row in rows:
+            builder.append(row)
+        self.assertEqual(builder.n_rows, 10)
+        self.assertEqual(builder.to_binary(), pack_array(np.array(rows, dtype=float)))
+
+
+class DeduplicationTest(TestCase):
+    """Identical uploads share one payload, files seen before are not parsed again"""
+    fixtures = ['initial_seed_data.json']
+
+    def test_identical_uploads_share_payload(self):
+        csv = b"label,a\n1,2\n0,3\n"
+        payload, _ = Payload.from_file(NUMERICCSVHANDLER.id_, ContentFile(csv))
+        payload.save()
+        with mock.patch.object(NUMERICCSVHANDLER, 'load_packed_from_file') as load:
+            same_file, validation_results = Payload.from_file(NUMERICCSVHANDLER.id_, ContentFile(csv))
+        load.assert_not_called()
+        self.assertEqual((same_file.pk, validation_results), (payload.pk, []))
+        # the same numbers, formatted differently
+        same_content, _ = Payload.from_file(NUMERICCSVHANDLER.id_, ContentFile(b"label,a\n1.0,2\n0,3.00\n"))
+        self.assertEqual(same_content.pk, payload.pk)
+        other, _ = Payload.from_file(NUMERICCSVHANDLER.id_, ContentFile(b"label,a\n1,2\n0,4\n"))
+        self.assertIsNone(other.pk)
+
+
+class ColumnStatisticsTest(TestCase):
+    """Statistics combined from parts equal those of the stacked matrix"""
+
+    def test_combine_equals_stacked(self):
+        rng = np.random.default_rng(1)
+        parts = [rng.normal(loc=1e6, size=(rows, 4)) for rows in (1, 30, 0, 7)]
+        stacked = ColumnStatistics.from_matrix(np.concatenate(parts))
+        combined = ColumnStatistics.combine_all(ColumnStatistics.from_matrix(part) for part in parts)
+        self.assertEqual(combined.count, stacked.count)
+        for name in ('mean', 'sum_centered_squares', 'minimum', 'maximum', 'comoments'):
+            self.assertTrue(np.allclose(getattr(combined, name), getattr(stacked, name), rtol=1e-9), name)
+        # comoments are kept only if both parts have them
+        self.assertIsNone(stacked.combine(ColumnStatistics.from_matrix(parts[1], with_comoments=False)).comoments)
+        restored = ColumnStatistics.from_binary(stacked.to_binary())
+        self.assertTrue(np.array_equal(restored.comoments, stacked.comoments))
+
+
+class ModelTypeTest(TestCase):
+    """Model types train like their reference implementation and score many measurements like one by one"""
+    fixtures = ['initial_seed_data.json']
+
+    def setUp(self) -> None:
+        PAYLOAD_ARRAYS.clear()
+        self.measurements = list(Measurement.objects.filter(is_labelled=True, n_features=4).order_by('pk'))
+
+    def test_linear_regression_equals_sklearn(self):
+        model = Model.objects.get(name='Setosa trained linear regression')
+        model.calibration_data = None
+        data, score = LINEARREGRESSIONMODEL.train(model, self.measurements, max_iterations=None, max_seconds=10)
+        matrix = np.concatenate([measurement.model_input() for measurement in self.measurements])
+        target = np.concatenate([measurement.model_target() for measurement in self.measurements])
+        reference = LinearRegression().fit(matrix, target)
+        self.assertTrue(np.allclose(loads(data)['coef_'], reference.coef_, rtol=1e-6, atol=1e-9))
+        self.assertAlmostEqual(loads(data)['intercept_'], reference.intercept_)
+        self.assertAlmostEqual(score, reference.score(matrix, target))
+
+    def test_score_many_equals_score(self):
+        for name in ('Setosa trained simca', 'Setosa trained linear regression'):
+            model = Model.objects.get(name=name)
+            self.assertTrue(np.allclose(model.get_type.score_many(model, self.measurements),
+                                        [model.get_type.score(model, measurement)
+                                         for measurement in self.measurements]), name)
+            for many, one in zip(model.get_type.predict_many(model, self.measurements),
+                                 [model.get_type.predict(model, measurement) for measurement in self.measurements]):
+                self.assertTrue(np.allclose(many, one), name)
+
+
+class JobStatusTest(TestCase):
+    """Jobs move from queued to running (claimed once) to finished, jobs of stopped processes fail"""
+    fixtures = ['initial_seed_data.json']
+
+    def setUp(self) -> None:
+        self.fixture_model = Model.objects.get(name='Setosa trained simca')
+
+    def _ingest_job(self, name: str, content: bytes) -> IngestJob:
+        job = IngestJob(name=name,
+                        data_handler=NUMERICCSVHANDLER.id_,
+                        source=Source.objects.first(),
+                        time_measured=self.fixture_model.time_created,
+                        file_name=f'{name}.csv',
+                        user_created=self.fixture_model.user_created)
+        job.save()
+        job.store_upload(ContentFile(content))
+        return job
+
+    def test_ingest_transitions(self):
+        job = self._ingest_job('transitions', b"label,a\n1,2\n")
+        self.assertEqual(job.status, IngestJob.Status.QUEUED)
+        self.assertTrue(job.claim("test:1"))
+        self.assertEqual(IngestJob.objects.get(pk=job.pk).status, IngestJob.Status.RUNNING)
+        self.assertFalse(IngestJob.objects.get(pk=job.pk).claim("test:2"))
+        job.run()
+        job = IngestJob.objects.get(pk=job.pk)
+        self.assertEqual((job.status, job.worker), (IngestJob.Status.SUCCEEDED, "test:1"))
+        self.assertTrue(job.is_finished)
+
+        invalid = self._ingest_job('invalid', b"label,a\n1,x\n")
+        self.assertTrue(invalid.claim())
+        invalid.run()
+        invalid = IngestJob.objects.get(pk=invalid.pk)
+        self.assertEqual((invalid.status, invalid.message), (IngestJob.Status.FAILED, "Validation failed"))
+        self.assertEqual(invalid.validation_results[0]['locations'], [[0, 1]])
+        self.assertFalse(UploadChunk.objects.filter(job__in=[job, invalid]).exists())
+        self.assertFalse(Measurement.objects.filter(name='invalid').exists())
+
+    def test_stale_workers_fail(self):
+        # a process of this host that is gone
+        with subprocess.Popen(['true']) as gone:
+            gone.wait()
+        host = socket.gethostname()
+        # pylint: disable=protected-access
+        overdue = timezone.now() - timedelta(seconds=jobs._STALE_INGEST_SECONDS + 1)
+        cases = {'gone': (f"{host}:{gone.pid}", timezone.now(), IngestJob.Status.FAILED),
+                 'alive': (f"{host}:{os.getpid()}", timezone.now(), IngestJob.Status.RUNNING),
+                 'other host': ("elsewhere:1", timezone.now(), IngestJob.Status.RUNNING),
+                 'other host, overdue': ("elsewhere:1", overdue, IngestJob.Status.FAILED)}
+        for name, (worker, time_started, _) in cases.items():
+            job = self._ingest_job(name, b"label,a\n1,2\n")
+            IngestJob.objects.filter(pk=job.pk).update(status=IngestJob.Status.RUNNING, worker=worker,
+                                                       time_started=time_started)
+        training = TrainingJob(model=self.fixture_model, user_created=self.fixture_model.user_created, max_seconds=1)
+        training.save()
+        training.claim(f"{host}:{gone.pid}")
+
+        with self.assertLogs(jobs.__name__, 'WARNING') as logs:
+            jobs._fail_stale_jobs()
+        self.assertEqual(len(logs.records), 3)
+        for name, (_, _, status) in cases.items():
+            self.assertEqual(IngestJob.objects.get(name=name).status, status, name)
+        training = TrainingJob.objects.get(pk=training.pk)
+        self.assertEqual((training.status, training.message), (TrainingJob.Status.FAILED, "Interrupted"))
+
+
+def _npy_file(array: np.ndarray) -> ContentFile:
+    buffer = BytesIO()
+    np.save(buffer, array)
+    return ContentFile(buffer.getvalue(), name='data.npy')
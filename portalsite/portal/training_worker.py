@@ -0,0 +1,36 @@
+"""
+Entry point of the worker processes that train models (see `portal.jobs`).
+
+Workers are started with 'spawn', i.e. as fresh interpreters: this module must be importable before django is set up,
+hence the database models are imported only once it is.
+"""
+# region imports
+# standard
+from multiprocessing.connection import Connection
+
+# 3rd party
+import django
+
+# local
+
+# type hints
+
+# endregion
+
+
+def train(job_id: int, sender: Connection) -> None:
+    """
+    Trains the model of the job, sending ('progress', text) messages while running and finally
+    ('result', model data, score before, score after) or ('error', text). The job itself is not written.
+    """
+    django.setup()
+    # pylint: disable=import-outside-toplevel
+    from portal.models import TrainingJob
+
+    try:
+        job = TrainingJob.objects.get(pk=job_id)
+        sender.send(('result', *job.compute(lambda progress: sender.send(('progress', progress)))))
+    except Exception as exc:  # pylint: disable=broad-except
+        sender.send(('error', str(exc)))
+    finally:
+        sender.close()
@@ -12,9 +12,15 @@ urlpatterns = [
     path('models', login_required(views.ModelsView.as_view()), name='models'),
     path('models/<int:pk>', login_required(views.ModelDetailView.as_view()), name='model-detail'),
     path('measurements', login_required(views.MeasurementsView.as_view()), name='measurements'),
+    path('measurements/bulk', login_required(views.MeasurementsBulkView.as_view()), name='measurements-bulk'),
+    path('ingestjob/<int:pk>', login_required(views.IngestJobDetailView.as_view()), name='ingestjob-detail'),
+    path('ingestjob/<int:pk>/status', login_required(views.ingestjobstatus), name='ingestjob-status'),
+    path('trainingjob/<int:pk>', login_required(views.TrainingJobDetailView.as_view()), name='trainingjob-detail'),
+    path('trainingjob/<int:pk>/status', login_required(views.trainingjobstatus), name='trainingjob-status'),
     path('measurement/<int:pk>', login_required(views.MeasurementDetailView.as_view()), name='measurement-detail'),
     path('result', login_required(views.MeasurementDetailView.as_view()), name='result'),
     path('topic/<topic>', login_required(views.TopicView.as_view()), name='topic'),
     path('predict/<int:pk>', login_required(views.PredictView.as_view()), name='predict'),
-    path('measurementdownload/<int:pk>', login_required(views.measurementdownload), name='measurementdownload')
+    path('measurementdownload/<int:pk>', login_required(views.measurementdownload), name='measurementdownload'),
+    path('measurementpreview/<int:pk>', login_required(views.measurementpreview), name='measurementpreview')
 ]
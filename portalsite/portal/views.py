@@ -7,38 +7,53 @@ possibly with some inheritance pattern for common repeated code)
 
 # region imports
 # standard
-from typing import TYPE_CHECKING
+import logging
+import re
+from typing import TYPE_CHECKING, Iterator
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 
 # 3rd party
+from django.conf import settings
 from django.core.paginator import Paginator
-from django.http import HttpResponseBadRequest
+from django.db import transaction
+from django.http import HttpResponseBadRequest, JsonResponse, QueryDict
 from django.http.request import HttpRequest
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from django.views.generic import TemplateView, DetailView
 
 # local
 from portal.forms import (MeasurementUploadForm,
+                          MeasurementBulkUploadForm,
                           FilterForm,
                           ModelTrainForm,
                           NewLinearRegssionModelForm, NewSimcaModelForm,
                           NewTestModelForm,
                           CopyModelForm,
+                          CrossValidationForm,
+                          SweepForm,
                           PredictionUploadForm)
 
-from portal.models import Measurement, Model, Source, Prediction, Group
+from portal.jobs import resume_if_queued, run_ingest_job, run_training_job, submit_ingest_job, submit_training_job
+from portal.models import IngestJob, Measurement, Model, Payload, Source, Prediction, Group, TrainingJob
 from portal.core import DATAHANDLERS, SIMCAMODEL, TESTMODELTYPE, LINEARREGRESSIONMODEL
 from portal.core.data_handler import DataHandler
-from portal.core.model_type.simca.simca import SimcaParameters, LimitType
+from portal.core.ingest import batched, iter_upload_files, parse_files, upload_names
+from portal.core.model_type.simca.simca import SimcaParameters, LimitType, Precision
 
 
 # type hints
 if TYPE_CHECKING:
     from django.db.models.query import QuerySet
+    from portal.core.ingest import IngestResult
 # endregion
 
+_LOGGER = logging.getLogger(__name__)
+
 
 def index(request: HttpRequest) -> HttpResponse:
     return render(request, 'index.html', context={})
@@ -48,20 +63,73 @@ def info(request: HttpRequest) -> HttpResponse:
     return render(request, 'info.html', context={})
 
 
+_ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
 def measurementdownload(request: HttpRequest, pk: int) -> HttpResponse:
-    measurement: Measurement = Measurement.objects.get(pk=pk)
-    # measurement.data_handler
+    # the packed data is not needed to write the file
+    measurement: Measurement = (Measurement.objects.select_related('payload')
+                                .defer('payload__packed_data', 'payload__packed_statistics')
+                                .get(pk=pk))
     handler: DataHandler = measurement.handler
 
-    file = handler.to_file(measurement.data)
-
-    response = HttpResponse(file, content_type='application/csv')
-    response['Content-Length'] = file.tell()
-    response['Content-Disposition'] = f'attachment; filename={measurement.name}.csv'
+    content: Iterator[bytes] = handler.iter_file(measurement.data)
+    if _ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        response = StreamingHttpResponse(compress_sequence(content), content_type=handler.content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(content, content_type=handler.content_type)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['Content-Disposition'] = f'attachment; filename={measurement.name}{handler.file_extension}'
 
     return response
 
 
+_PREVIEW_ROWS = 20
+_PREVIEW_COLUMNS = 10
+_PREVIEW_MAX_ROWS = 500
+_PREVIEW_MAX_COLUMNS = 100
+
+
+def _query_int(query: QueryDict, key: str, default: int, maximum: int = None) -> int:
+    """Reads a non-negative integer from the query, capped at the maximum"""
+    value = query.get(key)
+    if value is None or value == '':
+        return default
+    if not value.isdigit():
+        raise ValueError(f"'{key}' must be a non-negative integer")
+    return min(int(value), maximum) if maximum is not None else int(value)
+
+
+def measurementpreview(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Returns a window of the measurement data as json, paging through the rows with the query parameters
+    'row' and 'rows' (and through the model input columns with 'column' and 'columns')
+    """
+    try:
+        row_start = _query_int(request.GET, 'row', 0)
+        row_count = _query_int(request.GET, 'rows', _PREVIEW_ROWS, _PREVIEW_MAX_ROWS)
+        column_start = _query_int(request.GET, 'column', 0)
+        column_count = _query_int(request.GET, 'columns', _PREVIEW_COLUMNS, _PREVIEW_MAX_COLUMNS)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    measurement: Measurement = (Measurement.objects.select_related('payload')
+                                .defer('payload__packed_data', 'payload__packed_statistics')
+                                .get(pk=pk))
+    preview = measurement.preview(row_start, row_count, column_start, column_count)
+
+    def page_url(row: int) -> str:
+        query = request.GET.copy()
+        query['row'] = str(row)
+        return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+    content = asdict(preview)
+    content['next'] = page_url(row_start + row_count) if preview.has_more_rows else None
+    content['previous'] = page_url(max(0, row_start - row_count)) if row_start > 0 else None
+    return JsonResponse(content)
+
+
 def _get_measurements_page(group_ids: list,
                            request: HttpRequest,
                            compatible_model: Model = None):
@@ -74,11 +142,7 @@ def _get_measurements_page(group_ids: list,
             objects = objects | Measurement.objects.filter(groups__id=group_id)
 
     if compatible_model is not None:
-        compatible_objects = []
-        for measurement in objects.distinct():
-            if compatible_model.is_compatible(measurement):
-                compatible_objects.append(measurement)
-        return Paginator(compatible_objects, 10).get_page(request.GET.get('page'))
+        objects = objects.compatible_with(compatible_model)
 
     return Paginator(objects.distinct(), 10).get_page(request.GET.get('page'))
 
@@ -152,43 +216,236 @@ class MeasurementsView(TemplateView):
             return Result(False, "No file selected",
                           "Please go back and select a file to upload").render_view()
 
-        data_handler = form_data['data_handler']
-        try:
-            data = DATAHANDLERS.get(data_handler).load_from_file(request.FILES['file'])
-        except UnicodeDecodeError as decode_error:
-            return Result(False, "Unicode decoding error", details_formatted=str(decode_error)).render_view()
-        # except Exception as exc:
-        #     return Result(False, "Unhandled - failed to read", details_formatted=str(exc)).render_view()
-        source = Source.objects.filter(id__exact=form_data['source']).first()
+        job = IngestJob()
+        job.name = form_data['name']
+        job.data_handler = form_data['data_handler']
+        job.source = Source.objects.filter(id__exact=form_data['source']).first()
+        job.time_measured = form_data['measured']
+        job.notes = form_data['notes']
+        job.user_created = request.user
+        job.file_name = request.FILES['file'].name
+        # other processes may run the job once it is committed, i.e. with all of its file
+        with transaction.atomic():
+            job.save()
+            job.groups.set([int(group_id_string) for group_id_string in form_data.get('groups', [])])
+            job.store_upload(request.FILES['file'])
+
+        if settings.PORTAL_INGEST_IN_BACKGROUND:
+            submit_ingest_job(job)
+            return Result(True, "Upload accepted",
+                          "The file is parsed, validated and saved in the background.",
+                          link_address=job.get_absolute_url(),
+                          link_text="See upload status").render_view()
+
+        run_ingest_job(job)
+        if job.status != IngestJob.Status.SUCCEEDED:
+            return Result(False, job.message, details_formatted=job.details).render_view()
+        return Result(True, job.message,
+                      link_address=job.measurement.get_absolute_url(),
+                      link_text="See uploaded data").render_view()
 
-        measurement = Measurement()
-        measurement.data = data
-        measurement.data_handler = data_handler
-        measurement.source = source
-        measurement.name = form_data['name']
-        measurement.time_measured = form_data['measured']
-        measurement.user_created = request.user
-        measurement.user_changed = request.user
-        measurement.notes = form_data['notes']
 
-        validation_results = measurement.validate()
-        if sum([0 if result.success else 1 for result in validation_results]) > 0:
-            return Result(False, "Validation failed", details_formatted="\n".join(
-                [f"{result.name}: {result.details}" for result in validation_results])).render_view()
+class IngestJobDetailView(DetailView):
+    """Status and outcome of an upload, polled by its page until it is done"""
+
+    model = IngestJob
+    template_name = 'ingestjob-detail.html'
+
+    def get_queryset(self):
+        # jobs hold unpublished data, only their owner (and staff) may see them
+        jobs = IngestJob.objects.all()
+        if self.request.user.is_staff:
+            return jobs
+        return jobs.filter(user_created=self.request.user)
+
+    def get_object(self, queryset=None) -> IngestJob:
+        job = super().get_object(queryset)
+        resume_if_queued(job)
+        return job
+
+
+def ingestjobstatus(request: HttpRequest, pk: int) -> HttpResponse:
+    """Returns the status and outcome of an upload job as json"""
+    jobs = IngestJob.objects.all() if request.user.is_staff else IngestJob.objects.filter(user_created=request.user)
+    job = jobs.filter(pk=pk).first()
+    if job is None:
+        return JsonResponse({'error': 'no such job'}, status=404)
+    resume_if_queued(job)
+    return JsonResponse(job.status_dict())
+
+
+class TrainingJobDetailView(DetailView):
+    """Progress and outcome of a training, which can be cancelled while it runs"""
+
+    model = TrainingJob
+    template_name = 'trainingjob-detail.html'
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return TrainingJob.objects.all()
+        return TrainingJob.objects.filter(user_created=self.request.user)
+
+    def get_object(self, queryset=None) -> TrainingJob:
+        job = super().get_object(queryset)
+        resume_if_queued(job)
+        return job
+
+    def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if 'cancel_submit' not in request.POST:
+            return HttpResponseBadRequest()
+        job: TrainingJob = self.get_object()
+        if not job.cancel():
+            return Result(False, "Training already finished",
+                          link_address=job.get_absolute_url(),
+                          link_text="See training status").render_view()
+        return Result(True, "Cancellation requested",
+                      link_address=job.get_absolute_url(),
+                      link_text="See training status").render_view()
+
+
+def trainingjobstatus(request: HttpRequest, pk: int) -> HttpResponse:
+    """Returns the status, progress and outcome of a training job as json"""
+    jobs = TrainingJob.objects.all()
+    if not request.user.is_staff:
+        jobs = jobs.filter(user_created=request.user)
+    job = jobs.filter(pk=pk).first()
+    if job is None:
+        return JsonResponse({'error': 'no such job'}, status=404)
+    resume_if_queued(job)
+    return JsonResponse(job.status_dict())
+
+
+class MeasurementsBulkView(TemplateView):
+    """Upload of several measurements at once, saved in batches"""
+
+    template_name = 'measurements-bulk.html'
+
+    def __init__(self, **kwargs: any) -> None:
+        super().__init__(**kwargs)
+        self.source_choices = list((d.id, d.name) for d in Source.objects.all())
+        self.groups_chocies = list((l.id, l.name) for l in Group.objects.all())
+
+    def get_context_data(self, **kwargs):
+        form = MeasurementBulkUploadForm(DATAHANDLERS.choices, self.source_choices, self.groups_chocies, initial={
+            'measured': datetime.now(),
+            'data_handler': DATAHANDLERS.choices[0],
+            'source': self.source_choices[0] if len(self.source_choices) > 0 else None,
+            'groups': self.groups_chocies[0] if len(self.groups_chocies) > 0 else None,
+        })
+        return {'upload_form': form}
 
+    def post(self, request, *args, **kwargs):
+        form = MeasurementBulkUploadForm(DATAHANDLERS.choices, self.source_choices, self.groups_chocies, request.POST)
+        if not form.is_valid():
+            return Result(False, "Data was not valid").render_view()
+
+        form_data = form.cleaned_data
+        files = request.FILES.getlist('files')
+        names = upload_names(files)
+        if len(names) == 0:
+            return Result(False, "No file selected",
+                          "Please go back and select the files to upload").render_view()
+
+        report = Measurement.objects.check_new_names(names)
         try:
-            Measurement.save(measurement)
-            if 'groups' in form_data:
-                for group_id_string in form_data['groups']:
-                    measurement.groups.add(int(group_id_string))
-        # pylint: disable=broad-except, fixme
-        except Exception as exc:
-            # TODO: Replace this error by a generic one and write stacktrace to log
-            return Result(False, "Internal problem", str(exc)).render_view()
+            n_saved = self._save_files(form_data, files, report)
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.exception("bulk upload failed")
+            return Result(False, "Internal problem",
+                          details_formatted="\n".join([str(exc)]
+                                                       + [f"{name}: {report.get(name, 'not saved')}"
+                                                          for name in names])).render_view()
+
+        return Result(n_saved > 0,
+                      f"{n_saved} of {len(names)} files uploaded and saved",
+                      details_formatted="\n".join(f"{name}: {report[name]}" for name in names),
+                      link_address=reverse('measurements'),
+                      link_text="See measurements").render_view()
+
+    def _save_files(self, form_data: dict, files: list, report: dict[str, str]) -> int:
+        """
+        Parses the files and saves their measurements, recording the outcome per name in the report. Returns the
+        number of measurements saved.
+        """
+        data_handler = form_data['data_handler']
+        # files that were uploaded before are not parsed again
+        known_payloads: dict[str, Payload] = {}
 
-        return Result(True, "Data uploaded and saved",
-                      link_address=measurement.get_absolute_url(),
-                      link_text="See uploaded data").render_view()
+        def find_known(digests: list[str]) -> set[str]:
+            known_payloads.update((payload.file_digest, payload) for payload in Payload.objects.filter(
+                data_handler=data_handler, file_digest__in=digests).defer('data', 'packed_data', 'packed_statistics'))
+            return known_payloads.keys() & set(digests)
+
+        source = Source.objects.filter(id__exact=form_data['source']).first()
+        n_saved = 0
+        # the files are parsed while saving, such that only a batch of them is held at once - each batch is
+        # saved in its own transaction, which is not held open while the next one is parsed
+        results = parse_files(data_handler, iter_upload_files(files), settings.PORTAL_INGEST_WORKERS, find_known)
+        for batch in batched(results, 100):
+            for result in batch:
+                if not result.success:
+                    report[result.name] = f"validation failed - {result.details}"
+            measurements = self._save_batch(form_data, source,
+                                            [result for result in batch if result.name not in report],
+                                            known_payloads)
+            for measurement in measurements:
+                report[measurement.name] = "saved"
+            n_saved += len(measurements)
+        return n_saved
+
+    def _save_batch(self,
+                    form_data: dict,
+                    source: Source,
+                    results: list['IngestResult'],
+                    known_payloads: dict[str, Payload]) -> list[Measurement]:
+        """
+        Saves the measurements of the parsed files in one transaction and returns them. The payloads of files that
+        were uploaded before (by file digest) are reused, the files written for new payloads are removed again if the
+        transaction is rolled back.
+        """
+        payloads = [known_payloads.get(result.file_digest)
+                    or Payload.build(form_data['data_handler'], result.data, result.packed_data, result.file_digest,
+                                     result.digest)
+                    for result in results]
+        built = [payload for payload in payloads if payload.pk is None]
+        try:
+            with transaction.atomic():
+                stored = Payload.objects.store(payloads)
+                return self._create_measurements(form_data, source, results,
+                                                 [stored[payload.digest] for payload in payloads])
+        except Exception:
+            for payload in built:
+                payload.discard_matrix_file()
+            raise
+
+    def _create_measurements(self,
+                             form_data: dict,
+                             source: Source,
+                             results: list['IngestResult'],
+                             payloads: list[Payload]) -> list[Measurement]:
+        """Creates the measurements of the parsed files with their stored payloads (and their groups)"""
+        measurements = []
+        for result, payload in zip(results, payloads):
+            measurement = Measurement()
+            measurement.data_handler = form_data['data_handler']
+            measurement.set_payload(payload)
+            measurement.source = source
+            measurement.name = result.name
+            measurement.time_measured = form_data['measured']
+            measurement.user_created = self.request.user
+            measurement.user_changed = self.request.user
+            measurement.notes = form_data['notes']
+            measurements.append(measurement)
+        Measurement.objects.bulk_create(measurements, batch_size=100)
+
+        # not all databases return the primary keys from bulk inserts
+        ids = dict(Measurement.objects.filter(name__in=[m.name for m in measurements]).values_list('name', 'id'))
+        Measurement.groups.through.objects.bulk_create(
+            [Measurement.groups.through(measurement_id=ids[measurement.name], group_id=int(group_id_string))
+             for measurement in measurements
+             for group_id_string in form_data.get('groups', [])],
+            batch_size=500)
+        return measurements
 
 
 class PredictView(TemplateView):
@@ -240,9 +497,11 @@ class PredictView(TemplateView):
 
         data_handler = form_data['data_handler']
         try:
-            data = DATAHANDLERS.get(data_handler).load_from_file(request.FILES['file'])
+            payload, validation_results = Payload.from_file(data_handler, request.FILES['file'])
         except UnicodeDecodeError as decode_error:
             return Result(False, "Unicode decoding error", details_formatted=str(decode_error)).render_view()
+        except ValueError as read_error:
+            return Result(False, "Failed to read file", details_formatted=str(read_error)).render_view()
         # except Exception as exc:
         #     return Result(False, "Unhandled - failed to read", details_formatted=str(exc)).render_view()
 
@@ -251,15 +510,14 @@ class PredictView(TemplateView):
         timestamp = timenow.strftime("%Y-/%m-/%d_%H:%M:%S.%f")
 
         measurement = Measurement()
-        measurement.data = data
         measurement.data_handler = data_handler
+        measurement.set_payload(payload)
         measurement.source = Source.objects.first()
         measurement.name = f"temp_{timestamp}"
         measurement.time_measured = timenow
         measurement.user_created = request.user
         measurement.user_changed = request.user
         measurement.notes = f"temporary data upload for prediction with model '{model.name}' (id'{model.id}')"
-        validation_results = measurement.validate()
         if sum([0 if result.success else 1 for result in validation_results]) > 0:
             return Result(False, "Validation failed", details_formatted="\n".join(
                 [f"{result.name}: {result.details}" for result in validation_results])).render_view()
@@ -292,11 +550,7 @@ class MeasurementDetailView(DetailView):
 
     def _get_predict_choices(self) -> list[tuple[str, str]]:
         measurement: Measurement = self.get_object()
-        choices = []
-        for model in Model.objects.all():
-            if model.is_compatible(measurement):
-                choices.append((model.id, model.name))
-        return choices
+        return list(Model.objects.compatible_with(measurement).values_list('id', 'name'))
 
     def get_context_data(self, **kwargs):
         context = DetailView.get_context_data(self, **kwargs)
@@ -324,9 +578,47 @@ class MeasurementDetailView(DetailView):
             include_all=True)
         context['predictions_page'] = Paginator(filtered_predictions, 10).get_page(self.request.GET.get('page'))
         context['predict_filter'] = FilterForm('predict_filter', 'model', self._get_predict_choices())
+        if self.request.user.is_staff:
+            context.update(self._get_preview_context())
         return context
 
+    def _get_preview_context(self) -> dict:
+        """The data window shown on the page, paged with the query parameters 'preview_row' and 'preview_column'"""
+        try:
+            row_start = _query_int(self.request.GET, 'preview_row', 0)
+            column_start = _query_int(self.request.GET, 'preview_column', 0)
+        except ValueError:
+            row_start, column_start = 0, 0
+        preview = self.object.preview(row_start, _PREVIEW_ROWS, column_start, _PREVIEW_COLUMNS)
+        targets = preview.targets if preview.targets is not None else [None] * len(preview.rows)
+        summary_rows = [
+            ("Min (shown rows)", [summary.minimum for summary in preview.summaries]),
+            ("Max (shown rows)", [summary.maximum for summary in preview.summaries]),
+            ("Mean (shown rows)", [summary.mean for summary in preview.summaries]),
+        ]
+        statistics = self.object.column_statistics()
+        if statistics is not None:
+            columns = slice(column_start, column_start + _PREVIEW_COLUMNS)
+            summary_rows += [
+                ("Min (all rows)", statistics.minimum[columns].tolist()),
+                ("Max (all rows)", statistics.maximum[columns].tolist()),
+                ("Mean (all rows)", statistics.mean[columns].tolist()),
+                ("Std (all rows)", statistics.std()[columns].tolist()),
+            ]
+        return {
+            'preview': preview,
+            'preview_rows': list(zip(range(row_start, row_start + len(preview.rows)), targets, preview.rows)),
+            'preview_summary_rows': summary_rows,
+            'preview_previous_row': max(0, row_start - _PREVIEW_ROWS) if row_start > 0 else None,
+            'preview_next_row': row_start + _PREVIEW_ROWS if preview.has_more_rows else None,
+            'preview_previous_column': max(0, column_start - _PREVIEW_COLUMNS) if column_start > 0 else None,
+            'preview_next_column': (column_start + _PREVIEW_COLUMNS
+                                    if column_start + _PREVIEW_COLUMNS < preview.n_columns else None),
+        }
+
     def post(self, request, *args, **kwargs):
+        if 'predict_all_submit' in request.POST:
+            return self._post_predict_all()
         model: Model = Model.objects.filter(id__exact=request.POST['predict_filter']).first()
         prediction = model.predict(self.get_object())
         try:
@@ -343,6 +635,25 @@ class MeasurementDetailView(DetailView):
         ).render_view()
 
 
+    def _post_predict_all(self) -> HttpResponse:
+        measurement: Measurement = self.get_object()
+        models = Model.objects.compatible_with(measurement).filter(ready_for_prediction=True)
+        try:
+            predictions = Prediction.objects.bulk_create(models.predict(measurement))
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.exception("predicting measurement %s failed", measurement.pk)
+            return Result(False, "Internal problem", str(exc)).render_view()
+
+        if not predictions:
+            return Result(False, "No models", "No model that is ready for prediction accepts this measurement"
+                          ).render_view()
+        return Result(
+            True,
+            f"Computed {len(predictions)} predictions",
+            "\n".join(f"{prediction.model.name}: score {prediction.score}" for prediction in predictions)
+        ).render_view()
+
+
 class ModelsView(TemplateView):
     template_name = 'models.html'
 
@@ -426,6 +737,7 @@ class ModelsView(TemplateView):
                 int(request.POST['components']),
                 LimitType(int(request.POST['limit_type'])),
                 bool('scale' in request.POST and request.POST['scale']),
+                Precision.FLOAT32 if form_data.get('single_precision') else Precision.FLOAT64,
             )
             model.data = SIMCAMODEL.default_data(int(request.POST['features']),
                                                  parameters=parameters)
@@ -460,27 +772,19 @@ class ModelDetailView(DetailView):
             include_all=True)
         context["train_form"] = ModelTrainForm(self._get_trainable_measurements(group_id))
         context["copy_form"] = CopyModelForm()
+        if self.object.model_type == SIMCAMODEL.id_:
+            context["cross_validation_form"] = CrossValidationForm()
+            context["sweep_form"] = SweepForm(SIMCAMODEL.LIMITTYPE_CHOICES, self._get_trainable_measurements(group_id))
         return context
 
     def _get_trainable_measurements(self, group_id: str = FilterForm.ALL) -> 'QuerySet':
-        # pylint: disable=fixme
-        # TODO This is ahighly ineffecient way to gather all trainable measurements:
-        # 1. we walk through  Measurements twice: first retireving them, then just for generating a Queryset object
-        # - possible quick fix: use a MultipleChoiceField instaed and handle list of choices manually
-        # 2. the need to retrieve all measurements from db to check compatible is an even bigger design issue
-        # - need a stricter/better/more efficient way to figure out compatability just absed on a db fields (one query)
         model: Model = self.get_object()
-        trainable_ids = []
         if group_id == FilterForm.ALL:
             filtered_measurements = Measurement.objects.all()
         else:
             filtered_measurements = Measurement.objects.filter(groups__id=group_id)
 
-        for measurement in filtered_measurements:
-            if measurement.is_labelled and model.is_compatible(measurement):
-                trainable_ids.append(measurement.id)
-
-        return Measurement.objects.filter(pk__in=trainable_ids)
+        return filtered_measurements.trainable_for(model)
 
     def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         if 'copy_submit' in request.POST:
@@ -489,6 +793,10 @@ class ModelDetailView(DetailView):
             return self._post_train(request)
         if 'change_ready_flag' in request.POST:
             return self._post_change_ready_flag(request)
+        if 'cross_validate_submit' in request.POST:
+            return self._post_cross_validate(request)
+        if 'sweep_submit' in request.POST:
+            return self._post_sweep(request)
         return HttpResponseBadRequest()
 
     def _post_copy(self, request: HttpRequest) -> HttpResponse:
@@ -510,6 +818,7 @@ class ModelDetailView(DetailView):
         new_model.user_changed = request.user
         new_model.model_type = model.model_type
         new_model.data = model.data
+        new_model.calibration_data = model.calibration_data
         new_model.save()
 
         if 'new_lreg_model_submit' in request.POST:
@@ -543,35 +852,80 @@ class ModelDetailView(DetailView):
         if name and Model.objects.filter(name=name).count() > 0:
             return Result(False, "Model already exists", "Please choose a different name").render_view()
 
-        measurements = list(data.get('measurements'))
+        job = TrainingJob()
+        job.model = self.get_object()
+        job.user_created = request.user
+        job.new_name = name or ""
+        job.max_iterations = data.get('max_iterations')
+        job.max_seconds = data.get('max_seconds') or settings.PORTAL_TRAINING_MAX_SECONDS
+        job.save()
+        job.measurements.set(data.get('measurements'))
+
+        if settings.PORTAL_TRAINING_IN_BACKGROUND:
+            submit_training_job(job)
+            return Result(True, "Training accepted",
+                          f"The model is trained in the background, for at most {job.max_seconds} seconds.",
+                          link_address=job.get_absolute_url(),
+                          link_text="See training status").render_view()
+
+        run_training_job(job)
+        return Result(job.status == TrainingJob.Status.SUCCEEDED, job.message, job.details,
+                      link_address=job.get_absolute_url(),
+                      link_text="See training details").render_view()
+
+    def _post_cross_validate(self, request: HttpRequest) -> HttpResponse:
+        form = CrossValidationForm(request.POST)
         model: Model = self.get_object()
-        old_score = sum([model.score(m).value for m in measurements])/len(measurements)
+        if not form.is_valid() or model.model_type != SIMCAMODEL.id_:
+            return Result(False, "Data was not valid").render_view()
+        if not request.user.has_perm('portal.change_model'):
+            return Result(False, "Not allowed", "You do not have the rights to change existing models").render_view()
+
         try:
-            trained_model_data, new_score = model.get_type.train(
-                model,
-                measurements,
-                max_iterations=1,
-                max_seconds=10)
-        # pylint: disable=broad-except
-        except Exception as exc:
-            return Result(False, "Training failed", str(exc)).render_view()
-
-        operation_text = ""
-        if name:
-            Model(name=name,
-                  data=trained_model_data,
-                  user_created=request.user,
-                  user_changed=request.user,
-                  model_type=model.model_type).save()
-            operation_text = f"'{name}' was saved"
-        else:
-            model.data = trained_model_data
-            model.user_changed = request.user
-            model.save()
-            operation_text = f"'{model.name}' was updated"
+            model_data, result = SIMCAMODEL.cross_validate(model, form.cleaned_data.get('n_folds'))
+        except ValueError as exc:
+            return Result(False, "Cross-validation not possible", str(exc),
+                          link_address=model.get_absolute_url(),
+                          link_text="See model details").render_view()
 
-        return Result(True, "Training finished",
-                      f"score before: {old_score}\nscore after: {new_score}\n{operation_text}").render_view()
+        model.data = model_data
+        model.user_changed = request.user
+        model.save()
+        fold_scores = "\n".join(f"fold {fold}: {score}" for fold, score in enumerate(result.fold_scores[:, -1]))
+        return Result(True, "Cross-validation finished",
+                      f"score: {result.score}\n{fold_scores}",
+                      link_address=model.get_absolute_url(),
+                      link_text="See model details").render_view()
+
+    def _post_sweep(self, request: HttpRequest) -> HttpResponse:
+        form = SweepForm(SIMCAMODEL.LIMITTYPE_CHOICES, self._get_trainable_measurements(), request.POST)
+        model: Model = self.get_object()
+        if not form.is_valid() or model.model_type != SIMCAMODEL.id_:
+            return Result(False, "Data was not valid").render_view()
+        data = form.cleaned_data
+
+        try:
+            sweep = SIMCAMODEL.sweep(model,
+                                     list(data['measurements']),
+                                     n_comps=data['components'],
+                                     alphas=data['alphas'],
+                                     gammas=data['gammas'],
+                                     limit_types=[LimitType(int(value)) for value in data['limit_types']])
+        except ValueError as exc:
+            return Result(False, "Parameter sweep not possible", str(exc),
+                          link_address=model.get_absolute_url(),
+                          link_text="See model details").render_view()
+
+        best = sweep.best()
+        table = "\n".join(
+            f"{row['n_comp']:>6} {row['alpha']:>8} {row['gamma']:>8} {row['limit_type']:>10} {row['score']}"
+            for row in sweep.table())
+        return Result(True, "Parameter sweep finished",
+                      f"best: components={best.n_comp}, alpha={best.alpha}, gamma={best.gamma}, "
+                      + f"limit type={best.limit_type.name}\n\n"
+                      + f"{'n_comp':>6} {'alpha':>8} {'gamma':>8} {'limit type':>10} score\n{table}",
+                      link_address=model.get_absolute_url(),
+                      link_text="See model details").render_view()
 
     def _post_change_ready_flag(self, request: HttpRequest) -> HttpResponse:
         model: Model = self.get_object()
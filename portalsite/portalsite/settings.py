@@ -143,6 +143,42 @@ STATICFILES_DIRS = (
 # enable compression and caching
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Local file storage (the app keeps large measurement matrices here)
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+
+# Portal app
+# Memory budget (bytes) of the per-process cache of parsed measurement arrays
+PORTAL_ARRAY_CACHE_BYTES = int(os.environ.get('PORTAL_ARRAY_CACHE_BYTES', 256 * 2**20))
+# Memory budget (bytes) of the per-process cache of deserialized models
+PORTAL_MODEL_CACHE_BYTES = int(os.environ.get('PORTAL_MODEL_CACHE_BYTES', 64 * 2**20))
+# Codec ('none', 'zlib', 'bz2' or 'lzma') and level for compressing stored data. The level depends on the codec: 0-9 for
+# zlib and lzma, 1-9 for bz2, none for 'none' (unset: the codec default). Other values fail at startup.
+PORTAL_COMPRESSION_CODEC = os.environ.get('PORTAL_COMPRESSION_CODEC', 'zlib')
+PORTAL_COMPRESSION_LEVEL = (int(os.environ['PORTAL_COMPRESSION_LEVEL'])
+                            if 'PORTAL_COMPRESSION_LEVEL' in os.environ else None)
+# Measurement matrices of at least this size (bytes) are kept as memory-mapped .npy files under MEDIA_ROOT instead of
+# the database (unset: always use the database). The files must be on storage shared by all workers.
+PORTAL_MATRIX_FILE_MIN_BYTES = (int(os.environ['PORTAL_MATRIX_FILE_MIN_BYTES'])
+                                if 'PORTAL_MATRIX_FILE_MIN_BYTES' in os.environ else None)
+# Number of worker processes parsing the files of a bulk upload
+PORTAL_INGEST_WORKERS = int(os.environ.get('PORTAL_INGEST_WORKERS', 4))
+# Whether single measurement uploads are parsed and saved in the background (see portal.jobs), and the number of
+# background threads per web worker process
+PORTAL_INGEST_IN_BACKGROUND = os.environ.get('PORTAL_INGEST_IN_BACKGROUND', 'True') == 'True'
+PORTAL_JOB_WORKERS = int(os.environ.get('PORTAL_JOB_WORKERS', 1))
+# Whether models are trained in the background (in a worker process per training, see portal.jobs), the number of
+# trainings run at once per web worker process (separate from the uploads) and the default time budget in seconds
+PORTAL_TRAINING_IN_BACKGROUND = os.environ.get('PORTAL_TRAINING_IN_BACKGROUND', 'True') == 'True'
+PORTAL_TRAINING_WORKERS = int(os.environ.get('PORTAL_TRAINING_WORKERS', 1))
+PORTAL_TRAINING_MAX_SECONDS = int(os.environ.get('PORTAL_TRAINING_MAX_SECONDS', 600))
+# Maximal number of threads that predict a measurement with several models at once
+PORTAL_PREDICTION_WORKERS = int(os.environ.get('PORTAL_PREDICTION_WORKERS', 4))
+# Precision ('float64' or 'float32') of the numeric content of stored csv measurements - float32 halves the size of
+# stored matrices and cached arrays. Changing it only applies to newly stored data.
+PORTAL_MEASUREMENT_DTYPE = os.environ.get('PORTAL_MEASUREMENT_DTYPE', 'float64')
+# Column statistics of measurements include the comoment (covariance) matrix up to this number of features
+PORTAL_STATISTICS_COMOMENTS_MAX_FEATURES = int(os.environ.get('PORTAL_STATISTICS_COMOMENTS_MAX_FEATURES', 500))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field